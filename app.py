@@ -1,28 +1,215 @@
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import (Blueprint, Flask, Request, Response, current_app, make_response, render_template, request,
+                   send_from_directory, jsonify, stream_with_context)
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, wraps
+import io
+import logging
+import multiprocessing
 import os
 from pathlib import Path
-import pandas as pd
+import re
+import shutil
 import sys
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
-import shutil
-from datetime import datetime
-import numpy as np
 import tempfile
+import threading
+import time
+import uuid
 
 # Import functions from subprojects
 sys.path.append(str(Path(__file__).parent / 'subproject1'))
 sys.path.append(str(Path(__file__).parent / 'subproject2'))
 
-from subproject2.word_frequency import WordFrequencyAnalyzer
-import subproject1.scaling_features as scaling
+from jobs import JobQueue, QueueFullError
+from result_cache import ResultCache, cache_key
+from output_sweeper import OutputSweeper
+from batch import batch_summary, run_batch
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('main', __name__)
+
+# pyplot keeps global state, so plots from concurrent jobs are rendered one at a time
+plot_lock = threading.Lock()
+
+# Word corpora are files named after the corpus
+CORPUS_NAME_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+corpora_lock = threading.Lock()
+batch_lock = threading.Lock()
+
+# Rows of a /datasets/<id>/<frame> page, by default and at most; pages in column-oriented formats
+# are streamed without a dict per row, so they may be much longer
+PAGE_ROWS = 100
+MAX_PAGE_ROWS = 1000
+MAX_COLUMNS_PAGE_ROWS = 1000000
+
+def scaling_module():
+    """The scaling module; pandas and scikit-learn are imported on first use."""
+    import subproject1.scaling_features as scaling
+    return scaling
+
+def dataset_registry():
+    """The registry of incremental datasets, created on first use."""
+    registry = current_app.extensions.get('dataset_registry')
+    if registry is None:
+        from subproject1.dataset_registry import DatasetRegistry
+        registry = current_app.extensions['dataset_registry'] = DatasetRegistry(current_app.config['DATASET_FOLDER'])
+    return registry
+
+def frame_cache():
+    """The cache of result frames browsed page by page, created on first use."""
+    cache = current_app.extensions.get('frame_cache')
+    if cache is None:
+        from frame_cache import FrameCache
+        cache = current_app.extensions['frame_cache'] = FrameCache(
+            max_bytes=current_app.config['FRAME_CACHE_MAX_MB'] * 1024 * 1024)
+    return cache
+
+def word_frequency_analyzer(variations_file=None):
+    """Create a WordFrequencyAnalyzer; pandas and matplotlib are imported on first use."""
+    from subproject2.word_frequency import WordFrequencyAnalyzer
+    return WordFrequencyAnalyzer(variations_file)
+
+def word_corpus(name, create=False):
+    """
+    The word corpus called name, opened once per process, or None if it does
+    not exist (and create is false) or name is not a valid corpus name.
+    """
+    if not CORPUS_NAME_PATTERN.fullmatch(name):
+        return None
+    corpora = current_app.extensions['word_corpora']
+    with corpora_lock:
+        corpus = corpora.get(name)
+        if corpus is None:
+            path = os.path.join(current_app.config['CORPUS_FOLDER'], f'{name}.sqlite')
+            if not create and not os.path.exists(path):
+                return None
+            from subproject2.word_corpus import WordCorpus
+            os.makedirs(current_app.config['CORPUS_FOLDER'], exist_ok=True)
+            corpus = corpora[name] = WordCorpus(path, word_frequency_analyzer(current_app.config['WORD_VARIATIONS_FILE']))
+        return corpus
+
+def batch_executor():
+    """
+    The worker processes of /analyze/batch, started on first use and kept for
+    later batches, so each imports the analysis modules only once.
+    """
+    with batch_lock:
+        executor = current_app.extensions.get('batch_executor')
+        # A pool whose worker died cannot take more work (there is no public check for it)
+        if executor is None or getattr(executor, '_broken', False):
+            # Forking a threaded server process is unsafe; the fork server starts workers from a clean process
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            executor = current_app.extensions['batch_executor'] = ProcessPoolExecutor(
+                max_workers=current_app.config['BATCH_WORKERS'], mp_context=multiprocessing.get_context(method),
+                initializer=warm_up)
+        return executor
+
+def warm_up():
+    """
+    Import the analysis modules ahead of the first request.
+    gunicorn calls this in the master process (see gunicorn.conf.py), so the
+    forked workers share the imported modules instead of importing them again.
+    """
+    scaling_module()
+    import subproject1.dataset_registry
+    import subproject2.word_frequency
+    import subproject2.word_corpus
+    import plot_data
+
+class SpoolingRequest(Request):
+    """Request keeping each uploaded file in memory up to UPLOAD_SPILL_MB, then in a temporary file."""
 
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = os.environ.get('TEMP_FOLDER', tempfile.gettempdir())  # Use system temp directory or environment variable
-app.config['OUTPUT_FOLDER'] = os.environ.get('OUTPUT_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output'))
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # max_size=0 would mean never spilling, so 0 MB spills any upload
+        max_size = max(current_app.config['UPLOAD_SPILL_MB'] * 1024 * 1024, 1)
+        return tempfile.SpooledTemporaryFile(max_size=max_size, mode='rb+', dir=current_app.config['UPLOAD_FOLDER'])
+
+def create_app(config=None):
+    """Create the Flask app. config overrides the settings read from the environment."""
+    app = Flask(__name__)
+    app.request_class = SpoolingRequest
+    app.config['UPLOAD_FOLDER'] = os.environ.get('TEMP_FOLDER', tempfile.gettempdir())  # Use system temp directory or environment variable
+    app.config['UPLOAD_SPILL_MB'] = int(os.environ.get('UPLOAD_SPILL_MB', 8))  # Uploads larger than this spill from memory to UPLOAD_FOLDER
+    app.config['OUTPUT_FOLDER'] = os.environ.get('OUTPUT_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output'))
+    app.config['DATASET_FOLDER'] = os.environ.get('DATASET_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datasets'))  # Incremental datasets
+    app.config['CORPUS_FOLDER'] = os.environ.get('CORPUS_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora'))  # Word corpora
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024  # Max upload size
+    app.config['SCALING_CHUNK_MB'] = int(os.environ.get('SCALING_CHUNK_MB', 64))  # CSV uploads larger than this are scaled in chunks
+    app.config['SCALING_LEAN'] = os.environ.get('SCALING_LEAN', 'false').lower() in ('1', 'true', 'yes')  # Categorical keys, shared result columns
+    app.config['SCALING_FLOAT32'] = os.environ.get('SCALING_FLOAT32', 'false').lower() in ('1', 'true', 'yes')  # Lean mode with float32 values
+    app.config['CSV_ENGINE'] = os.environ.get('CSV_ENGINE')  # CSV reader for chunked scaling, e.g. pyarrow
+    app.config['WORD_VARIATIONS_FILE'] = os.environ.get('WORD_VARIATIONS_FILE')  # Optional JSON/YAML word variations table
+    app.config['ASYNC_WORKERS'] = int(os.environ.get('ASYNC_WORKERS', 2))  # Threads running background analysis jobs
+    app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 2))  # Worker processes for /analyze/batch
+    app.config['ASYNC_MAX_PENDING'] = int(os.environ.get('ASYNC_MAX_PENDING', 16))  # Queued/running jobs before /analyze returns 503
+    app.config['RESULT_CACHE_FOLDER'] = os.environ.get('RESULT_CACHE_FOLDER', os.path.join(tempfile.gettempdir(), 'analysis_cache'))
+    app.config['RESULT_CACHE_MAX_MB'] = int(os.environ.get('RESULT_CACHE_MAX_MB', 512))  # 0 disables the result cache
+    app.config['RESULT_CACHE_TTL'] = int(os.environ.get('RESULT_CACHE_TTL', 24 * 60 * 60))  # Seconds
+    app.config['FRAME_CACHE_MAX_MB'] = int(os.environ.get('FRAME_CACHE_MAX_MB', 256))  # Result frames kept in memory for /datasets/<id>/<frame>
+    app.config['PLOT_MAX_POINTS'] = int(os.environ.get('PLOT_MAX_POINTS', 5000))  # Points plotted exactly before binning or downsampling
+    app.config['OUTPUT_MAX_AGE'] = int(os.environ.get('OUTPUT_MAX_AGE', 60 * 60))  # Seconds an analysis' output folder is kept
+    app.config['OUTPUT_MAX_MB'] = int(os.environ.get('OUTPUT_MAX_MB', 1024))  # Total size of output folders before the oldest are removed
+    app.config['OUTPUT_SWEEP_INTERVAL'] = int(os.environ.get('OUTPUT_SWEEP_INTERVAL', 300))  # Seconds between output sweeps
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # Stage timings, /metrics and Server-Timing
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')  # DEBUG also logs intermediate results
+    if config:
+        app.config.update(config)
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger().setLevel(app.config['LOG_LEVEL'])
+    instrumentation.enable(app.config['METRICS_ENABLED'])
+
+    # Ensure upload and output directories exist
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+
+    # Stage totals of all worker processes, so that any of them answers /metrics for all
+    if app.config['METRICS_ENABLED']:
+        instrumentation.share(os.path.join(app.config['OUTPUT_FOLDER'], '.metrics.sqlite'))
+
+    # Set permissions for output directory (ignored on Windows)
+    try:
+        if sys.platform != 'win32':
+            import stat
+            os.chmod(app.config['OUTPUT_FOLDER'], 
+                     stat.S_IRWXU | stat.S_IRWXG | stat.S_IROTH | stat.S_IXOTH)  # 0775
+    except Exception as e:
+        logger.warning("Could not set permissions on output directory: %s", e)
+
+    # Background jobs for /analyze?async=1, tracked in a file every worker process reads
+    app.extensions['job_queue'] = JobQueue(os.path.join(app.config['OUTPUT_FOLDER'], '.jobs.sqlite'),
+                                           max_workers=app.config['ASYNC_WORKERS'],
+                                           max_pending=app.config['ASYNC_MAX_PENDING'])
+
+    # Cache of analysis responses and files, keyed by a hash of the input
+    app.extensions['result_cache'] = ResultCache(app.config['RESULT_CACHE_FOLDER'],
+                                                 max_bytes=app.config['RESULT_CACHE_MAX_MB'] * 1024 * 1024,
+                                                 ttl_seconds=app.config['RESULT_CACHE_TTL'])
+
+    # Every analysis writes to its own output folder; old ones are removed in the background
+    app.extensions['output_sweeper'] = OutputSweeper(app.config['OUTPUT_FOLDER'],
+                                                     max_age_seconds=app.config['OUTPUT_MAX_AGE'],
+                                                     max_bytes=app.config['OUTPUT_MAX_MB'] * 1024 * 1024,
+                                                     interval_seconds=app.config['OUTPUT_SWEEP_INTERVAL'])
+
+    # Word corpora opened by this process, by name
+    app.extensions['word_corpora'] = {}
+
+    app.register_blueprint(bp)
+    return app
+
+@bp.before_app_request
+def start_output_sweeper():
+    # Started on the first request rather than in create_app, so no thread
+    # exists yet when gunicorn forks workers from a preloaded app
+    current_app.extensions['output_sweeper'].start()
 
 # Add security headers
-@app.after_request
+@bp.after_app_request
 def add_security_headers(response):
     response.headers['Content-Security-Policy'] = "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval' cdn.plot.ly unpkg.com cdnjs.cloudflare.com; style-src 'self' 'unsafe-inline' cdn.jsdelivr.net cdnjs.cloudflare.com; img-src 'self' data:; font-src cdnjs.cloudflare.com;"
     response.headers['X-Content-Type-Options'] = 'nosniff'
@@ -31,24 +218,11 @@ def add_security_headers(response):
     return response
 
 # Add CSP headers to allow Plotly
-@app.after_request
+@bp.after_app_request
 def add_plotly_headers(response):
     response.headers['Content-Security-Policy'] = "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval' cdn.plot.ly; style-src 'self' 'unsafe-inline';"
     return response
 
-# Ensure upload and output directories exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
-
-# Set permissions for output directory (ignored on Windows)
-try:
-    if sys.platform != 'win32':
-        import stat
-        os.chmod(app.config['OUTPUT_FOLDER'], 
-                 stat.S_IRWXU | stat.S_IRWXG | stat.S_IROTH | stat.S_IXOTH)  # 0775
-except Exception as e:
-    print(f"Warning: Could not set permissions on output directory: {str(e)}")
-
 def get_color_palette(n):
     """Generate a color palette with n distinct colors"""
     colors = [
@@ -108,14 +282,254 @@ def prepare_plot_data(df, group_col, use_post_scaling=False, use_normalized=Fals
                 })
             return traces
     except Exception as e:
-        print(f"Error in prepare_plot_data: {str(e)}")
+        logger.error("Error in prepare_plot_data: %s", e)
         raise e
 
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/analyze', methods=['POST'])
+@bp.route('/healthz')
+def health():
+    """Liveness check; answers without loading the analysis modules"""
+    return jsonify({'status': 'ok'})
+
+@bp.route('/metrics')
+def metrics():
+    """Stage timings, rows processed and peak memory of all worker processes together, for Prometheus"""
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(instrumentation.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+def server_timing(view):
+    """Send the timings of the analysis stages a request ran as its Server-Timing header."""
+    @wraps(view)
+    def timed_view(*args, **kwargs):
+        if not current_app.config['METRICS_ENABLED']:
+            return view(*args, **kwargs)
+        start = time.perf_counter()
+        with instrumentation.record() as timings:
+            response = make_response(view(*args, **kwargs))
+        response.headers['Server-Timing'] = instrumentation.server_timing(timings, time.perf_counter() - start)
+        return response
+    return timed_view
+
+def new_output_id():
+    """Create the ID of a new output folder."""
+    return uuid.uuid4().hex
+
+def output_url(output_id, filename):
+    """Download URL of a file in an output folder."""
+    return f'/output/{output_id}/{filename}'
+
+def frame_url(frame_id, name):
+    """URL for browsing a result frame (a key of OUTPUT_FRAMES) of an output folder or dataset."""
+    return f'/datasets/{frame_id}/{name}'
+
+def set_output_urls(payload, output_id):
+    """Point the download URLs of a response at the given output folder."""
+    payload['output_id'] = output_id
+    if 'dataframes' in payload:
+        frame_names = {friendly_name: name for name, friendly_name in FRIENDLY_NAMES.items()}
+        for friendly_name, info in payload['dataframes'].items():
+            info['url'] = output_url(output_id, info['filename'])
+            info['data_url'] = frame_url(output_id, frame_names[friendly_name])
+    else:
+        payload['plot_url'] = output_url(output_id, 'word_frequencies_plot.png')
+    return payload
+
+def run_word_counter(text, output_dir):
+    """Analyze text and return the word counter response payload."""
+    analyzer = word_frequency_analyzer(current_app.config['WORD_VARIATIONS_FILE'])
+    analyzer.output_dir = output_dir
+    analyzer.analyze_text(text)
+    with plot_lock:
+        analyzer.save_results()
+    
+    # Get results safely
+    try:
+        frequencies = analyzer.get_top_words(10)
+    except:
+        frequencies = []
+        
+    try:
+        total_words = analyzer.get_total_words()
+    except:
+        total_words = 0
+        
+    try:
+        unique_words = analyzer.get_unique_words()
+    except:
+        unique_words = 0
+    
+    return word_counter_payload(frequencies, total_words, unique_words, os.path.basename(output_dir))
+
+def word_counter_payload(frequencies, total_words, unique_words, output_id):
+    """The word counter response payload, with the plot in the output folder output_id."""
+    if total_words > 0:
+        summary = f"Analysis complete! Found {unique_words} unique words out of {total_words} total words."
+    else:
+        summary = "No words found in the provided text. Please check your input."
+    
+    return {
+        'success': True,
+        'frequencies': frequencies,
+        'summary': summary,
+        'plot_url': output_url(output_id, 'word_frequencies_plot.png')
+    }
+
+def upload_size(upload):
+    """Size in bytes of an uploaded file's stream."""
+    upload.seek(0, os.SEEK_END)
+    size = upload.tell()
+    upload.seek(0)
+    return size
+
+def scale_in_chunks(upload, file_format):
+    """Whether an upload is a CSV file large enough to be scaled in chunks."""
+    threshold = current_app.config['SCALING_CHUNK_MB'] * 1024 * 1024
+    return file_format == '.csv' and upload_size(upload) > threshold
+
+# Names of the scaling DataFrames in responses
+FRIENDLY_NAMES = {
+    'df_original': 'Original Data',
+    'df_scaled_by_group': 'Data Scaled by Group',
+    'df_scaled_by_post': 'Data Scaled by Post',
+    'group_averages': 'Group Averages',
+    'post_averages': 'Post Averages'
+}
+
+def dataframe_files(dfs, file_url, data_url):
+    """
+    Previews and file information of scaling DataFrames; file_url gives a
+    file name's download URL and data_url a frame's URL for browsing it.
+    """
+    df_files = {}
+    for df_name, df_info in dfs.items():
+        df = df_info['data']
+        output_filename = df_info['filename']
+        
+        # Get all columns for preview
+        preview_data = df.head().to_dict('records')
+        
+        # Add row numbers to preview
+        for i, row in enumerate(preview_data):
+            row['#'] = i + 1
+        
+        df_files[FRIENDLY_NAMES[df_name]] = {
+            'url': file_url(output_filename),
+            'data_url': data_url(df_name),
+            'preview': preview_data,
+            'shape': df_info['shape'],
+            'columns': df.columns.tolist(),
+            'filename': output_filename
+        }
+    return df_files
+
+def run_scaling(upload, file_format, output_dir):
+    """Scale an uploaded file's stream and return the scaling response payload."""
+    scaling = scaling_module()
+    if scale_in_chunks(upload, file_format):
+        # Too large to hold in memory; the results are streamed to CSV files
+        dfs = scaling.process_file(upload, output_dir, export_format='csv', file_format=file_format,
+                                   chunksize=scaling.CHUNK_ROWS, engine=current_app.config['CSV_ENGINE'])
+    else:
+        # Process the file; the DataFrames are exported when first downloaded
+        dfs = scaling.process_file(upload, output_dir, export_format=None, file_format=file_format,
+                                   lean=current_app.config['SCALING_LEAN'] or current_app.config['SCALING_FLOAT32'],
+                                   float32=current_app.config['SCALING_FLOAT32'])
+    
+    # The table is only formatted when debug logging is on
+    logger.debug("Group averages:\n%s", dfs['group_averages']['data'])
+    
+    return scaling_payload(dfs, os.path.basename(output_dir))
+
+def scaling_payload(dfs, output_id):
+    """The scaling response payload for process_file's results, with files in the output folder output_id."""
+    df_files = dataframe_files(dfs, lambda filename: output_url(output_id, filename),
+                               lambda name: frame_url(output_id, name))
+    
+    # Create summary
+    formats = "CSV files" if dfs['df_original']['filename'].endswith('.csv') else "Excel (.xlsx), CSV, Parquet or Arrow files"
+    summary = (
+        f"Data scaling complete! Processed {dfs['df_original']['shape'][0]} rows and "
+        f"{dfs['df_original']['shape'][1]} columns. Created {len(dfs)} different scaled "
+        f"and normalized versions of your data. Download them as {formats}."
+    )
+    
+    return {
+        'success': True,
+        'dataframes': df_files,
+        'summary': summary
+    }
+
+def word_counter_cache_key(text):
+    """Cache key for a word counter request: the text plus the variations table in use."""
+    variations_file = current_app.config['WORD_VARIATIONS_FILE']
+    params = {'variations_file': variations_file}
+    if variations_file and os.path.exists(variations_file):
+        params['variations_mtime'] = os.path.getmtime(variations_file)
+    return cache_key('word_counter', params, data=text.encode('utf-8'))
+
+def scaling_cache_key(upload, file_format):
+    """Cache key for a scaling request: the uploaded bytes plus their file format."""
+    params = {'format': file_format, 'chunked': scale_in_chunks(upload, file_format),
+              'lean': current_app.config['SCALING_LEAN'], 'float32': current_app.config['SCALING_FLOAT32']}
+    return cache_key('scaling', params, stream=upload)
+
+def result_files(output_dir):
+    """Names of the files an analysis wrote to its output folder."""
+    return [name for name in os.listdir(output_dir) if os.path.isfile(os.path.join(output_dir, name))]
+
+def run_cached(key, output_id, fn, *args):
+    """
+    Serve an analysis from the result cache, or run fn(*args, output_dir) and
+    cache it. Either way the files end up in the output folder output_id.
+    """
+    result_cache = current_app.extensions['result_cache']
+    output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], output_id)
+    payload = result_cache.get(key, output_dir)
+    if payload is not None:
+        payload = set_output_urls(payload, output_id)
+        payload['cached'] = True
+        return payload
+    
+    os.makedirs(output_dir, exist_ok=True)
+    payload = set_output_urls(fn(*args, output_dir), output_id)
+    result_cache.put(key, payload, output_dir, result_files(output_dir))
+    payload['cached'] = False
+    return payload
+
+def run_in_app_context(app, fn, *args):
+    """Run fn(*args) inside app's context, for work done outside of a request."""
+    with app.app_context():
+        return fn(*args)
+
+def wants_async():
+    """Check whether the client asked for the analysis to run as a background job."""
+    return request.values.get('async', '').lower() in ('1', 'true', 'yes')
+
+def submit_job(project_type, key, fn, *args, cleanup=None):
+    """Queue a cached analysis writing to an output folder named after the job."""
+    job_id = new_output_id()
+    try:
+        current_app.extensions['job_queue'].submit(project_type, run_in_app_context, current_app._get_current_object(),
+                                                   run_cached, key, job_id, fn, *args, cleanup=cleanup, job_id=job_id)
+    except QueueFullError as e:
+        if cleanup is not None:
+            cleanup()
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}',
+        'result_url': f'/jobs/{job_id}/result'
+    }), 202
+
+@bp.route('/analyze', methods=['POST'])
+@server_timing
 def analyze():
     try:
         project_type = request.form.get('project_type')
@@ -128,43 +542,14 @@ def analyze():
             if not text.strip():
                 return jsonify({'error': 'Empty text provided'}), 400
             
+            key = word_counter_cache_key(text)
+            if wants_async():
+                return submit_job(project_type, key, run_word_counter, text)
+            
             try:
-                # Analyze text
-                analyzer = WordFrequencyAnalyzer()
-                analyzer.output_dir = app.config['OUTPUT_FOLDER']
-                analyzer.analyze_text(text)
-                analyzer.save_results()
-                
-                # Get results safely
-                try:
-                    frequencies = analyzer.get_top_words(10)
-                except:
-                    frequencies = []
-                    
-                try:
-                    total_words = analyzer.get_total_words()
-                except:
-                    total_words = 0
-                    
-                try:
-                    unique_words = analyzer.get_unique_words()
-                except:
-                    unique_words = 0
-                
-                # Prepare summary
-                if total_words > 0:
-                    summary = f"Analysis complete! Found {unique_words} unique words out of {total_words} total words."
-                else:
-                    summary = "No words found in the provided text. Please check your input."
-                
-                return jsonify({
-                    'success': True,
-                    'frequencies': frequencies,
-                    'summary': summary,
-                    'plot_url': '/output/word_frequencies_plot.png'
-                })
+                return jsonify(run_cached(key, new_output_id(), run_word_counter, text))
             except Exception as e:
-                print(f"Error in word counter: {str(e)}")
+                logger.error("Error in word counter: %s", e)
                 return jsonify({
                     'error': f"Error processing text: {str(e)}"
                 }), 500
@@ -176,112 +561,463 @@ def analyze():
             file = request.files['file']
             if file.filename == '':
                 return jsonify({'error': 'No file selected'}), 400
-                
-            # Save uploaded file
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            
+            # The upload is parsed straight from the request's stream, which is
+            # only on disk when larger than UPLOAD_SPILL_MB
+            upload = file.stream
+            file_format = scaling_module().input_format(upload, Path(secure_filename(file.filename)).suffix)
+            
+            if wants_async():
+                # The request closes its files once it ends, so the job takes the stream over
+                file.stream = io.BytesIO()
+                return submit_job(project_type, scaling_cache_key(upload, file_format), run_scaling,
+                                  upload, file_format, cleanup=upload.close)
             
             try:
-                # Process the file
-                dfs = scaling.process_file(filepath, app.config['OUTPUT_FOLDER'])
-                
-                # Debug: Print group averages and calculations
-                group_avgs = dfs['group_averages']['data']
-                print("\nDEBUG - Group Averages:")
-                print(group_avgs)
-                
-                # Calculate manually for verification
-                if 'valence_scaled_by_group_original' in group_avgs.columns:
-                    print("\nDEBUG - Manual Calculation:")
-                    for idx, row in group_avgs.iterrows():
-                        group = row['group']
-                        val = row['valence_scaled_by_group_original']
-                        if 'valence_scaled_by_group_normalized' in group_avgs.columns:
-                            norm = row['valence_scaled_by_group_normalized']
-                            print(f"Group {group}: {val} / ? = {norm}")
-                
-                # Prepare previews and file information
-                df_files = {}
-                friendly_names = {
-                    'df_original': 'Original Data',
-                    'df_scaled_by_group': 'Data Scaled by Group',
-                    'df_scaled_by_post': 'Data Scaled by Post',
-                    'group_averages': 'Group Averages',
-                    'post_averages': 'Post Averages'
-                }
-                
-                for df_name, df_info in dfs.items():
-                    df = df_info['data']
-                    output_filename = df_info['filename']
-                    
-                    # Get all columns for preview
-                    preview_data = df.head().to_dict('records')
-                    
-                    # Add row numbers to preview
-                    for i, row in enumerate(preview_data):
-                        row['#'] = i + 1
-                    
-                    df_files[friendly_names[df_name]] = {
-                        'url': f'/output/{output_filename}',
-                        'preview': preview_data,
-                        'shape': df.shape,
-                        'columns': df.columns.tolist(),
-                        'filename': output_filename
-                    }
-                
-                # Create summary
-                summary = (
-                    f"Data scaling complete! Processed {dfs['df_original']['data'].shape[0]} rows and "
-                    f"{dfs['df_original']['data'].shape[1]} columns. Created {len(dfs)} different scaled "
-                    f"and normalized versions of your data. All files are saved in Excel format (.xlsx) "
-                    f"for easy viewing and editing."
-                )
-                
-                return jsonify({
-                    'success': True,
-                    'dataframes': df_files,
-                    'summary': summary
-                })
+                return jsonify(run_cached(scaling_cache_key(upload, file_format), new_output_id(),
+                                          run_scaling, upload, file_format))
                 
+            except ValueError as e:
+                # The file cannot be read or lacks the required columns
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
-            finally:
-                # Clean up uploaded file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
                 
         else:
             return jsonify({'error': 'Invalid project type'}), 400
             
+    except HTTPException:
+        # e.g. an upload over MAX_CONTENT_LENGTH; answered by the error handlers
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def save_upload(upload):
+    """Copy an uploaded file to the upload folder, where a worker process can read it; returns its path."""
+    suffix = Path(secure_filename(upload.filename)).suffix
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=current_app.config['UPLOAD_FOLDER'])
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(upload.stream, f)
+    return Path(path)
+
+@bp.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze many uploaded files (and, for the word counter, texts) at once in
+    worker processes. The response streams one JSON line per item as soon as
+    it finishes, holding the payload /analyze returns for it (or its error)
+    with its index and name, and ends with a line holding the batch summary.
+    """
+    project_type = request.form.get('project_type')
+    if project_type not in ('scaling', 'word_counter'):
+        return jsonify({'error': 'Invalid project type'}), 400
+    uploads = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+    texts = [text for text in request.form.getlist('text') if text.strip()] if project_type == 'word_counter' else []
+    if not uploads and not texts:
+        return jsonify({'error': 'No files or texts provided'}), 400
+    
+    paths = [save_upload(upload) for upload in uploads]
+    names = [upload.filename for upload in uploads] + [f'text {i + 1}' for i in range(len(texts))]
+    output_ids = [new_output_id() for _ in names]
+    output_dirs = [os.path.join(current_app.config['OUTPUT_FOLDER'], output_id) for output_id in output_ids]
+    if project_type == 'scaling':
+        scaling = scaling_module()
+        fn = partial(scaling.process_batch_item, export_format=None, engine=current_app.config['CSV_ENGINE'],
+                     chunk_bytes=current_app.config['SCALING_CHUNK_MB'] * 1024 * 1024,
+                     lean=current_app.config['SCALING_LEAN'] or current_app.config['SCALING_FLOAT32'],
+                     float32=current_app.config['SCALING_FLOAT32'])
+        items = list(zip(paths, output_dirs))
+    else:
+        from subproject2.word_frequency import analyze_batch_item
+        fn = partial(analyze_batch_item, variations_file=current_app.config['WORD_VARIATIONS_FILE'])
+        items = list(zip(paths + texts, output_dirs))
+    executor = batch_executor()
+    
+    def generate():
+        started = time.perf_counter()
+        outcomes = []
+        rows = 0
+        word_counts = Counter()
+        try:
+            for index, outcome in run_batch(fn, items, executor=executor):
+                outcomes.append(outcome)
+                line = {'index': index, 'name': names[index], 'seconds': outcome['seconds']}
+                if 'error' in outcome:
+                    line['error'] = outcome['error']
+                elif project_type == 'scaling':
+                    rows += outcome['result']['df_original']['shape'][0]
+                    line.update(scaling_payload(outcome['result'], output_ids[index]))
+                else:
+                    result = outcome['result']
+                    word_counts.update(result['word_counts'])
+                    line.update(word_counter_payload(result['frequencies'], result['total_words'],
+                                                     result['unique_words'], output_ids[index]))
+                line['output_id'] = output_ids[index]
+                yield current_app.json.dumps(line) + '\n'
+            
+            summary = batch_summary(outcomes, started)
+            if project_type == 'scaling':
+                summary['rows'] = rows
+            else:
+                # Across all items; similar words are only combined within each item
+                total_words = sum(word_counts.values())
+                summary.update(total_words=total_words, unique_words=len(word_counts), frequencies=[
+                    {'word': word, 'frequency': count, 'percentage': round(count / total_words * 100, 2)}
+                    for word, count in word_counts.most_common(10)])
+            yield current_app.json.dumps({'summary': summary}) + '\n'
+        finally:
+            for path in paths:
+                path.unlink(missing_ok=True)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the status and timing of a background analysis job"""
+    status = current_app.extensions['job_queue'].status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(status)
+
+@bp.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Return the result of a background job, the same payload /analyze returns"""
+    job_queue = current_app.extensions['job_queue']
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != 'finished':
+        return jsonify(job_queue.status(job_id)), 202
+    return jsonify(job['result'])
+
 def allowed_file(filename, allowed_extensions):
     """Check if file has an allowed extension"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
-@app.route('/output/<path:filename>')
-def download_file(filename):
-    """Download a file from the output directory"""
-    return send_file(os.path.join(app.config['OUTPUT_FOLDER'], filename), as_attachment=True)
+@bp.route('/output/<output_id>/<path:filename>')
+@server_timing
+def download_file(output_id, filename):
+    """
+    Download a file from an analysis' output folder.
+    Scaling results are exported on first download, in the format given by
+    ?format=xlsx|csv|parquet|arrow (default: the file's extension).
+    """
+    output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], secure_filename(output_id))
+    scaling = scaling_module()
+    if filename.lower().endswith(scaling.SAVED_FRAME_SUFFIX):
+        # How the frames are kept for export on demand, not a result format; they are downloaded with ?format=
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        exported = scaling.export_saved_frame(output_dir, secure_filename(filename), request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ImportError as e:
+        return jsonify({'error': f"Export format not available on this server: {str(e)}"}), 400
+    return send_from_directory(output_dir, exported or filename, as_attachment=True)
+
+def dataset_url(dataset_id, filename):
+    """Download URL of a file of an incremental dataset."""
+    return f'/datasets/{dataset_id}/files/{filename}'
+
+def update_dataset(dataset_id=None):
+    """Create a dataset from the uploaded file, or append it to dataset_id as a new batch."""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    upload = file.stream
+    file_format = scaling_module().input_format(upload, Path(secure_filename(file.filename)).suffix)
+    registry = dataset_registry()
+    try:
+        if dataset_id is None:
+            result = registry.create(upload, file_format)
+        elif registry.info(dataset_id) is None:
+            return jsonify({'error': 'Unknown dataset'}), 404
+        else:
+            result = registry.append(dataset_id, upload, file_format)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error updating dataset %s: %s", dataset_id, e)
+        return jsonify({'error': str(e)}), 500
+    
+    info = result['info']
+    if dataset_id is None:
+        summary = (f"Dataset created with {info['rows']} rows. Append more rows by uploading them to "
+                   f"/datasets/{info['id']}/batches.")
+    else:
+        summary = (f"Appended {info['batches'][-1]['rows']} rows; the dataset now has {info['rows']} rows in "
+                   f"{len(info['batches'])} batches. Rescaled {result['groups']} groups and {result['posts']} posts "
+                   f"whose minimum or maximum changed ({result['rescaled_rows']} stored rows).")
+    return jsonify({
+        'success': True,
+        'dataset_id': info['id'],
+        'dataset': info,
+        'rescaled': {'groups': result['groups'], 'posts': result['posts'], 'rows': result['rescaled_rows']},
+        'dataframes': dataframe_files(result['results'], lambda filename: dataset_url(info['id'], filename),
+                                      lambda name: frame_url(info['id'], name)),
+        'summary': summary
+    })
+
+@bp.route('/datasets', methods=['POST'])
+@server_timing
+def create_dataset():
+    """Scale an uploaded file into a new dataset that later batches can be appended to"""
+    return update_dataset()
+
+@bp.route('/datasets/<dataset_id>/batches', methods=['POST'])
+@server_timing
+def append_batch(dataset_id):
+    """Append an uploaded batch, rescaling only the groups and posts whose bounds it changes"""
+    return update_dataset(dataset_id)
+
+@bp.route('/datasets/<dataset_id>')
+def dataset_info(dataset_id):
+    """Rows, columns and batches of a dataset"""
+    info = dataset_registry().info(dataset_id)
+    if info is None:
+        return jsonify({'error': 'Unknown dataset'}), 404
+    return jsonify(info)
+
+@bp.route('/datasets/<dataset_id>', methods=['DELETE'])
+def delete_dataset(dataset_id):
+    """Delete a dataset and its files"""
+    if not dataset_registry().delete(dataset_id):
+        return jsonify({'error': 'Unknown dataset'}), 404
+    return jsonify({'success': True})
+
+@bp.route('/datasets/<dataset_id>/files/<filename>')
+@server_timing
+def download_dataset_file(dataset_id, filename):
+    """
+    Download a frame of a dataset, named like the files of /output, in the
+    format given by ?format=xlsx|csv|parquet|arrow (default: the file's extension).
+    """
+    try:
+        exported = dataset_registry().export(dataset_id, secure_filename(filename), request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ImportError as e:
+        return jsonify({'error': f"Export format not available on this server: {str(e)}"}), 400
+    if exported is None:
+        return jsonify({'error': 'Not found'}), 404
+    export_dir, export_filename = exported
+    return send_from_directory(export_dir, export_filename, as_attachment=True)
+
+def corpus_totals(name, corpus):
+    return {
+        'corpus': name,
+        'documents': corpus.get_document_count(),
+        'total_words': corpus.get_total_words(),
+        'unique_words': corpus.get_unique_words()
+    }
+
+@bp.route('/corpora/<name>/documents', methods=['POST'])
+@server_timing
+def add_corpus_document(name):
+    """
+    Add a document, given as the text field or an uploaded UTF-8 file, to a
+    word corpus, which is created on its first document
+    """
+    corpus = word_corpus(name, create=True)
+    if corpus is None:
+        return jsonify({'error': 'Corpus names may only contain letters, digits, _ and -'}), 400
+    document_id = request.form.get('document_id') or None
+    try:
+        if 'file' in request.files and request.files['file'].filename != '':
+            stream = request.files['file'].stream
+            document_id = corpus.add_file(iter(lambda: stream.read(1 << 20), b''), document_id)
+        elif request.form.get('text', '').strip():
+            document_id = corpus.add_document(request.form['text'], document_id)
+        else:
+            return jsonify({'error': 'No text provided'}), 400
+    # UnicodeDecodeError is a ValueError, so it is caught first
+    except UnicodeDecodeError:
+        return jsonify({'error': 'The file is not UTF-8 encoded text'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'success': True, 'document_id': document_id, **corpus_totals(name, corpus)}), 201
+
+@bp.route('/corpora/<name>/documents/<document_id>', methods=['DELETE'])
+def remove_corpus_document(name, document_id):
+    """Remove a document's words from a word corpus"""
+    corpus = word_corpus(name)
+    if corpus is None or not corpus.remove_document(document_id):
+        return jsonify({'error': 'Unknown corpus or document'}), 404
+    return jsonify({'success': True, **corpus_totals(name, corpus)})
+
+@bp.route('/corpora/<name>')
+def corpus_summary(name):
+    """Totals and the ?top=10 most frequent words of a word corpus"""
+    corpus = word_corpus(name)
+    if corpus is None:
+        return jsonify({'error': 'Unknown corpus'}), 404
+    try:
+        top = int(request.args.get('top', 10))
+    except ValueError:
+        return jsonify({'error': 'top must be a number'}), 400
+    return jsonify({**corpus_totals(name, corpus), 'frequencies': corpus.get_top_words(max(top, 0))})
+
+def load_result_frame(frame_id, name):
+    """
+    The frame cache key and loader of a frame of an analysis' output folder
+    or of an incremental dataset, or None if there is neither.
+    """
+    output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], frame_id)
+    if os.path.isdir(output_dir):
+        return ('output', frame_id, name), lambda: scaling_module().load_saved_frame(output_dir, name)
+    registry = dataset_registry()
+    info = registry.info(frame_id)
+    if info is not None:
+        # Appending a batch makes a new version, cached under a new key
+        return ('dataset', frame_id, info['version'], name), lambda: registry.frame(frame_id, name)
+    return None
+
+@bp.route('/datasets/<frame_id>/<frame>')
+@server_timing
+def browse_frame(frame_id, frame):
+    """
+    A page of a result frame of an /analyze output folder or job, or of an
+    incremental dataset: ?offset=0&limit=100, columns=a,b to select columns,
+    sort=column (or -column for descending), and group=/post= with
+    comma-separated values to filter rows. Served from the frame cache, as
+    JSON records by default or in the column-oriented format chosen by
+    format= or the Accept header (see frame_formats), whose pages may hold
+    up to MAX_COLUMNS_PAGE_ROWS rows.
+    """
+    import frame_formats
+    name = scaling_module().frame_name(frame)
+    if name is None or not secure_filename(frame_id) == frame_id:
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        response_format = frame_formats.negotiate(request.args.get('format'), request.accept_mimetypes)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if response_format is None:
+        return jsonify({'error': f"{request.args['format']} is not available on this server"}), 406
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = min(int(request.args.get('limit', PAGE_ROWS)),
+                    MAX_PAGE_ROWS if response_format == 'records' else MAX_COLUMNS_PAGE_ROWS)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be numbers'}), 400
+    if offset < 0 or limit < 0:
+        return jsonify({'error': 'offset and limit cannot be negative'}), 400
+    columns = [col for col in request.args.get('columns', '').split(',') if col]
+    filters = {col: request.args[col].split(',') for col in ('group', 'post') if col in request.args}
+    
+    source = load_result_frame(frame_id, name)
+    if source is None:
+        return jsonify({'error': 'Not found'}), 404
+    key, load = source
+    try:
+        with instrumentation.stage('browse') as timer:
+            page = frame_cache().page(key, load, offset, limit, columns,
+                                      request.args.get('sort'), filters)
+            if page is not None:
+                timer.rows = len(page[1])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if page is None:
+        return jsonify({'error': 'Not found'}), 404
+    total, df = page
+    meta = {'id': frame_id, 'frame': name, 'total': total, 'offset': offset, 'limit': limit}
+    mimetype = frame_formats.FORMATS[response_format]
+    if response_format == 'records':
+        response = jsonify({**meta, 'columns': df.columns.tolist(), 'rows': df.to_dict('records')})
+    elif response_format == 'columns':
+        response = Response(frame_formats.columns_json(meta, df, current_app.json.dumps), mimetype=mimetype)
+    elif response_format == 'msgpack':
+        response = Response(frame_formats.columns_msgpack(meta, df), mimetype=mimetype)
+    else:
+        try:
+            table = frame_formats.arrow_table(meta, df)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        response = Response(frame_formats.arrow_stream(table), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+def plot_range(name):
+    """A ?name=low,high zoom range of the request, or None if not given. Raises ValueError if malformed."""
+    if name not in request.args:
+        return None
+    low, high = (float(value) for value in request.args[name].split(','))
+    if not float('-inf') < low <= high < float('inf'):
+        raise ValueError
+    return low, high
+
+@bp.route('/datasets/<frame_id>/<frame>/plot')
+@server_timing
+def plot_frame(frame_id, frame):
+    """
+    Scatter plot data of a result frame, like /datasets/<id>/<frame>: the x
+    and y columns (default: its valence and arousal columns, the normalized
+    ones with normalized=true) colored by the by column (default: group),
+    within x_range=low,high and y_range=low,high. Up to max_points points
+    (at most PLOT_MAX_POINTS) are sent exactly; beyond, mode=density sends a
+    bins x bins histogram and mode=sample an LTTB downsample. Cached with
+    the frame for every zoom window.
+    """
+    import plot_data
+    name = scaling_module().frame_name(frame)
+    if name is None or not secure_filename(frame_id) == frame_id:
+        return jsonify({'error': 'Not found'}), 404
+    max_points = current_app.config['PLOT_MAX_POINTS']
+    try:
+        x_range, y_range = plot_range('x_range'), plot_range('y_range')
+        max_points = max(1, min(int(request.args.get('max_points', max_points)), max_points))
+        bins = int(request.args.get('bins', plot_data.DENSITY_BINS))
+    except ValueError:
+        return jsonify({'error': 'x_range and y_range must be low,high and max_points and bins numbers'}), 400
+    mode = request.args.get('mode', 'density')
+    normalized = request.args.get('normalized', 'false').lower() in ('1', 'true', 'yes')
+    
+    source = load_result_frame(frame_id, name)
+    if source is None:
+        return jsonify({'error': 'Not found'}), 404
+    key, load = source
+    
+    def compute(df):
+        x, y = request.args.get('x'), request.args.get('y')
+        if x is None or y is None:
+            default_x, default_y = plot_data.default_axes(list(df.columns), normalized)
+            x, y = x or default_x, y or default_y
+        by = request.args.get('by', 'group' if 'group' in df.columns else None) or None
+        with instrumentation.stage('plot_data') as timer:
+            timer.rows = len(df)
+            payload = plot_data.plot_data(df, x, y, by, x_range, y_range, max_points, mode, bins)
+        if 'keys' in payload:
+            payload['colors'] = get_color_palette(len(payload['keys']))
+        return current_app.json.dumps({'id': frame_id, 'frame': name, 'x': x, 'y': y, 'by': by, **payload}).encode()
+    
+    params = tuple(request.args.get(arg) for arg in ('x', 'y', 'by', 'mode', 'bins')) + (
+        x_range, y_range, max_points, normalized)
+    try:
+        body = frame_cache().derived(key, load, ('plot',) + params, compute)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if body is None:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(body, mimetype='application/json')
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return jsonify({'error': 'Not found'}), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
-@app.errorhandler(413)
+@bp.app_errorhandler(413)
 def too_large(error):
-    return jsonify({'error': 'File too large. Maximum size is 16MB'}), 413
+    max_mb = current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'error': f'File too large. Maximum size is {max_mb}MB'}), 413
 
 if __name__ == '__main__':
-    # Development
-    app.run(debug=True)
-else:
-    # Production - debug should be false and host should listen on all interfaces
-    # These settings will be overridden by gunicorn in production
-    app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
+    # Development; in production gunicorn serves create_app() (see Procfile)
+    create_app().run(debug=True)
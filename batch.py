@@ -0,0 +1,98 @@
+"""
+Fan-out of many inputs to a pool of worker processes, used by the batch
+modes of scaling_features.py and word_frequency.py and by /analyze/batch.
+
+The workers of a pool import the analysis modules once and then process
+item after item, and run_batch yields every item's outcome as soon as it
+finishes, so slow items do not hold back the report of fast ones.
+"""
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+
+def is_batch_input(arg):
+    """Whether a command line argument names a directory or a glob pattern rather than one file."""
+    return os.path.isdir(arg) or any(char in arg for char in '*?[')
+
+
+def batch_inputs(pattern, extensions):
+    """
+    The files of a directory whose extension is one of extensions, or the
+    files matching a glob pattern ('**' descends into subdirectories), sorted.
+    """
+    if os.path.isdir(pattern):
+        paths = [path for path in Path(pattern).iterdir() if path.is_file() and path.suffix.lower() in extensions]
+    else:
+        paths = [Path(path) for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)]
+    return sorted(paths)
+
+
+def output_names(paths):
+    """A distinct output folder name for each input path, after its file name."""
+    names = []
+    taken = set()
+    for path in paths:
+        name = stem = Path(path).stem
+        number = 1
+        while name in taken:
+            number += 1
+            name = f'{stem}_{number}'
+        taken.add(name)
+        names.append(name)
+    return names
+
+
+def _quiet_worker():
+    # The parent reports every item; the workers' progress messages would only interleave with it
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def _run_item(fn, args):
+    start = time.perf_counter()
+    try:
+        outcome = {'result': fn(*args)}
+    except Exception as e:
+        outcome = {'error': str(e) or type(e).__name__}
+    outcome['seconds'] = round(time.perf_counter() - start, 3)
+    return outcome
+
+
+def run_batch(fn, items, workers=None, executor=None):
+    """
+    Call fn(*args) for each args tuple of items in worker processes and yield
+    (index, outcome) pairs in the order the items finish. An outcome holds
+    fn's 'result', or the 'error' it raised, and the 'seconds' it took. fn
+    and its arguments must be picklable. Runs on executor if given (and
+    leaves it running), else on a new pool of workers processes (default:
+    one per CPU).
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_quiet_worker)
+    try:
+        futures = {executor.submit(_run_item, fn, args): index for index, args in enumerate(items)}
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # The worker died or the item could not be sent to it
+                outcome = {'error': str(e) or type(e).__name__, 'seconds': None}
+            yield futures[future], outcome
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+
+def batch_summary(outcomes, started):
+    """Counts of the items that succeeded and failed, and the batch's wall-clock seconds since started."""
+    failed = sum(1 for outcome in outcomes if 'error' in outcome)
+    return {
+        'items': len(outcomes),
+        'succeeded': len(outcomes) - failed,
+        'failed': failed,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
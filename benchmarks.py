@@ -0,0 +1,389 @@
+"""
+Benchmarks for the analysis functions and the /analyze endpoint.
+
+Usage:
+    python benchmarks.py [--sizes small,medium] [--only NAME] [--repeat N]
+                         [--baseline FILE] [--tolerance FRACTION] [--save]
+
+Every benchmark runs on synthetic data from subproject1/data_sample.py at
+each of the given sizes (small, medium, large). The time is the best of
+--repeat runs; the memory is the peak traced by tracemalloc during one more
+run. Results are compared with the baseline file (default
+benchmark_baseline.json), and the script exits with status 1 when a time or
+peak memory exceeds its baseline by more than the tolerance (default 0.25,
+i.e. 25%). --save writes the results to the baseline file instead.
+"""
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent / 'subproject1'))
+sys.path.append(str(Path(__file__).parent / 'subproject2'))
+
+import app as web_app
+import plot_data
+import subproject1.scaling_features as scaling
+from subproject1.data_sample import make_scaling_data, make_text
+from subproject2.word_frequency import WordFrequencyAnalyzer
+
+SIZES = {
+    'small': {'rows': 1000, 'words': 10000, 'vocabulary': 1000},
+    'medium': {'rows': 50000, 'words': 200000, 'vocabulary': 5000},
+    'large': {'rows': 500000, 'words': 2000000, 'vocabulary': 20000},
+}
+DEFAULT_SIZES = ('small', 'medium')
+DEFAULT_BASELINE = Path(__file__).parent / 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are noise, whatever the ratio to the baseline
+MIN_SECONDS = 0.005
+MIN_PEAK_MB = 1.0
+
+BENCHMARKS = {}
+# Inputs shared by the runs of all benchmarks, by kind and size
+_inputs = {}
+
+
+def benchmark(name, sizes=tuple(SIZES)):
+    """
+    Register a benchmark. The decorated function takes a size's parameters
+    and a temporary directory and returns the function to time; it is
+    called again before every run, so each run gets fresh inputs.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, sizes)
+        return setup
+    return register
+
+
+def shared_input(key, make):
+    """The input under key, made on first use. Benchmarks must not modify it."""
+    if key not in _inputs:
+        _inputs[key] = make()
+    return _inputs[key]
+
+
+def scaling_data(size):
+    return shared_input(('scaling', size['rows']), lambda: make_scaling_data(
+        size['rows'], groups=20, posts=max(13, size['rows'] // 25), skew=1.0))
+
+
+def scaling_csv(size, temp_dir):
+    path = os.path.join(temp_dir, f"scaling_{size['rows']}.csv")
+    if not os.path.exists(path):
+        scaling_data(size).to_csv(path, index=False)
+    return path
+
+
+def text_sample(size):
+    return shared_input(('text', size['words'], size['vocabulary']),
+                        lambda: make_text(size['words'], vocabulary=size['vocabulary']))
+
+
+@benchmark('load_data')
+def bench_load_data(size, temp_dir):
+    path = scaling_csv(size, temp_dir)
+    return lambda: scaling.load_data(path)
+
+
+@benchmark('group_scale')
+def bench_group_scale(size, temp_dir):
+    df = scaling_data(size)
+    return lambda: scaling.group_scale(df, scaling.FEATURE_COLUMNS, 'post', 'minmax')
+
+
+@benchmark('calculate_normalized_averages')
+def bench_normalized_averages(size, temp_dir):
+    df = scaling.group_scale(scaling_data(size), scaling.FEATURE_COLUMNS, 'post', 'minmax')
+    return lambda: scaling.calculate_normalized_averages(df, 'post')
+
+
+@benchmark('grouped_minmax_scaling')
+def bench_grouped_minmax_scaling(size, temp_dir):
+    df = scaling_data(size)
+    levels = scaling.parse_groupings(['group', 'post', 'group/post'])
+    return lambda: list(scaling.grouped_minmax_scaling(df, scaling.FEATURE_COLUMNS, levels))
+
+
+@benchmark('process_file')
+def bench_process_file(size, temp_dir):
+    path = scaling_csv(size, temp_dir)
+    output_dir = tempfile.mkdtemp(dir=temp_dir)
+    return lambda: scaling.process_file(path, output_dir, export_format=None)
+
+
+# Whole-number ratings, as CSV files and the Excel reader give them, are scaled as floats
+@benchmark('process_file integer ratings', sizes=('small',))
+def bench_process_file_integer_ratings(size, temp_dir):
+    path = os.path.join(temp_dir, f"integer_ratings_{size['rows']}.csv")
+    if not os.path.exists(path):
+        df = scaling_data(size)
+        df.assign(valence=(df['valence'] * 1000).round().astype(int),
+                  arousal=(df['arousal'] * 1000).round().astype(int)).to_csv(path, index=False)
+    output_dir = tempfile.mkdtemp(dir=temp_dir)
+    return lambda: scaling.process_file(path, output_dir, export_format=None)
+
+
+# A dataset created from whole-number ratings keeps the fractions of the batches appended to it:
+# its scaled rows match process_file on all the rows together
+@benchmark('dataset append fractional ratings', sizes=('small',))
+def bench_dataset_append_fractional_ratings(size, temp_dir):
+    from subproject1.dataset_registry import DatasetRegistry, scaled_columns
+    df = scaling_data(size)
+    half = len(df) // 2
+    first = df.iloc[:half].assign(valence=df['valence'].iloc[:half].round().astype(int),
+                                  arousal=df['arousal'].iloc[:half].round().astype(int))
+    second = df.iloc[half:]
+    expected = shared_input(('fractional ratings', size['rows']), lambda: scaling.process_file(
+        pd.concat([first, second]).to_csv(index=False).encode(), tempfile.mkdtemp(dir=temp_dir),
+        export_format=None, file_format='.csv'))
+    registry = DatasetRegistry(tempfile.mkdtemp(dir=temp_dir))
+    dataset_id = registry.create(first.to_csv(index=False).encode(), '.csv')['info']['id']
+    content = second.to_csv(index=False).encode()
+
+    def run():
+        registry.append(dataset_id, content, '.csv')
+        for name, group_col in (('df_scaled_by_group', 'group'), ('df_scaled_by_post', 'post')):
+            columns = scaled_columns(group_col)
+            stored = registry.frame(dataset_id, name)[columns].to_numpy()
+            if not np.allclose(stored, expected[name]['data'][columns].to_numpy(), atol=1e-6, equal_nan=True):
+                raise RuntimeError(f"The appended dataset's {name} differs from process_file's")
+    return run
+
+
+@benchmark('process_file_lean')
+def bench_process_file_lean(size, temp_dir):
+    path = scaling_csv(size, temp_dir)
+    output_dir = tempfile.mkdtemp(dir=temp_dir)
+    return lambda: scaling.process_file(path, output_dir, export_format=None, lean=True)
+
+
+@benchmark('process_file_chunked')
+def bench_process_file_chunked(size, temp_dir):
+    path = scaling_csv(size, temp_dir)
+    output_dir = tempfile.mkdtemp(dir=temp_dir)
+    return lambda: scaling.process_file(path, output_dir, export_format='csv', chunksize=scaling.CHUNK_ROWS)
+
+
+# Writing .xlsx takes minutes at the large size
+@benchmark('write_excel', sizes=('small', 'medium'))
+def bench_write_excel(size, temp_dir):
+    df = scaling_data(size)
+    path = os.path.join(temp_dir, 'benchmark.xlsx')
+    return lambda: scaling.write_excel({'Sheet1': df}, path)
+
+
+@benchmark('plot_data sample')
+def bench_plot_data_sample(size, temp_dir):
+    df = scaling_data(size)
+    return lambda: plot_data.plot_data(df, 'valence', 'arousal', 'post', max_points=1000, mode='sample')
+
+
+@benchmark('count_words')
+def bench_count_words(size, temp_dir):
+    text = text_sample(size)
+    analyzer = WordFrequencyAnalyzer()
+    return lambda: analyzer.count_words(text)
+
+
+@benchmark('combine_similar_words')
+def bench_combine_similar_words(size, temp_dir):
+    analyzer = WordFrequencyAnalyzer()
+    counts = analyzer.count_words(text_sample(size))
+    table = pd.DataFrame(counts.most_common(), columns=['word', 'frequency'])
+    table['percentage'] = 0.0
+
+    def run():
+        analyzer.df = table
+        analyzer.combine_similar_words()
+    return run
+
+
+@benchmark('analyze_text')
+def bench_analyze_text(size, temp_dir):
+    text = text_sample(size)
+    analyzer = WordFrequencyAnalyzer()
+    return lambda: analyzer.analyze_text(text)
+
+
+def test_client(temp_dir):
+    """A test client of the app, without the result cache so every request does the work."""
+    return shared_input(('client', temp_dir), lambda: web_app.create_app({
+        'UPLOAD_FOLDER': os.path.join(temp_dir, 'uploads'),
+        'OUTPUT_FOLDER': os.path.join(temp_dir, 'output'),
+        'MAX_CONTENT_LENGTH': 1024 * 1024 * 1024,
+        # Flask 3.1 limits form fields to 500 KB; large texts are part of the benchmark
+        'MAX_FORM_MEMORY_SIZE': None,
+        'RESULT_CACHE_MAX_MB': 0,
+        'LOG_LEVEL': 'WARNING',
+    }).test_client())
+
+
+def post_analyze(client, data):
+    response = client.post('/analyze', data=data, content_type='multipart/form-data')
+    if response.status_code != 200:
+        raise RuntimeError(f"/analyze returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+@benchmark('/analyze word_counter')
+def bench_analyze_word_counter(size, temp_dir):
+    client = test_client(temp_dir)
+    text = text_sample(size)
+    return lambda: post_analyze(client, {'project_type': 'word_counter', 'text': text})
+
+
+@benchmark('/analyze scaling')
+def bench_analyze_scaling(size, temp_dir):
+    client = test_client(temp_dir)
+    with open(scaling_csv(size, temp_dir), 'rb') as f:
+        content = f.read()
+    return lambda: post_analyze(client, {'project_type': 'scaling',
+                                         'file': (io.BytesIO(content), 'data.csv')})
+
+
+def measure(setup, size, temp_dir, repeat):
+    """Best time of repeat runs and the peak traced memory (MB) of one more run."""
+    best = None
+    for _ in range(repeat):
+        run = setup(size, temp_dir)
+        # As timeit does, so garbage left by earlier benchmarks is not collected on the clock
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+
+    run = setup(size, temp_dir)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {'machine': None, 'results': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(result, reference, tolerance):
+    """Names of the measures ('time', 'memory') that regressed against the reference."""
+    regressions = []
+    if result['seconds'] > reference['seconds'] * (1 + tolerance) and \
+            result['seconds'] - reference['seconds'] > MIN_SECONDS:
+        regressions.append('time')
+    if result['peak_mb'] > reference['peak_mb'] * (1 + tolerance) and \
+            result['peak_mb'] - reference['peak_mb'] > MIN_PEAK_MB:
+        regressions.append('memory')
+    return regressions
+
+
+def change(value, reference):
+    return f"{(value / reference - 1) * 100:+.0f}%" if reference else ''
+
+
+def run_benchmarks(sizes, only, repeat, baseline, tolerance):
+    """Run the selected benchmarks, print them against the baseline and return (results, regressions)."""
+    results = {}
+    regressions = []
+    print(f"{'Benchmark':<46}{'Seconds':>10}{'Change':>9}{'Peak MB':>10}{'Change':>9}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, (setup, benchmark_sizes) in BENCHMARKS.items():
+            if only and only not in name:
+                continue
+            for size_name in sizes:
+                if size_name not in benchmark_sizes:
+                    continue
+                key = f'{name}[{size_name}]'
+                # The analysis functions report progress with print
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    seconds, peak_mb = measure(setup, SIZES[size_name], temp_dir, repeat)
+                result = results[key] = {'seconds': round(seconds, 4), 'peak_mb': round(peak_mb, 2)}
+
+                reference = baseline['results'].get(key)
+                status = ''
+                if reference:
+                    regressed = compare(result, reference, tolerance)
+                    if regressed:
+                        regressions.append((key, regressed))
+                        status = '  REGRESSION (' + ', '.join(regressed) + ')'
+                print(f"{key:<46}{seconds:>10.3f}{change(seconds, reference['seconds']) if reference else '':>9}"
+                      f"{peak_mb:>10.1f}{change(peak_mb, reference['peak_mb']) if reference else '':>9}{status}")
+    return results, regressions
+
+
+def main():
+    args = sys.argv[1:]
+    options = {}
+    for flag in ('--sizes', '--only', '--repeat', '--baseline', '--tolerance'):
+        if flag in args:
+            i = args.index(flag)
+            if i + 1 == len(args):
+                print(f"\nError: {flag} needs a value.")
+                print(__doc__)
+                sys.exit(1)
+            options[flag] = args[i + 1]
+            del args[i:i + 2]
+    save = '--save' in args
+    if save:
+        args.remove('--save')
+    sizes = options['--sizes'].split(',') if '--sizes' in options else list(DEFAULT_SIZES)
+    if args or any(size not in SIZES for size in sizes):
+        print(__doc__)
+        sys.exit(1)
+
+    baseline_path = options.get('--baseline', DEFAULT_BASELINE)
+    baseline = load_baseline(baseline_path)
+    if baseline['machine'] and baseline['machine'] != machine_info():
+        print(f"Note: the baseline was recorded on another machine: {baseline['machine']}\n")
+
+    results, regressions = run_benchmarks(sizes, options.get('--only'), int(options.get('--repeat', 3)),
+                                          baseline, float(options.get('--tolerance', DEFAULT_TOLERANCE)))
+
+    if save:
+        # Benchmarks not run this time keep their baseline
+        baseline['machine'] = machine_info()
+        baseline['results'].update(results)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {baseline_path}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {float(options.get('--tolerance', DEFAULT_TOLERANCE)):.0%}:")
+        for key, regressed in regressions:
+            print(f"- {key}: {', '.join(regressed)}")
+        sys.exit(1)
+    elif not baseline['results']:
+        print(f"\nNo baseline at {baseline_path}; run with --save to record one.")
+
+
+if __name__ == '__main__':
+    main()
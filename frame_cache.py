@@ -0,0 +1,159 @@
+"""
+In-memory cache of result DataFrames for browsing them page by page.
+Frames are kept in least recently used order up to a total size in bytes,
+together with the row orders of the columns they were sorted by and the
+factorized values of the columns they were filtered by, so a page only
+costs comparing integer codes and taking its rows, and with the encoded
+results of other computations on them, such as plot data. numpy and
+pandas are imported on first use, so importing the cache costs nothing.
+"""
+import threading
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ('frame', 'orders', 'codes', 'derived', 'nbytes')
+
+    def __init__(self, frame):
+        self.frame = frame
+        # (column, descending) -> row positions in sorted order
+        self.orders = {}
+        # column -> (code of every row, index of the distinct values)
+        self.codes = {}
+        # name -> bytes computed from the frame
+        self.derived = {}
+        self.nbytes = int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class FrameCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        # Loaded outside the lock; two requests for the same frame may both load it
+        frame = load()
+        if frame is None:
+            return None
+        entry = _Entry(frame)
+        self._add(key, entry, 0)
+        return entry
+
+    def _add(self, key, entry, nbytes):
+        """
+        Account nbytes more for entry, adding it (again, if it was evicted) if
+        it is not cached, and evict the least recently used entries.
+        """
+        with self._lock:
+            if key not in self._entries:
+                nbytes += entry.nbytes
+                if nbytes > self.max_bytes:
+                    # Too large to keep; served without caching
+                    return
+                self._entries[key] = entry
+            elif self._entries[key] is not entry:
+                # Replaced by another load of the same frame
+                return
+            self._bytes += nbytes
+            self._entries.move_to_end(key)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+            if self._bytes > self.max_bytes:
+                self._entries.clear()
+                self._bytes = 0
+
+    def _order(self, key, entry, column, descending):
+        order = entry.orders.get((column, descending))
+        if order is None:
+            values = entry.frame[column].reset_index(drop=True)
+            try:
+                order = values.sort_values(ascending=not descending, kind='stable').index.to_numpy()
+            except TypeError:
+                raise ValueError(f"Column {column} cannot be sorted")
+            entry.orders[(column, descending)] = order
+            self._add(key, entry, order.nbytes)
+            entry.nbytes += order.nbytes
+        return order
+
+    def _codes(self, key, entry, column):
+        codes = entry.codes.get(column)
+        if codes is None:
+            import pandas as pd
+            series = entry.frame[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Already factorized; compare with the categories in their own type
+                values, uniques = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                values, uniques = pd.factorize(series)
+            codes = entry.codes[column] = (values, pd.Index(uniques))
+            self._add(key, entry, values.nbytes)
+            entry.nbytes += values.nbytes
+        return codes
+
+    def derived(self, key, load, name, compute):
+        """
+        compute(frame) for the frame cached under key, loaded with load() on a
+        miss, kept with the frame under name until the frame is evicted.
+        compute returns bytes, such as an encoded response, which count
+        towards the frame's size. None if load() returns None.
+        """
+        entry = self._get(key, load)
+        if entry is None:
+            return None
+        value = entry.derived.get(name)
+        if value is None:
+            value = compute(entry.frame)
+            entry.derived[name] = value
+            self._add(key, entry, len(value))
+            entry.nbytes += len(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def page(self, key, load, offset=0, limit=100, columns=None, sort=None, filters=None):
+        """
+        A page of the frame cached under key, loaded with load() on a miss.
+        columns selects and orders the columns, sort names the column to sort
+        by ('-column' for descending) and filters maps columns to the values
+        to keep. Returns (rows matching the filters, the page's DataFrame), or
+        None if load() returns None. Raises ValueError for unknown columns.
+        """
+        entry = self._get(key, load)
+        if entry is None:
+            return None
+        import numpy as np
+        import pandas as pd
+        frame = entry.frame
+        columns = list(columns) if columns else list(frame.columns)
+        unknown = [col for col in columns + list(filters or {}) if col not in frame.columns]
+        descending = bool(sort) and sort.startswith('-')
+        sort = sort.lstrip('-') if sort else None
+        if sort and sort not in frame.columns:
+            unknown.append(sort)
+        if unknown:
+            raise ValueError(f"Unknown column: {', '.join(unknown)}. Choose from {', '.join(map(str, frame.columns))}.")
+
+        positions = self._order(key, entry, sort, descending) if sort else None
+        if filters:
+            mask = np.ones(len(frame), dtype=bool)
+            for col, values in filters.items():
+                codes, uniques = self._codes(key, entry, col)
+                if pd.api.types.is_numeric_dtype(uniques):
+                    values = pd.to_numeric(pd.Series(values), errors='coerce').dropna()
+                wanted = uniques.get_indexer(pd.Index(values).unique())
+                mask &= np.isin(codes, wanted[wanted >= 0])
+            positions = positions[mask[positions]] if positions is not None else np.flatnonzero(mask)
+        total = len(frame) if positions is None else len(positions)
+        rows = np.arange(offset, min(offset + limit, total)) if positions is None else positions[offset:offset + limit]
+        return total, frame.iloc[rows, [frame.columns.get_loc(col) for col in columns]]
@@ -0,0 +1,116 @@
+"""
+Encodings of the DataFrame pages /datasets/<id>/<frame> answers with,
+chosen by the request's ?format= or else its Accept header:
+
+    records  application/json                     a dict per row (the default, read by the frontend)
+    columns  application/vnd.columns+json         a list per column
+    arrow    application/vnd.apache.arrow.stream  Arrow IPC stream
+    msgpack  application/msgpack                  a list per column, when msgpack is installed
+
+The column-oriented formats convert the page a column at a time instead
+of building a dict per row and repeating the column names in each, and
+are streamed while they are encoded: the Arrow stream is written record
+batch by record batch from the DataFrame's own buffers.
+"""
+import io
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = {
+    'records': 'application/json',
+    'columns': 'application/vnd.columns+json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'msgpack': 'application/msgpack',
+}
+
+# Other names clients send for the formats
+ALIASES = {'application/x-msgpack': 'msgpack'}
+
+# Rows per record batch of an Arrow stream
+ARROW_BATCH_ROWS = 65536
+
+
+def available_formats():
+    """The formats this process can encode, the default first."""
+    return [name for name in FORMATS if name != 'msgpack' or msgpack is not None]
+
+
+def negotiate(requested, accept):
+    """
+    The format to answer in: requested (a ?format= value) if given, else the
+    best match of accept (the request's Accept header, as werkzeug parses
+    it) among the available formats, JSON records when nothing matches.
+    Returns None if the requested format is not available here, and raises
+    ValueError if there is no such format.
+    """
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown format: {requested}. Choose from {', '.join(FORMATS)}.")
+        return requested if requested in available_formats() else None
+    offers = {FORMATS[name]: name for name in available_formats()}
+    offers.update((mimetype, name) for mimetype, name in ALIASES.items() if name in offers.values())
+    return offers[accept.best_match(list(offers), default=FORMATS['records'])]
+
+
+def column_values(series):
+    """A column's values as a list of Python objects, None where they are missing."""
+    values = series.tolist()
+    if series.hasnans:
+        import numpy as np
+        for i in np.flatnonzero(series.isna().to_numpy()):
+            values[i] = None
+    return values
+
+
+def columns_json(meta, df, dumps=json.dumps):
+    """Chunks of the JSON object meta with the 'columns' of df and their values as 'data' lists, a column at a time."""
+    columns = [str(col) for col in df.columns]
+    yield dumps({**meta, 'columns': columns})[:-1] + ', "data": {'
+    for i, col in enumerate(df.columns):
+        yield (', ' if i else '') + dumps(columns[i]) + ': ' + dumps(column_values(df[col]))
+    yield '}}'
+
+
+def columns_msgpack(meta, df):
+    """meta with the 'columns' of df and their values as 'data' lists, packed with msgpack."""
+    columns = [str(col) for col in df.columns]
+    data = {name: column_values(df[col]) for name, col in zip(columns, df.columns)}
+    return msgpack.packb({**meta, 'columns': columns, 'data': data}, use_bin_type=True, default=str)
+
+
+def arrow_table(meta, df):
+    """
+    df as an Arrow table sharing its buffers where the types allow, with
+    meta as JSON in the schema's 'meta' metadata. Raises ValueError for
+    columns Arrow cannot hold, such as ones of mixed types.
+    """
+    import pyarrow as pa
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"The frame cannot be sent as Arrow ({e}); choose another format.")
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'meta'] = json.dumps(meta, default=str).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def arrow_stream(table, batch_rows=ARROW_BATCH_ROWS):
+    """Chunks of the Arrow IPC stream of table: the schema, then a record batch at a time."""
+    import pyarrow as pa
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
@@ -0,0 +1,17 @@
+"""
+gunicorn settings, read automatically when gunicorn starts in this folder.
+The app is created once in the master process, which also imports the
+analysis modules (pandas, scikit-learn, matplotlib) before forking, so
+workers boot without importing them and share those pages copy-on-write.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+preload_app = os.environ.get('PRELOAD_APP', 'true').lower() in ('1', 'true', 'yes')
+
+
+def on_starting(server):
+    if preload_app:
+        from app import warm_up
+        warm_up()
@@ -0,0 +1,236 @@
+"""
+Timing of analysis stages, with next to no overhead while disabled.
+
+Code marks a stage with
+
+    with stage('load') as timer:
+        df = ...
+        timer.rows = len(df)
+
+While enabled, every stage adds its duration, its rows and the process'
+peak memory to process-wide totals, which prometheus_text() renders for
+/metrics, and its duration to the current recording (see record()), which
+/analyze sends as a Server-Timing header. While disabled, stage() returns a
+shared no-op context manager.
+
+With share(path), every process also keeps its totals in the SQLite file at
+path, and prometheus_text() reports the totals of all of them together, so
+any gunicorn worker answers a scrape with the same counters.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the peak memory is not reported there
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS stage_totals (process TEXT NOT NULL, stage TEXT NOT NULL, runs INTEGER NOT NULL,
+                                         seconds REAL NOT NULL, rows INTEGER, peak_memory INTEGER NOT NULL,
+                                         PRIMARY KEY (process, stage));
+'''
+
+_enabled = False
+_lock = threading.Lock()
+# Stage name -> [runs, seconds, rows (None if not counted), peak memory in bytes]
+_totals = {}
+# The SQLite file the totals are shared in, this process' connection to it and its key there
+_shared_path = None
+_connection = None
+_connection_pid = None
+_process_key = None
+_key_pid = None
+# Timings of the stages run in the current context, if recorded
+_recording = contextvars.ContextVar('recording', default=None)
+
+
+class _NullTimer:
+    """Stands in for a stage timer while instrumentation is disabled; rows set on it are ignored."""
+    rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ('name', 'rows', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        peak = peak_memory_bytes() or 0
+        with _lock:
+            connection = _shared_connection() if _shared_path is not None else None
+            totals = _totals.setdefault(self.name, [0, 0.0, None, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            if self.rows is not None:
+                totals[2] = (totals[2] or 0) + self.rows
+            totals[3] = max(totals[3], peak)
+            if connection is not None:
+                try:
+                    connection.execute('INSERT OR REPLACE INTO stage_totals VALUES (?, ?, ?, ?, ?, ?)',
+                                       (_process_key, self.name, *totals))
+                except sqlite3.Error as e:
+                    logger.warning("Could not share the totals of stage %s: %s", self.name, e)
+        recording = _recording.get()
+        if recording is not None:
+            recording.append((self.name, seconds))
+        return False
+
+
+def enable(flag=True):
+    """Turn stage timing on or off for the whole process."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def enabled():
+    return _enabled
+
+
+def share(path):
+    """Share the totals of the processes using the SQLite file at path (None stops sharing)."""
+    global _shared_path, _connection_pid
+    with _lock:
+        _shared_path = str(path) if path is not None else None
+        _connection_pid = None
+
+
+def _shared_connection():
+    """
+    This process' connection to the shared totals, or None if it cannot be
+    opened; called with _lock held. A forked process opens its own and
+    starts its totals afresh, since its parent's are shared already.
+    """
+    global _connection, _connection_pid, _process_key, _key_pid
+    if _connection_pid != os.getpid():
+        if _key_pid != os.getpid():
+            if _key_pid is not None:
+                _totals.clear()
+            # Not the pid alone: the totals of a process that exited must not be replaced by a new one with its pid
+            _process_key = f'{os.getpid()}-{uuid.uuid4().hex}'
+            _key_pid = os.getpid()
+        try:
+            _connection = sqlite3.connect(_shared_path, timeout=30, isolation_level=None, check_same_thread=False)
+            _connection.execute('PRAGMA journal_mode=WAL')
+            _connection.execute('PRAGMA synchronous=NORMAL')
+            _connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            logger.warning("Could not open the shared stage totals %s: %s", _shared_path, e)
+            _connection = None
+        _connection_pid = os.getpid()
+    return _connection
+
+
+def stage(name):
+    """Context manager timing the stage name; set rows on it to count the rows processed."""
+    return _StageTimer(name) if _enabled else _NULL_TIMER
+
+
+@contextlib.contextmanager
+def record():
+    """Collect the (stage, seconds) timings of the stages run in the current context into a list."""
+    timings = []
+    token = _recording.set(timings)
+    try:
+        yield timings
+    finally:
+        _recording.reset(token)
+
+
+def peak_memory_bytes():
+    """Peak resident memory of the process in bytes, or None where it is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def server_timing(timings, total=None):
+    """Server-Timing header value for recorded timings; a stage run several times is summed."""
+    durations = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    if total is not None:
+        durations['total'] = total
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in durations.items())
+
+
+def _all_totals():
+    """(stage name, [runs, seconds, rows, peak memory]) pairs of this process, or of all sharing processes."""
+    with _lock:
+        connection = _shared_connection() if _shared_path is not None else None
+        if connection is not None:
+            try:
+                rows = connection.execute('SELECT stage, SUM(runs), SUM(seconds), SUM(rows), MAX(peak_memory) '
+                                          'FROM stage_totals GROUP BY stage ORDER BY stage').fetchall()
+                return [(name, list(values)) for name, *values in rows]
+            except sqlite3.Error as e:
+                logger.warning("Could not read the shared stage totals: %s", e)
+        return sorted((name, list(values)) for name, values in _totals.items())
+
+
+def prometheus_text():
+    """
+    The stage totals and the peak memory in the Prometheus text exposition
+    format: of all processes sharing their totals (see share()), else of
+    this process. The peak memory is that of the largest process.
+    """
+    totals = _all_totals()
+    lines = [
+        '# HELP analysis_stage_seconds Time spent in each analysis stage.',
+        '# TYPE analysis_stage_seconds summary',
+    ]
+    for name, (runs, seconds, _, _) in totals:
+        lines.append(f'analysis_stage_seconds_count{{stage="{name}"}} {runs}')
+        lines.append(f'analysis_stage_seconds_sum{{stage="{name}"}} {seconds:.6f}')
+    lines += [
+        '# HELP analysis_stage_rows_total Rows (words for text) processed by each analysis stage.',
+        '# TYPE analysis_stage_rows_total counter',
+    ]
+    lines += [f'analysis_stage_rows_total{{stage="{name}"}} {rows}'
+              for name, (_, _, rows, _) in totals if rows is not None]
+    peak = peak_memory_bytes()
+    if peak is not None:
+        peak = max([peak] + [memory for _, (_, _, _, memory) in totals])
+        lines += [
+            '# HELP analysis_stage_peak_memory_bytes Peak resident memory of the (largest) process when each stage ended.',
+            '# TYPE analysis_stage_peak_memory_bytes gauge',
+        ]
+        lines += [f'analysis_stage_peak_memory_bytes{{stage="{name}"}} {memory}'
+                  for name, (_, _, _, memory) in totals]
+        lines += [
+            '# HELP process_peak_resident_memory_bytes Peak resident memory of the (largest) process.',
+            '# TYPE process_peak_resident_memory_bytes gauge',
+            f'process_peak_resident_memory_bytes {peak}',
+        ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,159 @@
+"""
+Job queue for running analyses in the background.
+Jobs run on a bounded thread pool in the worker process that accepted them;
+their state is kept in a SQLite file, so any worker process can report it.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, project_type TEXT, status TEXT NOT NULL,
+                                 pid INTEGER NOT NULL, submitted_at REAL NOT NULL, started_at REAL,
+                                 finished_at REAL, result TEXT, error TEXT);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, submitted_at);
+'''
+COLUMNS = ('job_id', 'project_type', 'status', 'pid', 'submitted_at', 'started_at', 'finished_at', 'result', 'error')
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds its maximum number of pending jobs."""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobQueue:
+    def __init__(self, path, max_workers=2, max_pending=16, max_jobs=1000):
+        """Jobs tracked in the SQLite file at path, shared by the processes using the same path."""
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        # Pending jobs of all processes together
+        self.max_pending = max_pending
+        # Finished jobs beyond this number are forgotten, oldest first
+        self.max_jobs = max_jobs
+        self.lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        """This process' connection (one opened before a fork is not used in the child), shared under self.lock."""
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    def _update(self, job_id, **values):
+        with self.lock:
+            self._connect().execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in values)} WHERE job_id = ?",
+                                    (*values.values(), job_id))
+
+    def submit(self, project_type, fn, *args, cleanup=None, job_id=None):
+        """
+        Queue fn(*args) and return the job ID (a new one unless job_id is given).
+        cleanup, if given, is called once the job has finished either way.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        with self.lock:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._fail_orphans(connection)
+                pending = connection.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+                if pending >= self.max_pending:
+                    raise QueueFullError(f"Too many pending jobs ({pending}). Please try again later.")
+                connection.execute("INSERT INTO jobs (job_id, project_type, status, pid, submitted_at) "
+                                   "VALUES (?, ?, 'queued', ?, ?)", (job_id, project_type, os.getpid(), time.time()))
+                self._forget_old_jobs(connection)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+        self.executor.submit(self._run, job_id, fn, args, cleanup)
+        return job_id
+
+    def _run(self, job_id, fn, args, cleanup):
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            result = json.dumps(fn(*args), default=str)
+            self._update(job_id, status='finished', finished_at=time.time(), result=result)
+        except BaseException as e:
+            # SystemExit and the like fail the job too rather than leaving it running for good
+            error = str(e) if isinstance(e, Exception) else f"The analysis exited ({type(e).__name__}: {e})"
+            logger.error("Error in job %s: %s", job_id, error)
+            self._update(job_id, status='failed', finished_at=time.time(), error=error)
+        finally:
+            if cleanup is not None:
+                try:
+                    cleanup()
+                except Exception as e:
+                    logger.warning("Cleanup failed for job %s: %s", job_id, e)
+
+    def _fail_orphans(self, connection):
+        """Fail the pending jobs of worker processes that are gone, so they stop counting as pending."""
+        rows = connection.execute("SELECT job_id, pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        orphans = [(time.time(), job_id) for job_id, pid in rows if not _pid_alive(pid)]
+        connection.executemany("UPDATE jobs SET status = 'failed', finished_at = ?, "
+                               "error = 'The worker process running the job exited' WHERE job_id = ?", orphans)
+
+    def _forget_old_jobs(self, connection):
+        excess = connection.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] - self.max_jobs
+        if excess > 0:
+            connection.execute("DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE status IN "
+                               "('finished', 'failed') ORDER BY submitted_at LIMIT ?)", (excess,))
+
+    def get(self, job_id):
+        """Return the job record, or None for an unknown job."""
+        with self.lock:
+            row = self._connect().execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE job_id = ?",
+                                          (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(COLUMNS, row))
+        if job['status'] in ('queued', 'running') and not _pid_alive(job['pid']):
+            with self.lock:
+                self._fail_orphans(self._connect())
+            return self.get(job_id)
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def status(self, job_id):
+        """Return the job's status and timing information, or None for an unknown job."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        now = time.time()
+        started = job['started_at']
+        finished = job['finished_at']
+        return {
+            'job_id': job_id,
+            'project_type': job['project_type'],
+            'status': job['status'],
+            'submitted_at': job['submitted_at'],
+            'started_at': started,
+            'finished_at': finished,
+            'queue_seconds': round((started or now) - job['submitted_at'], 3),
+            'run_seconds': round((finished or now) - started, 3) if started else None,
+            'error': job['error'],
+        }
@@ -0,0 +1,92 @@
+"""
+Background garbage collection of per-job output folders.
+Each analysis writes into its own subfolder of the output directory; the
+sweeper removes the oldest ones once they exceed an age or total-size quota.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _entry_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class OutputSweeper:
+    def __init__(self, output_dir, max_age_seconds=60 * 60, max_bytes=1024 * 1024 * 1024,
+                 min_age_seconds=60, interval_seconds=300):
+        self.output_dir = output_dir
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        # Outputs younger than this are never removed, so running jobs keep theirs
+        self.min_age_seconds = min_age_seconds
+        self.interval_seconds = interval_seconds
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def sweep(self):
+        """Remove expired outputs, then the oldest ones until under the size quota."""
+        now = time.time()
+        entries = []
+        total = 0
+        for name in os.listdir(self.output_dir):
+            # Hidden files such as the job database are not outputs
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.output_dir, name)
+            try:
+                age = now - os.path.getmtime(path)
+            except OSError:
+                continue
+            if age > self.max_age_seconds and age >= self.min_age_seconds:
+                _remove(path)
+                continue
+            size = _entry_size(path)
+            total += size
+            if age >= self.min_age_seconds:
+                entries.append((age, size, path))
+
+        for age, size, path in sorted(entries, reverse=True):
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning("Output sweep failed: %s", e)
+
+    def start(self):
+        """Start sweeping in a daemon thread, unless this process already is."""
+        with self._lock:
+            # A thread started before a fork does not exist in the child
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='output-sweeper', daemon=True)
+                self._thread.start()
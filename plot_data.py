@@ -0,0 +1,174 @@
+"""
+Scatter plot data for result frames too large to send point by point.
+
+Under a point budget the points of a zoom window are sent exactly; above
+it they are summarized, either as a 2D histogram of the window (density)
+or as a downsample that keeps the points that stand out most within every
+key's share of the budget (sample). Points are sent as columns, x, y and
+the code of each point's key, so a million posts cost three lists rather
+than a million traces.
+
+The downsample is Largest-Triangle-Three-Buckets in its vectorized form:
+the points of a key are sorted by x and cut into as many buckets as the
+key may keep, and each bucket keeps the point making the largest triangle
+with the averages of the buckets before and after it (LTTB proper uses
+the point kept in the bucket before, which makes it sequential).
+"""
+import numpy as np
+import pandas as pd
+
+# Bins per axis of a density grid, by default and at most
+DENSITY_BINS = 200
+MAX_DENSITY_BINS = 1000
+
+# How points over the budget are summarized
+PLOT_MODES = ('density', 'sample')
+
+
+def default_axes(columns, normalized=False):
+    """
+    The x (valence) and y (arousal) columns to plot a frame with columns by:
+    its scaled columns, or the normalized ones of an averages frame with
+    normalized, else the features themselves. Raises ValueError if neither.
+    """
+    axes = []
+    for feature in ('valence', 'arousal'):
+        scaled = [col for col in columns if str(col).startswith(f'{feature}_scaled_by_')]
+        preferred = [col for col in scaled if str(col).endswith('_normalized') == normalized]
+        if preferred or scaled:
+            axes.append((preferred or scaled)[0])
+        elif feature in columns:
+            axes.append(feature)
+        else:
+            raise ValueError(f"No {feature} column to plot; choose x and y columns.")
+    return tuple(axes)
+
+
+def _window(xs, ys, x_range, y_range):
+    """The x and y ranges to plot: the ones given, else the extent of the points."""
+    ranges = []
+    for values, given in ((xs, x_range), (ys, y_range)):
+        if given is None:
+            given = (float(values.min()), float(values.max())) if len(values) else (0.0, 0.0)
+        ranges.append((float(given[0]), float(given[1])))
+    return ranges
+
+
+def _key_codes(keys):
+    """Codes of each value of keys in sorted order, missing values included as a key of their own."""
+    try:
+        return pd.factorize(keys, sort=True, use_na_sentinel=False)
+    except TypeError:
+        return pd.factorize(keys, use_na_sentinel=False)
+
+
+def _quotas(counts, budget):
+    """Points each key may keep: budget shared in proportion to counts, largest remainders first."""
+    share = counts * (budget / max(counts.sum(), 1))
+    quotas = np.minimum(np.floor(share).astype(np.int64), counts)
+    spare = budget - quotas.sum()
+    if spare > 0:
+        remainder = np.where(quotas < counts, share - quotas, -1)
+        extra = np.argsort(-remainder, kind='stable')[:spare]
+        quotas[extra[remainder[extra] >= 0]] += 1
+    return quotas
+
+
+def lttb_sample(xs, ys, codes, budget):
+    """
+    Positions of at most budget points of xs and ys to keep, shared among the
+    keys given by codes (0..n-1) in proportion to their points and chosen
+    with vectorized LTTB within every key (see the module docstring).
+    """
+    n_keys = int(codes.max()) + 1 if len(codes) else 0
+    counts = np.bincount(codes, minlength=n_keys)
+    quotas = _quotas(counts, budget)
+    # Points of each key in order of x (a stable sort of small integers is a radix sort); rank is a
+    # point's place within its key
+    order = np.argsort(xs, kind='stable')
+    order = order[np.argsort(codes[order].astype(np.min_scalar_type(-max(n_keys, 1))), kind='stable')]
+    sorted_codes = codes[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(order)) - starts[sorted_codes]
+    n, q = counts[sorted_codes], quotas[sorted_codes]
+
+    # Bucket of every point within its key: the first and the last point are buckets of their own
+    middle = 1 + (rank - 1) * np.maximum(q - 2, 0) // np.maximum(n - 2, 1)
+    bucket = np.where(rank == 0, 0, np.where(rank == n - 1, np.maximum(q - 1, 0), middle))
+    bucket = np.where(q >= n, rank, np.where(q <= 1, 0, bucket))
+    kept = q > 0
+    order, bucket, sorted_codes = order[kept], bucket[kept], sorted_codes[kept]
+    bucket += np.concatenate(([0], np.cumsum(quotas)[:-1]))[sorted_codes]
+
+    # Largest triangle with the average points of the neighboring buckets of the same key
+    n_buckets = int(quotas.sum())
+    sizes = np.maximum(np.bincount(bucket, minlength=n_buckets), 1)
+    mean_x = np.bincount(bucket, weights=xs[order], minlength=n_buckets) / sizes
+    mean_y = np.bincount(bucket, weights=ys[order], minlength=n_buckets) / sizes
+    before = np.maximum(bucket - 1, 0)
+    after = np.minimum(bucket + 1, n_buckets - 1)
+    area = np.abs((mean_x[before] - mean_x[after]) * (ys[order] - mean_y[before])
+                  - (mean_x[before] - xs[order]) * (mean_y[after] - mean_y[before]))
+    # Buckets follow each other in order and none is empty, so the first largest area of each is kept
+    largest = np.maximum.reduceat(area, np.flatnonzero(np.diff(bucket, prepend=-1))) if len(area) else area
+    best = np.flatnonzero(area == largest[bucket])
+    best = best[np.diff(bucket[best], prepend=-1) != 0]
+    return np.sort(order[best])
+
+
+def plot_data(frame, x, y, by=None, x_range=None, y_range=None, max_points=5000, mode='density',
+              bins=DENSITY_BINS):
+    """
+    The points of frame's x and y columns within x_range and y_range (each a
+    (low, high) pair, default the extent of the points), colored by the
+    values of column by. Up to max_points points are returned exactly;
+    beyond, mode 'density' returns a bins x bins histogram of the window and
+    'sample' an LTTB downsample of max_points points. Returns a dict ready
+    for JSON: 'total' points in the window, the 'window', the 'mode' used
+    ('points', 'sample' or 'density'), and 'points' (x, y and, with by, the
+    index of each point's value in 'keys') or 'density' (the bin edges and
+    counts[y bin][x bin]). Raises ValueError for unknown columns or modes.
+    """
+    unknown = [col for col in (x, y, by) if col is not None and col not in frame.columns]
+    if unknown:
+        raise ValueError(f"Unknown column: {', '.join(map(str, unknown))}. "
+                         f"Choose from {', '.join(map(str, frame.columns))}.")
+    if mode not in PLOT_MODES:
+        raise ValueError(f"Unknown plot mode: {mode}. Choose from {', '.join(PLOT_MODES)}.")
+    try:
+        xs = frame[x].to_numpy(dtype=float)
+        ys = frame[y].to_numpy(dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"Columns {x} and {y} must be numeric to plot them.")
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    (x0, x1), (y0, y1) = _window(xs[keep], ys[keep], x_range, y_range)
+    keep &= (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+    positions = np.flatnonzero(keep)
+    xs, ys = xs[positions], ys[positions]
+    result = {'total': len(positions), 'window': {'x': [x0, x1], 'y': [y0, y1]}}
+
+    if len(positions) > max_points and mode == 'density':
+        bins = max(1, min(int(bins), MAX_DENSITY_BINS))
+        # An empty range still gets bins around its single value
+        edges_range = [(x0, x1) if x1 > x0 else (x0 - 0.5, x0 + 0.5), (y0, y1) if y1 > y0 else (y0 - 0.5, y0 + 0.5)]
+        counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=bins, range=edges_range)
+        result['mode'] = 'density'
+        result['density'] = {'x': x_edges.tolist(), 'y': y_edges.tolist(),
+                             'counts': counts.T.astype(np.int64).tolist()}
+        return result
+
+    codes, keys = _key_codes(frame[by].take(positions)) if by is not None else (None, None)
+    if len(positions) > max_points:
+        sample = lttb_sample(xs, ys, codes if codes is not None else np.zeros(len(xs), dtype=np.intp), max_points)
+        xs, ys = xs[sample], ys[sample]
+        codes = codes[sample] if codes is not None else None
+        result['mode'] = 'sample'
+    else:
+        result['mode'] = 'points'
+    result['points'] = {'x': xs.tolist(), 'y': ys.tolist()}
+    if codes is not None:
+        # Only the keys of the points sent
+        codes, present = pd.factorize(codes, sort=True)
+        result['points']['key'] = codes.tolist()
+        result['keys'] = [None if pd.isna(key) else key for key in pd.Index(keys).take(present).tolist()]
+    return result
@@ -0,0 +1,122 @@
+"""
+Content-addressed cache of analysis results.
+Each entry is a directory named after the hash of the analysis input and
+parameters, holding the JSON response and copies of the generated files.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bump when the analysis output changes so old entries are not served
+CACHE_VERSION = '2'
+
+
+def cache_key(project_type, params, data=None, path=None, stream=None):
+    """Hash the project type, parameters and input bytes (given directly, as a file path or as a binary stream)."""
+    digest = hashlib.sha256()
+    header = {'version': CACHE_VERSION, 'project_type': project_type, 'params': params}
+    digest.update(json.dumps(header, sort_keys=True).encode('utf-8'))
+    if data is not None:
+        digest.update(data)
+    if path is not None:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    if stream is not None:
+        stream.seek(0)
+        for block in iter(lambda: stream.read(1 << 20), b''):
+            digest.update(block)
+        stream.seek(0)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, ttl_seconds=24 * 60 * 60):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, output_dir):
+        """
+        Return the cached response for key, or None on a miss.
+        The cached files are copied back into output_dir.
+        """
+        if not self.enabled:
+            return None
+        entry_dir = self._entry_dir(key)
+        try:
+            if time.time() - os.path.getmtime(entry_dir) > self.ttl_seconds:
+                return None
+            with open(os.path.join(entry_dir, 'response.json'), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            os.makedirs(output_dir, exist_ok=True)
+            for filename in os.listdir(os.path.join(entry_dir, 'files')):
+                shutil.copyfile(os.path.join(entry_dir, 'files', filename), os.path.join(output_dir, filename))
+            # Mark the entry as recently used for LRU eviction
+            os.utime(entry_dir)
+            return payload
+        except (OSError, ValueError):
+            # Missing, expired or evicted while reading
+            return None
+
+    def put(self, key, payload, output_dir, filenames):
+        """Store the response and the named files from output_dir, then evict old entries."""
+        if not self.enabled:
+            return
+        staging_dir = tempfile.mkdtemp(prefix='.staging-', dir=self.cache_dir)
+        try:
+            os.makedirs(os.path.join(staging_dir, 'files'))
+            for filename in filenames:
+                shutil.copyfile(os.path.join(output_dir, filename), os.path.join(staging_dir, 'files', filename))
+            with open(os.path.join(staging_dir, 'response.json'), 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+
+            entry_dir = self._entry_dir(key)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(staging_dir, entry_dir)
+        except OSError as e:
+            logger.warning("Could not cache result %s: %s", key, e)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under the size limit."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if name.startswith('.staging-'):
+                continue
+            try:
+                mtime = os.path.getmtime(entry_dir)
+                if now - mtime > self.ttl_seconds:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    continue
+                size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(entry_dir, 'files')))
+                size += os.path.getsize(os.path.join(entry_dir, 'response.json'))
+            except OSError:
+                continue
+            entries.append((mtime, size, entry_dir))
+
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
@@ -0,0 +1,78 @@
+"""
+Compare the Excel readers of scaling_features with pandas.read_excel.
+
+Usage:
+    python benchmark_excel.py [rows] [extra_columns]
+
+Writes a workbook with the required columns plus extra_columns text
+columns, checks that every reader returns the same data, and prints how
+long each one takes.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from scaling_features import REQUIRED_COLUMNS, read_excel, read_excel_columns, write_excel
+
+
+def make_workbook(path, rows, extra_columns):
+    """Write a workbook of random group/post/valence/arousal data plus text columns."""
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'group': rng.integers(1, 20, rows),
+        'post': [f'{i}M' for i in rng.integers(0, 500, rows)],
+        'valence': rng.normal(size=rows).round(3),
+        'arousal': rng.normal(size=rows).round(3),
+    })
+    for i in range(extra_columns):
+        df[f'note_{i}'] = [f'comment {j}' for j in rng.integers(0, 1000, rows)]
+    write_excel({'Sheet1': df}, path)
+
+
+def best_time(fn, repeat=3):
+    """Best wall time of repeat runs, and the last result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    extra_columns = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'benchmark.xlsx')
+        print(f"Writing {rows} rows with {len(REQUIRED_COLUMNS) + extra_columns} columns...")
+        make_workbook(path, rows, extra_columns)
+
+        readers = [
+            ('pandas.read_excel', lambda: pd.read_excel(path)),
+            ('read_excel_columns', lambda: read_excel_columns(path)),
+            ('pandas.read_excel, required columns', lambda: pd.read_excel(path, usecols=REQUIRED_COLUMNS)),
+            ('read_excel, required columns', lambda: read_excel(path, usecols=REQUIRED_COLUMNS)),
+        ]
+        timings = []
+        for name, reader in readers:
+            seconds, df = best_time(reader)
+            timings.append((name, seconds, df))
+
+    # Readers of the same columns must agree
+    pd.testing.assert_frame_equal(timings[0][2], timings[1][2])
+    pd.testing.assert_frame_equal(timings[2][2], timings[3][2])
+
+    baseline = timings[0][1]
+    print(f"\n{'Reader':<40}{'Seconds':>10}{'Speedup':>10}")
+    for name, seconds, _ in timings:
+        print(f"{name:<40}{seconds:>10.2f}{baseline / seconds:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
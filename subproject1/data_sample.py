@@ -1,3 +1,17 @@
+"""
+Sample and synthetic data for the scaling and word counter projects.
+
+Usage:
+    python data_sample.py
+    python data_sample.py <rows> [groups] [posts] [skew]
+    python data_sample.py --text <words> [vocabulary] [hebrew_share]
+
+Without arguments, writes the small sample_data.csv and
+sample_data_expanded.csv files. With a row count, writes synthetic_data.csv
+with that many rows; with --text, writes synthetic_text.txt.
+"""
+import sys
+
 import pandas as pd
 import numpy as np
 
@@ -9,39 +23,142 @@ data = {
     'arousal': [0.018, 0.027, 0.044, 0.025, 0.049, 0.03, 0.036, 0.029, 0.054, 0.025, 0.04, 0.032, 0.035]
 }
 
-# Create DataFrame
-df = pd.DataFrame(data)
+ENGLISH_LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+HEBREW_LETTERS = 'אבגדהוזחטיכלמנסעפצקרשת'
+# Plural endings used to write a word as a variant of itself
+VARIANT_SUFFIXES = {ENGLISH_LETTERS: 's', HEBREW_LETTERS: 'ים'}
 
-# Save to CSV
-df.to_csv('sample_data.csv', index=False)
-print("Sample data has been saved to 'sample_data.csv'")
 
-# created simulated data for testing where it expanded to at least three different values in arousal and valance per each post
-# Create expanded sample data with multiple measurements per post
-expanded_data = {
-    'group': [],
-    'post': [],
-    'valence': [],
-    'arousal': []
-}
+def sample_data():
+    """The small sample data set, one row per post."""
+    return pd.DataFrame(data)
+
+
+def expanded_sample_data():
+    """The sample data with three measurements per post, each within ±20% of the original."""
+    expanded_data = {
+        'group': [],
+        'post': [],
+        'valence': [],
+        'arousal': []
+    }
+
+    # For each original row, create 3 measurements with some random variation
+    np.random.seed(42)  # For reproducibility
+    for group, post, val, aro in zip(data['group'], data['post'], data['valence'], data['arousal']):
+        for _ in range(3):  # Create 3 measurements per post
+            expanded_data['group'].append(group)
+            expanded_data['post'].append(post)
+            # Add random variation to valence and arousal (±20%)
+            expanded_data['valence'].append(val + np.random.uniform(-0.2 * abs(val), 0.2 * abs(val)))
+            expanded_data['arousal'].append(aro + np.random.uniform(-0.2 * abs(aro), 0.2 * abs(aro)))
+
+    # Create expanded DataFrame
+    df_expanded = pd.DataFrame(expanded_data)
+
+    # Round values to 3 decimal places
+    df_expanded['valence'] = df_expanded['valence'].round(3)
+    df_expanded['arousal'] = df_expanded['arousal'].round(3)
+    return df_expanded
+
+
+def make_scaling_data(rows, groups=3, posts=13, skew=1.0, seed=42):
+    """
+    Synthetic group/post/valence/arousal data with the given number of rows.
+    Every post belongs to one group, and group sizes follow a Zipf-like law:
+    group g gets a share proportional to 1 / g**skew (skew 0 gives equal
+    groups). Values scatter around a level of their own for each post, in
+    the range of the sample data.
+    """
+    rng = np.random.default_rng(seed)
+    posts = max(posts, groups)
+    weights = 1.0 / np.arange(1, groups + 1) ** skew
+    row_groups = rng.choice(groups, size=rows, p=weights / weights.sum())
+
+    # Post p belongs to group p % groups; pick one of the group's posts at random
+    posts_per_group = np.bincount(np.arange(posts) % groups, minlength=groups)
+    row_posts = row_groups + (rng.random(rows) * posts_per_group[row_groups]).astype(int) * groups
+    post_names = np.array([f'{p % groups + 1}P{p}' for p in range(posts)], dtype=object)
+
+    post_valence = rng.normal(-0.04, 0.01, posts)
+    post_arousal = rng.normal(0.035, 0.01, posts)
+    return pd.DataFrame({
+        'group': row_groups + 1,
+        'post': post_names[row_posts],
+        'valence': (post_valence[row_posts] + rng.normal(0, 0.008, rows)).round(3),
+        'arousal': (post_arousal[row_posts] + rng.normal(0, 0.008, rows)).round(3),
+    })
+
+
+def make_vocabulary(size, hebrew_share=0.5, seed=42):
+    """size distinct synthetic words of 3 to 8 letters; hebrew_share of them are Hebrew."""
+    rng = np.random.default_rng(seed)
+    hebrew_words = int(round(size * hebrew_share))
+    vocabulary = []
+    seen = set()
+    for letters, count in ((HEBREW_LETTERS, hebrew_words), (ENGLISH_LETTERS, size - hebrew_words)):
+        words = []
+        while len(words) < count:
+            lengths = rng.integers(3, 9, count - len(words))
+            codes = rng.integers(0, len(letters), (len(lengths), 8))
+            for length, row in zip(lengths, codes):
+                word = ''.join(letters[i] for i in row[:length])
+                if word not in seen:
+                    seen.add(word)
+                    words.append(word)
+        vocabulary.extend((word, VARIANT_SUFFIXES[letters]) for word in words)
+    return vocabulary
+
+
+def make_text(words, vocabulary=5000, hebrew_share=0.5, variant_share=0.1, skew=1.1,
+              seed=42, words_per_line=12):
+    """
+    Synthetic text of the given number of words, drawn from a vocabulary of
+    that many distinct words with Zipf-distributed frequencies (exponent
+    skew). hebrew_share of the vocabulary is Hebrew, and variant_share of
+    the words are written in plural, so there are similar words to combine.
+    """
+    rng = np.random.default_rng(seed)
+    entries = make_vocabulary(vocabulary, hebrew_share, seed)
+    rng.shuffle(entries)
+    base_words = np.array([word for word, _ in entries], dtype=object)
+    variants = np.array([word + suffix for word, suffix in entries], dtype=object)
+
+    weights = 1.0 / np.arange(1, len(entries) + 1) ** skew
+    chosen = rng.choice(len(entries), size=words, p=weights / weights.sum())
+    tokens = np.where(rng.random(words) < variant_share, variants[chosen], base_words[chosen]).tolist()
+    return '\n'.join(' '.join(tokens[i:i + words_per_line]) + '.'
+                     for i in range(0, len(tokens), words_per_line))
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        # Save to CSV
+        sample_data().to_csv('sample_data.csv', index=False)
+        print("Sample data has been saved to 'sample_data.csv'")
+
+        # Save expanded data to CSV
+        expanded_sample_data().to_csv('sample_data_expanded.csv', index=False)
+        print("Expanded sample data has been saved to 'sample_data_expanded.csv'")
+    elif args[0] == '--text' and 2 <= len(args) <= 4:
+        text = make_text(int(args[1]),
+                         vocabulary=int(args[2]) if len(args) > 2 else 5000,
+                         hebrew_share=float(args[3]) if len(args) > 3 else 0.5)
+        with open('synthetic_text.txt', 'w', encoding='utf-8') as f:
+            f.write(text)
+        print("Synthetic text has been saved to 'synthetic_text.txt'")
+    elif args[0] != '--text' and len(args) <= 4:
+        df = make_scaling_data(int(args[0]),
+                               groups=int(args[1]) if len(args) > 1 else 3,
+                               posts=int(args[2]) if len(args) > 2 else 13,
+                               skew=float(args[3]) if len(args) > 3 else 1.0)
+        df.to_csv('synthetic_data.csv', index=False)
+        print("Synthetic data has been saved to 'synthetic_data.csv'")
+    else:
+        print(__doc__)
+        sys.exit(1)
+
 
-# For each original row, create 3 measurements with some random variation
-np.random.seed(42)  # For reproducibility
-for group, post, val, aro in zip(data['group'], data['post'], data['valence'], data['arousal']):
-    for _ in range(3):  # Create 3 measurements per post
-        expanded_data['group'].append(group)
-        expanded_data['post'].append(post)
-        # Add random variation to valence and arousal (±20%)
-        expanded_data['valence'].append(val + np.random.uniform(-0.2 * abs(val), 0.2 * abs(val)))
-        expanded_data['arousal'].append(aro + np.random.uniform(-0.2 * abs(aro), 0.2 * abs(aro)))
-
-# Create expanded DataFrame
-df_expanded = pd.DataFrame(expanded_data)
-
-# Round values to 3 decimal places
-df_expanded['valence'] = df_expanded['valence'].round(3)
-df_expanded['arousal'] = df_expanded['arousal'].round(3)
-
-# Save expanded data to CSV
-df_expanded.to_csv('sample_data_expanded.csv', index=False)
-print("Expanded sample data has been saved to 'sample_data_expanded.csv'")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,449 @@
+"""
+Persistent scaled datasets that grow by appending batches.
+
+A dataset keeps its rows in one partition per batch, holding the original
+columns and both scalings, plus per-group and per-post statistics: the
+minimum and maximum of every feature, and the sum and count of every scaled
+feature. Appending a batch updates the statistics, rescales the stored rows
+of only those groups and posts whose minimum or maximum changed, and
+refreshes the averages from the sums, so the results match process_file on
+all batches together without running it again. (Scaled values have three
+decimals, so their sums are kept exactly, in thousandths; an average that
+lies exactly halfway between two rounded values is rounded to even, where
+process_file's floating-point mean may round either way.)
+
+Partitions are Feather files. The statistics, averages and preview are
+Feather files in a state folder, next to the keys of every partition as
+JSON. Nothing is stored as a pickle, which would run code when read.
+Every write creates new versions of the files it changes; dataset.json,
+replaced last, names the current ones, so readers never see a half-applied
+batch.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+
+from scaling_features import (COMBINED_WORKBOOK, EXPORT_FORMATS, FEATURE_COLUMNS, OUTPUT_FRAMES, _combine_stats,
+                              export_frame, load_data, minmax_parameters, normalize_averages, write_excel)
+from instrumentation import stage
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writes to a dataset are only serialized within the process
+    fcntl = None
+
+GROUPINGS = ('group', 'post')
+# Per-key statistics of the state, one Feather file per grouping
+STATISTICS = ('min', 'max', 'sums')
+META_FILE = 'dataset.json'
+LOCK_FILE = '.lock'
+PREVIEW_ROWS = 5
+
+_process_lock = threading.Lock()
+
+
+def scaled_columns(group_col):
+    return [f'{col}_scaled_by_{group_col}' for col in FEATURE_COLUMNS]
+
+
+def _write_frame(df, path):
+    """Write df to a Feather file along with its index, such as the keys of a statistics frame."""
+    feather.write_feather(df, str(path))
+
+
+def _float_features(df):
+    """
+    df with its feature columns as float64, so that a dataset created from
+    whole-number ratings keeps the fractions of the batches appended to it.
+    """
+    return df.astype({col: 'float64' for col in FEATURE_COLUMNS})
+
+
+def _scale(df, group_col, parameters):
+    """MinMax-scale the feature columns of df with per-key (scale, offset) frames, as group_scale does."""
+    scale, offset = parameters
+    keys = df[group_col]
+    values = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    return np.round(values * scale.reindex(keys).to_numpy() + offset.reindex(keys).to_numpy(), 3)
+
+
+def _scaled_sums(df, group_col):
+    """Sum (in thousandths, which are whole numbers) and count of the scaled features per key."""
+    scaled_cols = scaled_columns(group_col)
+    thousandths = (df[scaled_cols] * 1000).round()
+    return thousandths.groupby(df[group_col]).agg(['sum', 'count'])
+
+
+def _rounded_mean(total, count):
+    """total / count rounded half to even, for whole-number totals and counts; NaN where count is 0."""
+    total = total.to_numpy(dtype=float)
+    count = count.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quotient = np.floor_divide(total, count)
+        twice_remainder = 2 * (total - quotient * count)
+        rounded = quotient + ((twice_remainder > count) | ((twice_remainder == count) & (quotient % 2 == 1)))
+    rounded[count == 0] = np.nan
+    return rounded
+
+
+def _averages(sums, group_col):
+    """Group or post averages table from the sums of the scaled features."""
+    scaled_cols = scaled_columns(group_col)
+    scaled_avgs = pd.DataFrame({col: _rounded_mean(sums[(col, 'sum')], sums[(col, 'count')]) / 1000
+                                for col in scaled_cols}, index=sums.index).sort_index()
+    scaled_avgs.index.name = group_col
+    return normalize_averages(scaled_avgs).reset_index()
+
+
+def _bounds_changed(old, new):
+    """Keys of old whose row in new differs; a missing value equals a missing value."""
+    new = new.reindex(old.index)
+    differs = (new != old) & ~(new.isna() & old.isna())
+    return set(old.index[differs.any(axis=1)])
+
+
+class DatasetRegistry:
+    """Scaled datasets stored under root, one folder per dataset ID."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _directory(self, dataset_id):
+        # IDs are hex strings; anything else cannot name a dataset folder
+        if not dataset_id or not dataset_id.isalnum():
+            return None
+        directory = self.root / dataset_id
+        return directory if (directory / META_FILE).exists() else None
+
+    @contextmanager
+    def _locked(self, directory, exclusive=True):
+        """Hold the dataset's lock: exclusive for writes, shared for reads."""
+        if fcntl is None:
+            with _process_lock:
+                yield
+            return
+        with open(directory / LOCK_FILE, 'a+') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _read_meta(self, directory):
+        with open(directory / META_FILE, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self, directory, meta):
+        temp_path = directory / f'.{META_FILE}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(temp_path, directory / META_FILE)
+
+    def _remove_old_versions(self, directory, meta):
+        """Delete the files and state folders no longer named by dataset.json."""
+        current = set(meta['parts']) | {meta['state'], META_FILE, LOCK_FILE}
+        for path in directory.iterdir():
+            if path.name == 'exports':
+                for export_dir in path.iterdir():
+                    if export_dir.name != f"v{meta['version']}":
+                        shutil.rmtree(export_dir, ignore_errors=True)
+            elif path.name not in current and not path.name.startswith('.'):
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink()
+
+    def _state_folder(self, directory, meta):
+        """The folder of the dataset's current state. Raises ValueError for datasets stored as pickles."""
+        if meta['state'].endswith('.pkl'):
+            raise ValueError(f"Dataset {meta['id']} was stored in a format that is no longer read; "
+                             f"create it again from its files.")
+        return directory / meta['state']
+
+    def _read_state(self, directory, meta):
+        folder = self._state_folder(directory, meta)
+        with open(folder / 'keys.json', encoding='utf-8') as f:
+            keys = json.load(f)
+        state = {kind: {g: pd.read_feather(folder / f'{kind}_{g}.feather') for g in GROUPINGS}
+                 for kind in STATISTICS}
+        state['keys'] = {g: [set(part_keys) for part_keys in keys[g]] for g in GROUPINGS}
+        state['averages'] = {f'{g}_averages': pd.read_feather(folder / f'{g}_averages.feather') for g in GROUPINGS}
+        state['preview'] = pd.read_feather(folder / 'preview.feather')
+        return state
+
+    def _write_state(self, directory, state, version):
+        """Write state to a new state folder and return its name."""
+        name = f'state.v{version}'
+        folder = directory / name
+        folder.mkdir(exist_ok=True)
+        for kind in STATISTICS:
+            for g in GROUPINGS:
+                _write_frame(state[kind][g], folder / f'{kind}_{g}.feather')
+        for averages_name, averages in state['averages'].items():
+            _write_frame(averages, folder / f'{averages_name}.feather')
+        _write_frame(state['preview'], folder / 'preview.feather')
+        with open(folder / 'keys.json', 'w', encoding='utf-8') as f:
+            # Keys read from the files are numpy scalars where they are numbers
+            json.dump({g: [sorted(part_keys, key=str) for part_keys in state['keys'][g]] for g in GROUPINGS}, f,
+                      default=lambda value: value.item())
+        return name
+
+    def info(self, dataset_id):
+        """Metadata of a dataset (rows, columns, batches, ...), or None if there is no such dataset."""
+        directory = self._directory(dataset_id)
+        if directory is None:
+            return None
+        with self._locked(directory, exclusive=False):
+            meta = self._read_meta(directory)
+        return {key: meta[key] for key in ('id', 'created_at', 'updated_at', 'version', 'rows', 'columns', 'batches')}
+
+    def create(self, source, file_format=None, sheet_name=0):
+        """
+        Create a dataset from a CSV or Excel file (a path, a binary file object
+        or bytes; see load_data). Returns the same result as append.
+        """
+        with stage('load') as timer:
+            batch = _float_features(load_data(source, sheet_name, file_format=file_format))
+            timer.rows = len(batch)
+        dataset_id = uuid.uuid4().hex
+        directory = self.root / dataset_id
+        directory.mkdir()
+        now = time.time()
+        meta = {
+            'id': dataset_id,
+            'created_at': now,
+            'updated_at': now,
+            'version': 0,
+            'rows': 0,
+            'columns': list(batch.columns),
+            'dtypes': {col: str(dtype) for col, dtype in batch.dtypes.items()},
+            'batches': [],
+            'parts': [],
+            'state': None,
+        }
+        state = {'min': {}, 'max': {}, 'sums': {}, 'keys': {g: [] for g in GROUPINGS}, 'averages': {}, 'preview': None}
+        with self._locked(directory):
+            return self._add_batch(directory, meta, state, batch)
+
+    def append(self, dataset_id, source, file_format=None, sheet_name=0):
+        """
+        Append a batch of rows to a dataset. The batch must have the dataset's
+        columns. Returns a dict with the dataset's 'info', the rescaled
+        'groups' and 'posts' (keys whose bounds the batch changed), the
+        'rescaled_rows' and the 'results' in the form process_file returns
+        them, with the row-level frames as previews.
+        """
+        directory = self._directory(dataset_id)
+        if directory is None:
+            raise KeyError(f"Unknown dataset: {dataset_id}")
+        with stage('load') as timer:
+            batch = load_data(source, sheet_name, file_format=file_format)
+            timer.rows = len(batch)
+        with self._locked(directory):
+            meta = self._read_meta(directory)
+            state = self._read_state(directory, meta)
+            return self._add_batch(directory, meta, state, self._conform(batch, meta))
+
+    def _conform(self, batch, meta):
+        """Order the batch's columns like the dataset's and type its keys like the dataset's."""
+        missing = [col for col in meta['columns'] if col not in batch.columns]
+        extra = [col for col in batch.columns if col not in meta['columns']]
+        if missing or extra:
+            raise ValueError(f"The batch's columns differ from the dataset's: "
+                             f"missing {', '.join(missing) or 'none'}, unexpected {', '.join(extra) or 'none'}")
+        batch = batch[meta['columns']]
+        try:
+            return _float_features(batch).astype({g: meta['dtypes'][g] for g in GROUPINGS})
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"The batch's column types differ from the dataset's: {str(e)}")
+
+    def _add_batch(self, directory, meta, state, batch):
+        version = meta['version'] + 1
+        parts = list(meta['parts'])
+        batch = batch.reset_index(drop=True)
+
+        # New bounds, and the keys with stored rows whose bounds moved
+        parameters = {}
+        changed = {}
+        for g in GROUPINGS:
+            grouped = batch.groupby(g)[FEATURE_COLUMNS]
+            batch_min, batch_max = grouped.min(), grouped.max()
+            if g in state['min']:
+                data_min = _combine_stats(state['min'][g], batch_min, 'min')
+                data_max = _combine_stats(state['max'][g], batch_max, 'max')
+                changed[g] = (_bounds_changed(state['min'][g], data_min) |
+                              _bounds_changed(state['max'][g], data_max))
+            else:
+                data_min, data_max = batch_min, batch_max
+                changed[g] = set()
+            state['min'][g], state['max'][g] = data_min, data_max
+            scale, offset = minmax_parameters(data_min.to_numpy(dtype=float), data_max.to_numpy(dtype=float), (-1, 1))
+            parameters[g] = (pd.DataFrame(scale, index=data_min.index, columns=FEATURE_COLUMNS),
+                             pd.DataFrame(offset, index=data_min.index, columns=FEATURE_COLUMNS))
+
+        # Rescale the stored rows of those keys, in the partitions holding them
+        rescaled_sums = {g: None for g in GROUPINGS}
+        rescaled_rows = 0
+        with stage('rescale') as timer:
+            for i in range(len(parts)):
+                touched = [g for g in GROUPINGS if not state['keys'][g][i].isdisjoint(changed[g])]
+                if not touched:
+                    continue
+                part = pd.read_feather(directory / parts[i])
+                rows = np.zeros(len(part), dtype=bool)
+                for g in touched:
+                    mask = part[g].isin(changed[g]).to_numpy()
+                    rows |= mask
+                    part.loc[mask, scaled_columns(g)] = _scale(part[mask], g, parameters[g])
+                    rescaled_sums[g] = _combine_stats(rescaled_sums[g], _scaled_sums(part[mask], g), 'sum')
+                rescaled_rows += int(rows.sum())
+                parts[i] = f'part-{i:05d}.v{version}.feather'
+                part.to_feather(directory / parts[i])
+                if i == 0:
+                    state['preview'] = part.head(PREVIEW_ROWS)
+            timer.rows = rescaled_rows
+
+        # Scale the batch and store it as a new partition
+        with stage('scale') as timer:
+            for g in GROUPINGS:
+                batch[scaled_columns(g)] = _scale(batch, g, parameters[g])
+                state['keys'][g].append(set(batch[g].dropna().unique()))
+            timer.rows = len(batch)
+        with stage('export'):
+            parts.append(f'part-{len(parts):05d}.v{version}.feather')
+            batch.to_feather(directory / parts[-1])
+        if state['preview'] is None:
+            state['preview'] = batch.head(PREVIEW_ROWS)
+
+        # Sums of unchanged keys carry over; those of rescaled keys were recomputed
+        with stage('averages'):
+            for g, name in (('group', 'group_averages'), ('post', 'post_averages')):
+                sums = state['sums'].get(g)
+                if sums is not None:
+                    sums = sums.drop(index=list(changed[g]))
+                sums = _combine_stats(_combine_stats(sums, rescaled_sums[g], 'sum'), _scaled_sums(batch, g), 'sum')
+                state['sums'][g] = sums
+                state['averages'][name] = _averages(sums, g)
+
+        meta.update({
+            'version': version,
+            'updated_at': time.time(),
+            'rows': meta['rows'] + len(batch),
+            'parts': parts,
+            'state': self._write_state(directory, state, version),
+        })
+        meta['batches'].append({'rows': len(batch), 'added_at': meta['updated_at']})
+        self._write_meta(directory, meta)
+        self._remove_old_versions(directory, meta)
+
+        return {
+            'info': {key: meta[key] for key in ('id', 'created_at', 'updated_at', 'version', 'rows', 'columns', 'batches')},
+            'groups': len(changed['group']),
+            'posts': len(changed['post']),
+            'rescaled_rows': rescaled_rows,
+            'results': self._results(meta, state),
+        }
+
+    def _results(self, meta, state):
+        """The dataset's frames in the form process_file returns them; row-level frames as previews."""
+        results = {}
+        for name, columns in self._frame_columns(meta).items():
+            stem, _ = OUTPUT_FRAMES[name]
+            if columns is None:
+                df = state['averages'][name]
+                results[name] = {'data': df, 'filename': f'{stem}.xlsx', 'shape': df.shape}
+            else:
+                results[name] = {'data': state['preview'][columns], 'filename': f'{stem}.xlsx',
+                                 'shape': (meta['rows'], len(columns))}
+        return results
+
+    def _frame_columns(self, meta):
+        """Columns of each row-level frame; None for the averages, which are kept whole."""
+        return {
+            'df_original': meta['columns'],
+            'df_scaled_by_group': meta['columns'] + scaled_columns('group'),
+            'df_scaled_by_post': meta['columns'] + scaled_columns('post'),
+            'group_averages': None,
+            'post_averages': None,
+        }
+
+    def _frame(self, directory, meta, name):
+        columns = self._frame_columns(meta)[name]
+        folder = self._state_folder(directory, meta)
+        if columns is None:
+            return pd.read_feather(folder / f'{name}.feather')
+        return pd.concat([pd.read_feather(directory / part, columns=columns) for part in meta['parts']],
+                         ignore_index=True)
+
+    def frame(self, dataset_id, name):
+        """One of the dataset's frames (a key of OUTPUT_FRAMES) as a DataFrame, or None if there is no such dataset."""
+        directory = self._directory(dataset_id)
+        if directory is None:
+            return None
+        if name not in OUTPUT_FRAMES:
+            raise ValueError(f"Unknown frame: {name}. Choose from {', '.join(OUTPUT_FRAMES)}.")
+        with self._locked(directory, exclusive=False):
+            return self._frame(directory, self._read_meta(directory), name)
+
+    def export(self, dataset_id, filename, export_format=None):
+        """
+        Export a frame of the dataset, named like process_file's files (e.g.
+        'scaled_by_group.xlsx', or COMBINED_WORKBOOK for all of them), in
+        export_format (default: the file's extension). The file is written
+        once per dataset version. Returns its (folder, file name), or None if
+        there is no such dataset or frame.
+        """
+        directory = self._directory(dataset_id)
+        if directory is None:
+            return None
+        stem = Path(filename).stem
+        names = {file_stem: name for name, (file_stem, _) in OUTPUT_FRAMES.items()}
+        combined = filename == COMBINED_WORKBOOK
+        if not combined and stem not in names:
+            return None
+        export_format = export_format or Path(filename).suffix.lstrip('.').lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}. Choose from {', '.join(EXPORT_FORMATS)}.")
+        if combined and export_format != 'xlsx':
+            raise ValueError(f"{COMBINED_WORKBOOK} is only available as xlsx.")
+
+        with self._locked(directory, exclusive=False):
+            meta = self._read_meta(directory)
+            export_dir = directory / 'exports' / f"v{meta['version']}"
+            export_filename = stem + EXPORT_FORMATS[export_format]
+            if not (export_dir / export_filename).exists():
+                export_dir.mkdir(parents=True, exist_ok=True)
+                # Write to a temporary name first so concurrent downloads never see a partial file
+                temp_path = export_dir / f'.{stem}.{os.getpid()}.{threading.get_ident()}.tmp{EXPORT_FORMATS[export_format]}'
+                try:
+                    with stage('export'):
+                        if combined:
+                            write_excel({sheet_name: self._frame(directory, meta, name)
+                                         for name, (_, sheet_name) in OUTPUT_FRAMES.items()}, temp_path)
+                        else:
+                            name = names[stem]
+                            export_frame(self._frame(directory, meta, name), temp_path, export_format,
+                                         OUTPUT_FRAMES[name][1])
+                    os.replace(temp_path, export_dir / export_filename)
+                finally:
+                    if temp_path.exists():
+                        temp_path.unlink()
+        return export_dir, export_filename
+
+    def delete(self, dataset_id):
+        """Delete a dataset; returns whether it existed."""
+        directory = self._directory(dataset_id)
+        if directory is None:
+            return False
+        with self._locked(directory):
+            (directory / META_FILE).unlink()
+        shutil.rmtree(directory, ignore_errors=True)
+        return True
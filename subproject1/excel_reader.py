@@ -0,0 +1,276 @@
+"""
+Streaming reader for .xlsx worksheets.
+The sheet XML is parsed row by row straight from the workbook archive, and
+cells outside the wanted columns are skipped before their values are
+decoded. Numeric columns become NumPy arrays in one step; other columns go
+through the same parser as pandas.read_excel, so the result matches it.
+"""
+import posixpath
+import zipfile
+from xml.etree.ElementTree import iterparse, parse
+
+import numpy as np
+import pandas as pd
+from openpyxl.cell.text import Text
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from pandas.io.parsers import TextParser
+
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+ROW_TAG = f'{{{SHEET_MAIN_NS}}}row'
+VALUE_TAG = f'{{{SHEET_MAIN_NS}}}v'
+INLINE_STRING_TAG = f'{{{SHEET_MAIN_NS}}}is'
+TEXT_TAG = f'{{{SHEET_MAIN_NS}}}t'
+
+
+class UnsupportedWorkbook(Exception):
+    """Raised for workbook features this reader leaves to pandas.read_excel."""
+
+
+def _worksheet_path(archive, sheet_name):
+    """Archive path of a worksheet given by name or position, and the workbook's date epoch."""
+    workbook = parse(archive.open('xl/workbook.xml')).getroot()
+    if workbook.tag != f'{{{SHEET_MAIN_NS}}}workbook':
+        raise UnsupportedWorkbook("Not a transitional OOXML workbook")
+    properties = workbook.find(f'{{{SHEET_MAIN_NS}}}workbookPr')
+    date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+    epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+    relations = parse(archive.open('xl/_rels/workbook.xml.rels')).getroot()
+    targets = {}
+    for relation in relations.iter(f'{{{PACKAGE_REL_NS}}}Relationship'):
+        if relation.get('Type', '').endswith('/worksheet'):
+            target = relation.get('Target')
+            targets[relation.get('Id')] = (target.lstrip('/') if target.startswith('/')
+                                           else posixpath.normpath(posixpath.join('xl', target)))
+
+    # Chart sheets are not worksheets and do not count for positions
+    sheets = [(sheet.get('name'), targets[sheet.get(f'{{{REL_NS}}}id')])
+              for sheet in workbook.iter(f'{{{SHEET_MAIN_NS}}}sheet')
+              if sheet.get(f'{{{REL_NS}}}id') in targets]
+    if isinstance(sheet_name, int):
+        if not 0 <= sheet_name < len(sheets):
+            raise UnsupportedWorkbook(f"No worksheet at position {sheet_name}")
+        return sheets[sheet_name][1], epoch
+    for name, path in sheets:
+        if name == sheet_name:
+            return path, epoch
+    raise UnsupportedWorkbook(f"No worksheet named {sheet_name}")
+
+
+def _date_styles(archive):
+    """Style indices whose number format is a date, and those that are a duration."""
+    if 'xl/styles.xml' not in archive.namelist():
+        return set(), set()
+    styles = parse(archive.open('xl/styles.xml')).getroot()
+    formats = dict(BUILTIN_FORMATS)
+    for number_format in styles.iter(f'{{{SHEET_MAIN_NS}}}numFmt'):
+        formats[int(number_format.get('numFmtId'))] = number_format.get('formatCode')
+    dates, durations = set(), set()
+    cell_formats = styles.find(f'{{{SHEET_MAIN_NS}}}cellXfs')
+    for index, style in enumerate(cell_formats if cell_formats is not None else ()):
+        code = formats.get(int(style.get('numFmtId', 0)))
+        if code and is_date_format(code):
+            dates.add(index)
+            if is_timedelta_format(code):
+                durations.add(index)
+    return dates, durations
+
+
+def _inline_string(element):
+    """Text of an inline string cell."""
+    if element is None:
+        return None
+    if len(element) == 1 and element[0].tag == TEXT_TAG:
+        return element[0].text or ''
+    return Text.from_tree(element).content
+
+
+class _CellDecoder:
+    """Decode cell elements into Python values, as openpyxl does."""
+
+    def __init__(self, shared_strings, epoch, date_styles, duration_styles):
+        self.shared_strings = shared_strings
+        self.epoch = epoch
+        self.date_styles = date_styles
+        self.duration_styles = duration_styles
+
+    def __call__(self, cell):
+        data_type = cell.get('t', 'n')
+        if data_type == 'inlineStr':
+            return _inline_string(cell.find(INLINE_STRING_TAG))
+        value = cell.findtext(VALUE_TAG)
+        if not value:
+            return None
+        if data_type == 'n':
+            number = float(value) if '.' in value or 'E' in value or 'e' in value else int(value)
+            style = cell.get('s')
+            if style and int(style) in self.date_styles:
+                try:
+                    return from_excel(number, self.epoch, timedelta=int(style) in self.duration_styles)
+                except (OverflowError, ValueError):
+                    return np.nan
+            return number
+        if data_type == 's':
+            return self.shared_strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'e':
+            # Error cells (#N/A, #DIV/0!, ...) are missing values, as in read_excel
+            return np.nan
+        if data_type == 'd':
+            return from_ISO8601(value)
+        return value
+
+
+def _has_value(cell):
+    return cell.get('t') == 'inlineStr' or bool(cell.findtext(VALUE_TAG))
+
+
+def _iter_rows(source):
+    """Yield (row number, cell elements) of a worksheet, clearing each row once read."""
+    row_number = 0
+    # Only end events: asking for start events too would double the parsing overhead
+    for _, element in iterparse(source):
+        if element.tag == ROW_TAG:
+            row_number = int(element.get('r') or row_number + 1)
+            yield row_number, list(element)
+            element.clear()
+
+
+def _cell_value(value):
+    """Convert a cell value the way pandas.read_excel does before parsing it."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _build_columns(names, columns):
+    """
+    Build typed columns from cell values. Purely numeric columns are
+    converted in one NumPy step; the others go through the same parser as
+    pandas.read_excel, so text, dates and missing values come out alike.
+    """
+    data = {}
+    other = []
+    for name, values in zip(names, columns):
+        column = pd.Series(values)
+        if values and column.dtype.kind == 'f':
+            # Whole numbers are ints unless a cell is empty, as with read_excel
+            if column.notna().all() and (column % 1 == 0).all():
+                column = column.astype('int64')
+            data[name] = column
+        elif values and column.dtype.kind == 'i':
+            data[name] = column
+        else:
+            data[name] = None
+            other.append((name, values))
+
+    if other:
+        rows = zip(*([_cell_value(value) for value in values] for _, values in other))
+        parsed = TextParser([[name for name, _ in other], *rows], header=0, skip_blank_lines=False).read()
+        for name, _ in other:
+            data[name] = parsed[name]
+    return pd.DataFrame(data, columns=names)
+
+
+def read_excel_columns(filename, sheet_name=0, usecols=None):
+    """
+    Read one sheet of an .xlsx workbook into a DataFrame, keeping only the
+    usecols columns (default: all). sheet_name is a sheet name or position.
+    Returns None for workbooks this reader does not handle (e.g. a header
+    that is not a row of distinct text names); use pandas.read_excel then.
+    """
+    try:
+        with zipfile.ZipFile(filename) as archive:
+            path, epoch = _worksheet_path(archive, sheet_name)
+            shared_strings = []
+            if 'xl/sharedStrings.xml' in archive.namelist():
+                with archive.open('xl/sharedStrings.xml') as source:
+                    shared_strings = read_string_table(source)
+            decode = _CellDecoder(shared_strings, epoch, *_date_styles(archive))
+            with archive.open(path) as source:
+                return _read_rows(_iter_rows(source), decode, usecols)
+    except (UnsupportedWorkbook, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def _read_rows(rows, decode, usecols):
+    column_indices = {}
+
+    def column_index(cell, previous):
+        reference = cell.get('r')
+        if not reference:
+            return previous + 1
+        letters = reference.rstrip('0123456789')
+        index = column_indices.get(letters)
+        if index is None:
+            index = column_indices[letters] = column_index_from_string(letters) - 1
+        return index
+
+    first = next(rows, None)
+    if first is None or first[0] != 1:
+        raise UnsupportedWorkbook("The header is not on the first row")
+    header = []
+    index = -1
+    for cell in first[1]:
+        index = column_index(cell, index)
+        header.extend([None] * (index + 1 - len(header)))
+        header[index] = decode(cell)
+    while header and header[-1] is None:
+        header.pop()
+    if not header or len(set(header)) < len(header) or not all(isinstance(name, str) for name in header):
+        raise UnsupportedWorkbook("The header is not a row of distinct names")
+
+    if usecols is None:
+        usecols = header
+    missing_columns = [col for col in usecols if col not in header]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+    names = [name for name in header if name in usecols]
+    wanted = {header.index(name): position for position, name in enumerate(names)}
+    all_columns = len(names) == len(header)
+
+    columns = [[] for _ in names]
+    blank_rows = 0
+    previous_row = 1
+    for row_number, cells in rows:
+        # Rows missing from the file are blank
+        blank_rows += row_number - previous_row - 1
+        previous_row = row_number
+        values = [None] * len(names)
+        blank = True
+        index = -1
+        for cell in cells:
+            index = column_index(cell, index)
+            position = wanted.get(index)
+            if position is not None:
+                value = decode(cell)
+                if value is not None:
+                    values[position] = value
+                    blank = False
+            elif all_columns and index >= len(header):
+                if _has_value(cell):
+                    # Data beyond the header gets "Unnamed" columns in read_excel
+                    raise UnsupportedWorkbook("Values outside the header columns")
+            elif blank and _has_value(cell):
+                blank = False
+        if blank:
+            # Blank rows are kept as missing values unless they end the sheet, as in read_excel
+            blank_rows += 1
+            continue
+        for _ in range(blank_rows):
+            for column in columns:
+                column.append(None)
+        blank_rows = 0
+        for column, value in zip(columns, values):
+            column.append(value)
+
+    return _build_columns(names, columns)
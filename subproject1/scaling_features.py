@@ -1,28 +1,161 @@
 # Import Libraries
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.preprocessing import MinMaxScaler, StandardScaler, RobustScaler
+import io
+import logging
 import os
+import re
 import sys
+import time
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from openpyxl import Workbook
+from excel_reader import read_excel_columns
 
-def load_data(filename):
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from instrumentation import stage
+from batch import batch_inputs, batch_summary, is_batch_input, output_names, run_batch
+
+logger = logging.getLogger(__name__)
+
+# Grouping levels process_file scales by unless given others
+DEFAULT_GROUPINGS = ('group', 'post')
+
+# Separates the key columns of a nested grouping level, e.g. 'group/post' for posts within groups
+GROUPING_SEPARATOR = '/'
+
+# Column names a grouping level may use; they become part of file and column names
+GROUPING_KEY_PATTERN = re.compile(r'[\w\- ]+')
+
+# DataFrames created by process_file for DEFAULT_GROUPINGS: name -> (file stem, sheet name)
+OUTPUT_FRAMES = {
+    'df_original': ('original_data', 'Original Data'),
+    'df_scaled_by_group': ('scaled_by_group', 'Scaled by Group'),
+    'df_scaled_by_post': ('scaled_by_post', 'Scaled by Post'),
+    'group_averages': ('group_averages', 'Group Averages'),
+    'post_averages': ('post_averages', 'Post Averages'),
+}
+
+# Formats DataFrames can be exported to, with their file extensions
+EXPORT_FORMATS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+# Suffix of the DataFrames process_file keeps for export on demand; a name no export uses, so
+# kept frames are never mistaken for exported files
+SAVED_FRAME_SUFFIX = '.frame.feather'
+
+# pandas reads Excel files with python-calamine from version 2.2 on
+PANDAS_CALAMINE = tuple(int(part) for part in re.findall(r'\d+', pd.__version__)[:2]) >= (2, 2)
+
+# Name of the workbook holding every DataFrame as a sheet
+COMBINED_WORKBOOK = 'analysis_results.xlsx'
+
+# Rows per Excel sheet, including the header row
+EXCEL_MAX_ROWS = 1048576
+
+# Columns the scaling needs; chunked processing reads only these
+REQUIRED_COLUMNS = ['group', 'post', 'valence', 'arousal']
+FEATURE_COLUMNS = ['valence', 'arousal']
+
+# Column types for chunked reading; keys are read as text so that every chunk agrees on them
+CHUNK_DTYPES = {'group': 'str', 'post': 'str', 'valence': 'float64', 'arousal': 'float64'}
+
+# Default rows per chunk, and the formats chunked processing can stream to
+CHUNK_ROWS = 100000
+CHUNK_EXPORT_FORMATS = ('csv', 'parquet')
+
+# Files of a directory that process_batch processes
+BATCH_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+# Rows of each DataFrame a batch worker sends back
+BATCH_PREVIEW_ROWS = 5
+
+def open_input(source):
+    """
+    Inputs may be a path, a binary file object or bytes; bytes are wrapped
+    in a file object. File objects are rewound, so they can be read again.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+def source_name(source):
+    """A name for an input in messages."""
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    name = getattr(source, 'name', None)
+    return name if isinstance(name, str) else 'uploaded data'
+
+def input_format(source, file_format=None):
+    """
+    Extension ('.csv', '.xlsx' or '.xls') of an input: file_format if
+    given, else the extension of its file name, else guessed from its
+    first bytes (a zip archive is .xlsx, an OLE2 file .xls, anything else CSV).
+    """
+    if file_format:
+        file_format = file_format.lower()
+        return file_format if file_format.startswith('.') else f'.{file_format}'
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', None)
+    if isinstance(name, (str, os.PathLike)) and Path(name).suffix:
+        return Path(name).suffix.lower()
+
+    source = open_input(source)
+    head = source.read(8)
+    source.seek(0)
+    if isinstance(head, bytes):
+        if head.startswith(b'PK\x03\x04'):
+            return '.xlsx'
+        if head.startswith(b'\xd0\xcf\x11\xe0'):
+            return '.xls'
+    return '.csv'
+
+def read_excel(filename, sheet_name=0, usecols=None):
+    """
+    Read a sheet of an Excel file, by the fastest means available: pandas'
+    calamine engine when python-calamine is installed (and pandas is 2.2 or
+    later), the streaming read_excel_columns for .xlsx files, and plain
+    pandas.read_excel otherwise.
+    """
+    if PANDAS_CALAMINE:
+        try:
+            import python_calamine  # noqa: F401
+            return pd.read_excel(filename, sheet_name=sheet_name, usecols=usecols, engine='calamine')
+        except ImportError:
+            pass
+    if input_format(filename) == '.xlsx':
+        df = read_excel_columns(open_input(filename), sheet_name, usecols)
+        if df is not None:
+            return df
+    return pd.read_excel(open_input(filename), sheet_name=sheet_name, usecols=usecols)
+
+def load_data(filename, sheet_name=0, usecols=None, file_format=None):
     """
     Load data from Excel or CSV file.
-    Supports .xlsx, .xls, and .csv files.
+    Supports .xlsx, .xls, and .csv files, given as a path, a binary file
+    object or bytes (see input_format for how the format is told).
+    sheet_name selects the sheet of an Excel file and usecols, if given,
+    the columns to keep. Raises ValueError if the file cannot be read or
+    lacks the REQUIRED_COLUMNS.
     """
-    file_extension = Path(filename).suffix.lower()
+    file_extension = input_format(filename, file_format)
+    filename = open_input(filename)
     try:
         if file_extension in ['.xlsx', '.xls']:
-            df = pd.read_excel(filename)
+            df = read_excel(filename, sheet_name, usecols)
         elif file_extension == '.csv':
-            df = pd.read_csv(filename)
+            df = pd.read_csv(filename, usecols=usecols)
         else:
             raise ValueError(f"Unsupported file format: {file_extension}. Please use Excel (.xlsx, .xls) or CSV (.csv) files.")
         
         # Ensure required columns exist
-        required_columns = ['group', 'post', 'valence', 'arousal']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
         if missing_columns:
             raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
         
@@ -31,102 +164,163 @@ def load_data(filename):
         df[numeric_columns] = df[numeric_columns].round(3)
         return df
     
+    except ValueError:
+        raise
     except Exception as e:
-        print(f"Error loading file: {str(e)}")
-        sys.exit(1)
+        raise ValueError(f"Could not read the file: {e}") from e
 
-def calculate_normalized_averages(df, group_col):
+def calculate_normalized_averages(df, group_col, feature_cols=('valence', 'arousal'), keys=None):
     """
-    Calculate three types of values:
+    Calculate three types of values for every feature column:
     1. Original values (before scaling)
     2. Scaled values (-1 to 1)
     3. Normalized values (scaled/mean)
+    keys, if given, groups the rows instead of df[group_col], which then
+    only names the scaled columns.
     """
+    feature_cols = list(feature_cols)
+    if keys is None:
+        keys = df[group_col]
+
     # Calculate averages of original values per group
     original_cols = [col for col in df.columns if '_group_mean' in col]
     if original_cols:
-        original_avgs = df[original_cols].groupby(df[group_col]).mean()
+        original_avgs = df[original_cols].groupby(keys, observed=True).mean()
         original_avgs = original_avgs.rename(columns={
-            'valence_group_mean': 'valence_original_mean',
-            'arousal_group_mean': 'arousal_original_mean'
+            f'{col}_group_mean': f'{col}_original_mean' for col in feature_cols
         })
     else:
         original_avgs = pd.DataFrame()
     
     # Calculate averages of scaled values per group
-    scaled_cols = [f'valence_scaled_by_{group_col}', f'arousal_scaled_by_{group_col}']
-    scaled_avgs = df[scaled_cols].groupby(df[group_col]).mean().round(3)
-    scaled_avgs = scaled_avgs.rename(columns={
-        f'valence_scaled_by_{group_col}': f'valence_scaled_by_{group_col}_original',
-        f'arousal_scaled_by_{group_col}': f'arousal_scaled_by_{group_col}_original'
-    })
+    scaled_cols = [f'{col}_scaled_by_{group_col}' for col in feature_cols]
+    scaled_avgs = df[scaled_cols].groupby(keys, observed=True).mean().round(3)
     
-    # Calculate means of GROUP AVERAGES (not all individual data points)
-    # This is the key change - we calculate the mean of the group averages
-    valence_mean = scaled_avgs[f'valence_scaled_by_{group_col}_original'].mean().round(3)
-    arousal_mean = scaled_avgs[f'arousal_scaled_by_{group_col}_original'].mean().round(3)
-    
-    print("\n=== DEBUG INFO ===")
-    print("Scaled averages per group:")
-    print(scaled_avgs)
-    print("\nMean of GROUP AVERAGES:")
-    print(f"Valence mean: {valence_mean}")
-    print(f"Arousal mean: {arousal_mean}")
+    return normalize_averages(scaled_avgs, original_avgs), df
+
+def normalize_averages(scaled_avgs, original_avgs=None):
+    """
+    Combine per-group averages of the scaled columns (already rounded) with
+    the same averages divided by their mean over all groups.
+    """
+    scaled_cols = list(scaled_avgs.columns)
+    scaled_avgs = scaled_avgs.copy()
+    scaled_avgs.columns = [f'{col}_original' for col in scaled_cols]
     
-    # Create normalized_avgs DataFrame with proper columns
-    normalized_avgs = pd.DataFrame(
-        index=scaled_avgs.index,
-        columns=[
-            f'valence_scaled_by_{group_col}_normalized',
-            f'arousal_scaled_by_{group_col}_normalized'
-        ]
-    )
-    
-    # Calculate and print each normalization step
-    for group in scaled_avgs.index:
-        valence_original = scaled_avgs.loc[group, f'valence_scaled_by_{group_col}_original']
-        
-        # Use the mean of group averages, not the mean of all data points
-        valence_normalized = (valence_original / valence_mean).round(3)
-        
-        print(f"\nGroup {group}:")
-        print(f"  Valence original: {valence_original}")
-        print(f"  Valence mean of GROUP AVERAGES: {valence_mean}")
-        print(f"  Calculation: {valence_original} / {valence_mean} = {valence_normalized}")
-        
-        # Store the normalized value
-        normalized_avgs.loc[group, f'valence_scaled_by_{group_col}_normalized'] = valence_normalized
-    
-    # Add arousal normalized values
-    for group in scaled_avgs.index:
-        arousal_original = scaled_avgs.loc[group, f'arousal_scaled_by_{group_col}_original']
-        
-        # Use the mean of group averages, not the mean of all data points
-        arousal_normalized = (arousal_original / arousal_mean).round(3)
-        normalized_avgs.loc[group, f'arousal_scaled_by_{group_col}_normalized'] = arousal_normalized
+    # Normalize by the mean of the GROUP AVERAGES (not all individual data points)
+    means_of_averages = scaled_avgs.mean().round(3)
+    normalized_avgs = (scaled_avgs / means_of_averages).round(3)
+    normalized_avgs.columns = [f'{col}_normalized' for col in scaled_cols]
     
     # Combine all averages
-    group_avgs = pd.concat([original_avgs, scaled_avgs, normalized_avgs], axis=1)
-    
-    # Print final results for verification
-    print("\nFinal normalized values:")
-    print(normalized_avgs)
-    
-    return group_avgs, df
+    frames = [scaled_avgs, normalized_avgs] if original_avgs is None else [original_avgs, scaled_avgs, normalized_avgs]
+    return pd.concat(frames, axis=1)
+
+def minmax_parameters(data_min, data_max, feature_range=(-1, 1)):
+    """Scale and offset mapping [data_min, data_max] onto feature_range, as sklearn's MinMaxScaler."""
+    low, high = feature_range
+    data_range = data_max - data_min
+    data_range[data_range == 0] = 1.0
+    scale = (high - low) / data_range
+    offset = low - data_min * scale
+    return scale, offset
+
+def _minmax_scale(values, codes, grouped, feature_range=(-1, 1)):
+    """Per-group MinMax scaling, same arithmetic as sklearn's MinMaxScaler."""
+    scale, offset = minmax_parameters(grouped.min().to_numpy(dtype=float),
+                                      grouped.max().to_numpy(dtype=float), feature_range)
+    return values * scale[codes] + offset[codes]
+
+def _standard_scale(values, codes, grouped, **kwargs):
+    """Per-group standard scaling (population std, like sklearn's StandardScaler)."""
+    mean = grouped.mean().to_numpy(dtype=float)
+    std = grouped.std(ddof=0).to_numpy(dtype=float, copy=True)
+    std[(std == 0) | np.isnan(std)] = 1.0
+    return (values - mean[codes]) / std[codes]
+
+def _robust_scale(values, codes, grouped, **kwargs):
+    """Per-group robust scaling (median and IQR, like sklearn's RobustScaler)."""
+    median = grouped.median().to_numpy(dtype=float)
+    iqr = (grouped.quantile(0.75) - grouped.quantile(0.25)).to_numpy(dtype=float, copy=True)
+    iqr[(iqr == 0) | np.isnan(iqr)] = 1.0
+    return (values - median[codes]) / iqr[codes]
+
+# Scalers supported by group_scale, keyed by name
+SCALERS = {
+    'minmax': _minmax_scale,
+    'standard': _standard_scale,
+    'robust': _robust_scale,
+}
+
+def scaled_column_name(col, group_col, scaler='minmax'):
+    """Name of the column holding `col` scaled within `group_col` by `scaler`."""
+    if scaler == 'minmax':
+        return f'{col}_scaled_by_{group_col}'
+    return f'{col}_{scaler}_scaled_by_{group_col}'
+
+def group_scale(df, cols, group_col, scalers='minmax', feature_range=(-1, 1)):
+    """
+    Scale columns within groups using vectorized NumPy operations.
+    The groups are factorized once and the statistics of every group are
+    computed in a single groupby pass, then broadcast back to the rows.
+    `scalers` is a scaler name or a list of names from SCALERS.
+    """
+    if isinstance(scalers, str):
+        scalers = [scalers]
+    unknown = [name for name in scalers if name not in SCALERS]
+    if unknown:
+        raise ValueError(f"Unknown scaler(s): {', '.join(unknown)}. Choose from {', '.join(SCALERS)}.")
+
+    codes, uniques = pd.factorize(df[group_col])
+    keys = pd.Categorical.from_codes(codes, categories=range(len(uniques)))
+    values = df[cols].to_numpy(dtype=float)
+    grouped = pd.DataFrame(values).groupby(keys, observed=False)
+    # Rows with a missing group key have code -1 and are left unscaled (NaN)
+    missing_group = codes < 0
+
+    df_scaled = df.copy()
+    for name in scalers:
+        scaled = SCALERS[name](values, codes, grouped, feature_range=feature_range)
+        scaled[missing_group] = np.nan
+        for i, col in enumerate(cols):
+            df_scaled[scaled_column_name(col, group_col, name)] = np.round(scaled[:, i], 3)
+
+    numeric_columns = df_scaled.select_dtypes(include=[np.number]).columns
+    df_scaled[numeric_columns] = df_scaled[numeric_columns].round(3)
+
+    return df_scaled
 
 def sklearn_group_scaling(df, cols, group_col, scaler):
     """
     Scale data within groups using the specified scaler.
+    MinMaxScaler, StandardScaler and RobustScaler run on the vectorized
+    group_scale engine; any other scaler is fitted group by group.
     """
+    name = None
+    if type(scaler) is MinMaxScaler and not scaler.clip:
+        name = 'minmax'
+    elif type(scaler) is StandardScaler and scaler.with_mean and scaler.with_std:
+        name = 'standard'
+    elif (type(scaler) is RobustScaler and scaler.with_centering and scaler.with_scaling
+            and tuple(scaler.quantile_range) == (25.0, 75.0) and not scaler.unit_variance):
+        name = 'robust'
+
+    if name is not None:
+        feature_range = getattr(scaler, 'feature_range', (-1, 1))
+        df_scaled = group_scale(df, cols, group_col, name, feature_range=feature_range)
+        # Keep the historical column names whatever the scaler
+        return df_scaled.rename(columns={
+            scaled_column_name(col, group_col, name): f'{col}_scaled_by_{group_col}' for col in cols
+        })
+
     df_scaled = df.copy()
     
     for col in cols:
-        scaled_values = []
-        for group in df[group_col].unique():
-            mask = df[group_col] == group
+        scaled_values = np.full(len(df), np.nan)
+        for group in df[group_col].dropna().unique():
+            mask = (df[group_col] == group).to_numpy()
             data_to_scale = df.loc[mask, col].values.reshape(-1, 1)
-            scaled = scaler.fit_transform(data_to_scale).flatten()
-            scaled_values.extend(scaled)
+            scaled_values[mask] = scaler.fit_transform(data_to_scale).flatten()
         
         # Use the correct column name format
         df_scaled[f'{col}_scaled_by_{group_col}'] = np.round(scaled_values, 3)
@@ -136,73 +330,654 @@ def sklearn_group_scaling(df, cols, group_col, scaler):
     
     return df_scaled
 
-def process_file(input_file, output_dir='output'):
+# Under pandas' copy-on-write (always on from pandas 3) selecting columns copies them lazily;
+# before, only the DataFrame constructor with copy=False leaves them shared
+_LAZY_COPIES = int(pd.__version__.split('.')[0]) >= 3
+
+def frame_view(df, columns):
+    """The given columns of df as a new DataFrame sharing their data with df."""
+    if _LAZY_COPIES:
+        return df[columns]
+    return pd.DataFrame({col: df[col] for col in columns}, copy=False)
+
+def compact_frame(df, float32=False, keys=('group', 'post')):
+    """
+    Shrink a loaded DataFrame in place for the lean mode of process_file:
+    the key columns become categoricals, holding one small integer code per
+    row, and the feature columns become float64 (integer ratings included,
+    since scaling writes NaN and fractions into them), or with float32
+    float32, which keeps about seven significant digits: scaled values may
+    then differ from float64 in their last decimal, and normalized
+    averages, which divide by a mean, by more.
+    """
+    for col in keys:
+        df[col] = df[col].astype('category')
+    for col in FEATURE_COLUMNS:
+        df[col] = df[col].astype('float32' if float32 else 'float64')
+    return df
+
+def parse_groupings(specs):
+    """
+    Grouping levels from specs: a list of column names, of names joined by
+    GROUPING_SEPARATOR for nested levels ('group/post' scales every post
+    within its group) or of tuples of names, or all of them in one
+    comma-separated string. Returns the levels as tuples of column names.
+    """
+    if isinstance(specs, str):
+        specs = specs.split(',')
+    levels = []
+    for spec in specs:
+        keys = spec.split(GROUPING_SEPARATOR) if isinstance(spec, str) else spec
+        keys = tuple(key.strip() for key in keys)
+        if not keys or not all(GROUPING_KEY_PATTERN.fullmatch(key) for key in keys):
+            raise ValueError(f"Invalid grouping: {spec!r}. Column names may only hold letters, digits, "
+                             f"spaces, '-' and '_', with {GROUPING_SEPARATOR!r} between nested ones.")
+        if len(set(keys)) < len(keys):
+            raise ValueError(f"Invalid grouping: {spec!r} names a column twice.")
+        if keys not in levels:
+            levels.append(keys)
+    if not levels:
+        raise ValueError("No grouping given.")
+    names = [grouping_name(keys) for keys in levels]
+    if len(set(names)) < len(names):
+        raise ValueError(f"Groupings with the same name: {', '.join(GROUPING_SEPARATOR.join(k) for k in levels)}.")
+    return levels
+
+def grouping_name(keys):
+    """Name of a grouping level in column, file and frame names: its key columns joined by '_'."""
+    return '_'.join(keys)
+
+def _key_codes(keys):
+    """Codes of a key column's values in sorted order (-1 where missing), and the values they stand for."""
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        return keys.cat.codes.to_numpy(), keys.cat.categories
+    try:
+        return pd.factorize(keys, sort=True)
+    except TypeError:
+        # Keys of mixed types cannot be sorted; they keep the order they first appear in
+        return pd.factorize(keys)
+
+def _first_positions(codes, size):
+    """Position of the first occurrence of each of the codes 0..size-1 in codes."""
+    positions = np.flatnonzero(codes >= 0)
+    first = np.empty(size, dtype=np.intp)
+    first[codes[positions[::-1]]] = positions[::-1]
+    return first
+
+def _level_codes(cell_keys, level):
+    """
+    Codes of the key combinations of a grouping level for every cell, in
+    sorted order, -1 for cells missing one of the keys, and their number.
+    """
+    codes = np.zeros(len(cell_keys[level[0]]), dtype=np.int64)
+    missing = np.zeros(len(codes), dtype=bool)
+    for key in level:
+        part = cell_keys[key]
+        missing |= part < 0
+        # Combining one column at a time keeps the codes small and the order lexicographic
+        codes, uniques = pd.factorize(codes * (part.max() + 2) + part + 1, sort=True)
+        codes = codes.astype(np.int64)
+    level_codes = np.full(len(codes), -1, dtype=np.intp)
+    level_codes[~missing], uniques = pd.factorize(codes[~missing], sort=True)
+    return level_codes, len(uniques)
+
+def grouped_minmax_scaling(df, cols, levels, feature_range=(-1, 1)):
+    """
+    MinMax-scale cols within every grouping level of levels (tuples of key
+    columns, see parse_groupings) in one pass over the rows: every key
+    column is factorized once, the rows are reduced once to the minimum and
+    maximum of each distinct combination of all keys (a cell), and each
+    level's statistics are reduced from the cells, so another level costs a
+    reduction over the cells rather than over the rows. Yields, level by
+    level, the scaled columns (scaled_column_name -> Series rounded to 3
+    decimals, NaN where a key is missing), the level's code of every row
+    (-1 where a key is missing) and a DataFrame of the keys of each code.
+    Computes the same values as group_scale(..., 'minmax') on each level.
+    """
+    with stage('grouping') as timer:
+        timer.rows = len(df)
+        keys = list(dict.fromkeys(key for level in levels for key in level))
+        key_codes, key_values = {}, {}
+        for key in keys:
+            key_codes[key], key_values[key] = _key_codes(df[key])
+        # Missing keys are a value of their own here, so every row falls into a cell
+        sizes = [len(key_values[key]) + 1 for key in keys]
+        if np.prod(sizes, dtype=float) <= len(df) // 16:
+            # Few enough combinations, next to the rows, to number them all, in place and without hashing the rows
+            n_cells = int(np.prod(sizes))
+            cells = np.zeros(len(df), dtype=np.int32 if n_cells < 2 ** 31 else np.int64)
+            for key, size in zip(keys, sizes):
+                cells *= size
+                cells += key_codes[key]
+                cells += 1
+            cell_keys = {key: codes.astype(np.int64) - 1
+                         for key, codes in zip(keys, np.unravel_index(np.arange(n_cells), sizes))}
+            empty = np.bincount(cells, minlength=n_cells) == 0
+            for codes in cell_keys.values():
+                # Combinations no row has belong to no level
+                codes[empty] = -1
+        else:
+            cells = np.zeros(len(df), dtype=np.int64)
+            for key, size in zip(keys, sizes):
+                cells, uniques = pd.factorize(cells * size + key_codes[key].astype(np.int64) + 1)
+            n_cells = len(uniques)
+            cells = cells.astype(np.int32 if n_cells < 2 ** 31 else np.int64)
+            first = _first_positions(cells, n_cells)
+            cell_keys = {key: codes[first].astype(np.int64) for key, codes in key_codes.items()}
+        del key_codes
+        grouped = frame_view(df, cols).groupby(pd.Categorical.from_codes(cells, categories=range(n_cells)),
+                                               observed=False)
+        cell_min, cell_max = grouped.min(), grouped.max()
+    
+    for level in levels:
+        name = grouping_name(level)
+        with stage(f'scale_by_{name}') as timer:
+            timer.rows = len(df)
+            level_of_cell, n_level = _level_codes(cell_keys, level)
+            by_level = pd.Categorical.from_codes(level_of_cell, categories=range(n_level))
+            scale, offset = minmax_parameters(cell_min.groupby(by_level, observed=False).min().to_numpy(dtype=float),
+                                              cell_max.groupby(by_level, observed=False).max().to_numpy(dtype=float),
+                                              feature_range)
+            codes = level_of_cell.astype(np.min_scalar_type(-max(n_level, 1)))[cells]
+            scaled = {}
+            for i, col in enumerate(cols):
+                # Integer ratings are scaled as floats; float32 columns of the lean mode stay float32
+                values = df[col].to_numpy(dtype=np.float32 if df[col].dtype == np.float32 else np.float64)
+                # values * scale + offset, computed in place to hold one temporary column at a time
+                column = scale[:, i].astype(values.dtype)[codes]
+                column *= values
+                column += offset[:, i].astype(values.dtype)[codes]
+                # Rows with a missing key have code -1 and are left unscaled (NaN)
+                column[codes < 0] = np.nan
+                np.round(column, 3, out=column)
+                # A Series around the values is added to a DataFrame without copying them
+                scaled[scaled_column_name(col, name)] = pd.Series(column, index=df.index, copy=False)
+            first = _first_positions(level_of_cell, n_level)
+            level_keys = pd.DataFrame({key: key_values[key].take(cell_keys[key][first]) for key in level})
+        yield scaled, codes, level_keys
+        del scaled, codes
+
+def level_averages(df, name, codes, level_keys, feature_cols=FEATURE_COLUMNS):
+    """
+    calculate_normalized_averages of the columns scaled by a grouping level,
+    over the level codes grouped_minmax_scaling gave for the rows of df, with
+    the level's key columns first.
+    """
+    by_level = pd.Categorical.from_codes(codes, categories=range(len(level_keys)))
+    averages, _ = calculate_normalized_averages(df, name, feature_cols, keys=by_level)
+    return pd.concat([level_keys, averages.reset_index(drop=True)], axis=1)
+
+def read_csv_chunks(filename, chunksize=CHUNK_ROWS, engine=None):
+    """
+    Read the REQUIRED_COLUMNS of a CSV file in DataFrames of about chunksize
+    rows, with the column types of CHUNK_DTYPES and features rounded to 3
+    decimals. engine='pyarrow' uses pyarrow's streaming CSV reader.
+    """
+    header = pd.read_csv(open_input(filename), nrows=0).columns
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+    columns = [col for col in header if col in REQUIRED_COLUMNS]
+
+    if engine == 'pyarrow':
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+        column_types = {col: pa.string() if dtype == 'str' else pa.float64() for col, dtype in CHUNK_DTYPES.items()}
+        # pyarrow reads blocks of bytes rather than rows; assume rows of about 32 bytes
+        reader = pa_csv.open_csv(
+            open_input(filename),
+            read_options=pa_csv.ReadOptions(block_size=max(chunksize * 32, 1 << 16)),
+            convert_options=pa_csv.ConvertOptions(include_columns=columns, column_types=column_types,
+                                                  strings_can_be_null=True))
+        chunks = (batch.to_pandas() for batch in reader)
+    elif engine in (None, 'c', 'python'):
+        chunks = pd.read_csv(open_input(filename), usecols=columns, dtype=CHUNK_DTYPES, chunksize=chunksize, engine=engine)
+    else:
+        raise ValueError(f"Unsupported CSV engine: {engine}. Choose from c, python or pyarrow.")
+
+    for chunk in chunks:
+        chunk = chunk[columns]
+        chunk[FEATURE_COLUMNS] = chunk[FEATURE_COLUMNS].round(3)
+        yield chunk
+
+class _ChunkWriter:
+    """Append DataFrames to one csv or parquet file."""
+
+    def __init__(self, path, export_format):
+        if export_format not in CHUNK_EXPORT_FORMATS:
+            raise ValueError(f"Chunked processing writes {' or '.join(CHUNK_EXPORT_FORMATS)}, not {export_format}.")
+        self.path = path
+        self.export_format = export_format
+        self.rows = 0
+        self._parquet_writer = None
+
+    def write(self, df):
+        if self.export_format == 'csv':
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0,
+                      index=False, encoding='utf-8')
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+def _combine_stats(total, part, how):
+    """Merge per-group statistics of one chunk into the running totals."""
+    if total is None:
+        return part
+    return pd.concat([total, part]).groupby(level=0).agg(how)
+
+def _restore_key_types(df):
+    """Keys were read as text; turn them back into numbers when they all are, like read_csv would."""
+    try:
+        keys = pd.to_numeric(df.index)
+    except (ValueError, TypeError):
+        return df.sort_index()
+    if (keys == keys.astype('int64')).all():
+        keys = keys.astype('int64')
+    return df.set_axis(pd.Index(keys, name=df.index.name)).sort_index()
+
+def process_csv_in_chunks(input_file, output_dir, export_format='csv', chunksize=CHUNK_ROWS, engine=None,
+                          preview_rows=5):
+    """
+    Scale a CSV file too large for memory in two streaming passes.
+    The first pass collects the minimum and maximum of every group and
+    post; the second scales each chunk with them, appends it to the output
+    files and adds up the scaled values for the averages. Only the
+    REQUIRED_COLUMNS are kept. The row-level results are returned as their
+    first preview_rows rows only; 'shape' gives their full size.
+    """
+    output_dir = Path(output_dir)
+    groupings = ['group', 'post']
+
+    logger.info("Collecting group statistics from %s...", source_name(input_file))
+    data_min = {g: None for g in groupings}
+    data_max = {g: None for g in groupings}
+    with stage('load') as timer:
+        timer.rows = 0
+        for chunk in read_csv_chunks(input_file, chunksize, engine):
+            timer.rows += len(chunk)
+            for g in groupings:
+                grouped = chunk.groupby(g)[FEATURE_COLUMNS]
+                data_min[g] = _combine_stats(data_min[g], grouped.min(), 'min')
+                data_max[g] = _combine_stats(data_max[g], grouped.max(), 'max')
+
+    parameters = {}
+    for g in groupings:
+        if data_min[g] is None:
+            data_min[g] = data_max[g] = pd.DataFrame(columns=FEATURE_COLUMNS, dtype=float)
+        scale, offset = minmax_parameters(data_min[g].to_numpy(dtype=float, copy=True),
+                                          data_max[g].to_numpy(dtype=float), (-1, 1))
+        parameters[g] = (pd.DataFrame(scale, index=data_min[g].index, columns=FEATURE_COLUMNS),
+                         pd.DataFrame(offset, index=data_min[g].index, columns=FEATURE_COLUMNS))
+
+    logger.info("Scaling data by group and post...")
+    row_frames = {'df_original': None, 'df_scaled_by_group': 'group', 'df_scaled_by_post': 'post'}
+    writers = {name: _ChunkWriter(output_dir / (OUTPUT_FRAMES[name][0] + EXPORT_FORMATS[export_format]), export_format)
+               for name in row_frames}
+    previews = {}
+    sums = {g: None for g in groupings}
+    # Scaling and writing are interleaved chunk by chunk, so they are timed as one stage
+    with stage('scale') as timer:
+        timer.rows = 0
+        try:
+            for chunk in read_csv_chunks(input_file, chunksize, engine):
+                timer.rows += len(chunk)
+                for name, g in row_frames.items():
+                    out = chunk
+                    if g is not None:
+                        scale, offset = parameters[g]
+                        # Rows whose key is missing get NaN parameters and stay unscaled
+                        values = chunk[FEATURE_COLUMNS].to_numpy(dtype=float)
+                        scaled = np.round(values * scale.reindex(chunk[g]).to_numpy() + offset.reindex(chunk[g]).to_numpy(), 3)
+                        scaled_cols = [f'{col}_scaled_by_{g}' for col in FEATURE_COLUMNS]
+                        scaled_df = pd.DataFrame(scaled, index=chunk.index, columns=scaled_cols)
+                        out = pd.concat([chunk, scaled_df], axis=1)
+                        sums[g] = _combine_stats(sums[g], scaled_df.groupby(chunk[g]).agg(['sum', 'count']), 'sum')
+                    writers[name].write(out)
+                    if name not in previews:
+                        previews[name] = out.head(preview_rows)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    results = {}
+    for name, g in row_frames.items():
+        preview = previews.get(name, pd.DataFrame())
+        results[name] = {'data': preview, 'filename': writers[name].path.name,
+                         'shape': (writers[name].rows, preview.shape[1])}
+
+    logger.info("Calculating normalized averages...")
+    for name, g in (('group_averages', 'group'), ('post_averages', 'post')):
+        scaled_cols = [f'{col}_scaled_by_{g}' for col in FEATURE_COLUMNS]
+        with stage('averages'):
+            if sums[g] is None:
+                scaled_avgs = pd.DataFrame(columns=scaled_cols, dtype=float)
+            else:
+                scaled_avgs = pd.DataFrame({col: sums[g][(col, 'sum')] / sums[g][(col, 'count')] for col in scaled_cols})
+            scaled_avgs.index.name = g
+            averages = normalize_averages(_restore_key_types(scaled_avgs.round(3))).reset_index()
+        stem, sheet_name = OUTPUT_FRAMES[name]
+        filename = stem + EXPORT_FORMATS[export_format]
+        with stage('export'):
+            export_frame(averages, output_dir / filename, export_format, sheet_name)
+        results[name] = {'data': averages, 'filename': filename, 'shape': averages.shape}
+
+    logger.info("Results saved successfully!")
+    return results
+
+def write_excel(sheets, path, chunk_rows=10000):
+    """
+    Write {sheet name: DataFrame} to one workbook in openpyxl's write-only
+    mode. Rows are streamed to the file chunk by chunk, so memory stays
+    bounded however large the DataFrames are. A DataFrame longer than an
+    Excel sheet continues on sheets named '<sheet name> (2)', '(3)', ...
+    """
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        header = [str(col) for col in df.columns]
+        rows_per_sheet = EXCEL_MAX_ROWS - 1
+        for part, sheet_start in enumerate(range(0, max(len(df), 1), rows_per_sheet)):
+            title = sheet_name if part == 0 else f'{sheet_name} ({part + 1})'
+            worksheet = workbook.create_sheet(title=title[:31])
+            worksheet.append(header)
+            sheet_end = min(sheet_start + rows_per_sheet, len(df))
+            for start in range(sheet_start, sheet_end, chunk_rows):
+                chunk = df.iloc[start:min(start + chunk_rows, sheet_end)].astype(object)
+                # Missing values become empty cells, as with DataFrame.to_excel
+                chunk = chunk.where(chunk.notna(), None)
+                for row in chunk.itertuples(index=False, name=None):
+                    worksheet.append(row)
+    workbook.save(path)
+
+def export_frame(df, path, export_format, sheet_name='Sheet1'):
+    """Write a DataFrame to path in one of the EXPORT_FORMATS."""
+    if export_format == 'xlsx':
+        write_excel({sheet_name: df}, path)
+    elif export_format == 'csv':
+        df.to_csv(path, index=False, encoding='utf-8')
+    elif export_format == 'parquet':
+        df.to_parquet(path, index=False)
+    elif export_format == 'arrow':
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}. Choose from {', '.join(EXPORT_FORMATS)}.")
+
+def export_saved_frame(output_dir, filename, export_format=None):
+    """
+    Export a DataFrame kept by process_file(..., export_format=None).
+    filename names the frame (e.g. 'scaled_by_group.xlsx', or COMBINED_WORKBOOK
+    for all of them) and export_format defaults to its extension. The exported file is written once and reused
+    afterwards. Returns the exported file name, or None if no such frame was kept.
+    """
+    output_dir = Path(output_dir)
+    stem = Path(filename).stem
+    sheet_names = {file_stem: sheet_name for file_stem, sheet_name in OUTPUT_FRAMES.values()}
+    combined = filename == COMBINED_WORKBOOK
+    if combined:
+        if not all((output_dir / (file_stem + SAVED_FRAME_SUFFIX)).exists() for file_stem in sheet_names):
+            return None
+    elif frame_name(stem) is None or frame_files(frame_name(stem))[0] != stem:
+        return None
+    elif not (output_dir / (stem + SAVED_FRAME_SUFFIX)).exists():
+        # Results of chunked processing are only kept in the format they were written in
+        export_format = export_format or Path(filename).suffix.lstrip('.').lower()
+        written = [fmt for fmt, ext in EXPORT_FORMATS.items() if (output_dir / (stem + ext)).exists()]
+        if written and export_format not in written:
+            raise ValueError(f"{stem} is only available as {' or '.join(written)}.")
+        return None
+
+    export_format = export_format or Path(filename).suffix.lstrip('.').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}. Choose from {', '.join(EXPORT_FORMATS)}.")
+    if combined and export_format != 'xlsx':
+        raise ValueError(f"{COMBINED_WORKBOOK} is only available as xlsx.")
+    export_filename = stem + EXPORT_FORMATS[export_format]
+    export_path = output_dir / export_filename
+    if not export_path.exists():
+        # Write to a temporary name first so concurrent downloads never see a partial file
+        temp_path = output_dir / f'.{stem}.{os.getpid()}.tmp{EXPORT_FORMATS[export_format]}'
+        try:
+            with stage('export'):
+                if combined:
+                    write_excel({sheet_name: pd.read_feather(output_dir / (file_stem + SAVED_FRAME_SUFFIX))
+                                 for file_stem, sheet_name in OUTPUT_FRAMES.values()}, temp_path)
+                else:
+                    df = pd.read_feather(output_dir / (stem + SAVED_FRAME_SUFFIX))
+                    export_frame(df, temp_path, export_format, frame_files(frame_name(stem))[1])
+            os.replace(temp_path, export_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+    return export_filename
+
+def frame_files(name):
+    """(file stem, sheet name) of a frame process_file creates, by its name (e.g. 'df_scaled_by_user')."""
+    if name in OUTPUT_FRAMES:
+        return OUTPUT_FRAMES[name]
+    if name.startswith('df_scaled_by_'):
+        grouping = name[len('df_scaled_by_'):]
+        return f'scaled_by_{grouping}', f'Scaled by {_grouping_title(grouping)}'[:31]
+    grouping = name[:-len('_averages')]
+    return name, f'{_grouping_title(grouping)} Averages'[:31]
+
+def _grouping_title(name):
+    return ' '.join(word[:1].upper() + word[1:] for word in name.split('_'))
+
+def output_frames(groupings=DEFAULT_GROUPINGS):
+    """The DataFrames process_file creates for groupings, like OUTPUT_FRAMES: name -> (file stem, sheet name)."""
+    names = [grouping_name(level) for level in parse_groupings(groupings)]
+    frames = ['df_original'] + [f'df_scaled_by_{name}' for name in names] + [f'{name}_averages' for name in names]
+    return {frame: frame_files(frame) for frame in frames}
+
+def frame_name(name):
+    """The output_frames name of a frame given by that name or its file stem (e.g. 'scaled_by_group'), or None."""
+    if name in OUTPUT_FRAMES:
+        return name
+    default = next((frame for frame, (stem, _) in OUTPUT_FRAMES.items() if stem == name), None)
+    if default is not None:
+        return default
+    # Frames of other groupings, whose names only hold characters GROUPING_KEY_PATTERN allows
+    match = re.fullmatch(r'(?:df_)?scaled_by_([\w\- ]+)', name)
+    if match:
+        return f'df_scaled_by_{match[1]}'
+    if re.fullmatch(r'[\w\- ]+_averages', name):
+        return name
+    return None
+
+def load_saved_frame(output_dir, name):
+    """
+    A DataFrame process_file left in output_dir, by its output_frames name or
+    file stem: the one kept for export on demand, else the CSV or Parquet
+    file chunked processing wrote. None if there is no such frame.
+    """
+    name = frame_name(name)
+    if name is None:
+        return None
+    path = Path(output_dir) / frame_files(name)[0]
+    if path.with_name(path.name + SAVED_FRAME_SUFFIX).exists():
+        return pd.read_feather(path.with_name(path.name + SAVED_FRAME_SUFFIX))
+    if path.with_suffix('.parquet').exists():
+        return pd.read_parquet(path.with_suffix('.parquet'))
+    if path.with_suffix('.csv').exists():
+        return pd.read_csv(path.with_suffix('.csv'))
+    return None
+
+def process_file(input_file, output_dir='output', export_format='xlsx', single_workbook=False,
+                 chunksize=None, engine=None, sheet_name=0, file_format=None, lean=False, float32=False,
+                 groupings=DEFAULT_GROUPINGS):
     """
     Main function to process input file and generate normalized averages.
     Returns a dictionary of all DataFrames created during processing.
+    Each DataFrame is written to output_dir in export_format, in parallel
+    threads; with single_workbook=True (xlsx only) they become the sheets of
+    one COMBINED_WORKBOOK instead. With export_format=None the DataFrames are
+    only kept (as Feather files) and exported on demand by export_saved_frame.
+    With chunksize, a CSV file is streamed through process_csv_in_chunks
+    instead of being loaded whole (engine selects the CSV reader).
+    sheet_name selects the sheet of an Excel file, by name or position.
+    input_file may also be a binary file object or bytes; file_format
+    (e.g. '.csv') then names its format if it cannot be told otherwise.
+    groupings lists the levels to scale by (see parse_groupings); each
+    gives a scaled DataFrame and an averages DataFrame, named as
+    output_frames(groupings) lists them, and all of them are computed from
+    one pass over the rows (see grouped_minmax_scaling).
+    With lean=True, the key columns are held as categoricals and every
+    scaling is appended to the loaded DataFrame, which the returned
+    DataFrames share instead of each holding a copy (see compact_frame);
+    float32=True also halves the feature columns.
     """
     try:
         # Create output directory if it doesn't exist
         output_dir = Path(output_dir)
         output_dir.mkdir(exist_ok=True)
         
-        # Load and validate data
-        print(f"\nLoading data from {input_file}...")
-        df_original = load_data(input_file)
-        print("Data loaded successfully!")
+        levels = parse_groupings(groupings)
+        if chunksize:
+            if levels != parse_groupings(DEFAULT_GROUPINGS):
+                raise ValueError("Chunked processing only scales by group and by post.")
+            if input_format(input_file, file_format) != '.csv':
+                raise ValueError("Chunked processing is only available for CSV files.")
+            if single_workbook:
+                raise ValueError("Chunked processing cannot write a single workbook.")
+            return process_csv_in_chunks(input_file, output_dir, export_format or 'csv', chunksize, engine)
         
-        # Scale data by group
-        print("\nScaling data by group...")
-        df_scaled_by_group = sklearn_group_scaling(df_original, ['valence', 'arousal'], 'group', MinMaxScaler(feature_range=(-1,1)))
-        
-        # Scale data by post (only keep post scaling, remove group scaling)
-        print("Scaling data by post...")
-        df_scaled_by_post = sklearn_group_scaling(df_original, ['valence', 'arousal'], 'post', MinMaxScaler(feature_range=(-1,1)))
+        # Load and validate data
+        logger.info("Loading data from %s...", source_name(input_file))
+        with stage('load') as timer:
+            df_original = load_data(input_file, sheet_name, file_format=file_format)
+            keys = list(dict.fromkeys(key for level in levels for key in level))
+            missing_columns = [key for key in keys if key not in df_original.columns]
+            if missing_columns:
+                raise ValueError(f"Missing grouping columns: {', '.join(missing_columns)}")
+            if lean:
+                df_original = compact_frame(df_original, float32, keys)
+            timer.rows = len(df_original)
+        logger.info("Data loaded successfully!")
         
-        # Calculate normalized averages
-        print("\nCalculating normalized averages...")
-        group_averages, _ = calculate_normalized_averages(df_scaled_by_group, 'group')
-        post_averages, _ = calculate_normalized_averages(df_scaled_by_post, 'post')
+        columns = list(df_original.columns)
+        scaled_frames, averages = {}, {}
+        logger.info("Scaling data by %s...", ', '.join(GROUPING_SEPARATOR.join(level) for level in levels))
+        for level, (scaled, codes, level_keys) in zip(levels, grouped_minmax_scaling(df_original, FEATURE_COLUMNS, levels)):
+            name = grouping_name(level)
+            if lean:
+                for col, values in scaled.items():
+                    df_original[col] = values
+                df_scaled = df_original
+            else:
+                df_scaled = df_original.copy()
+                for col, values in scaled.items():
+                    df_scaled[col] = values
+                numeric_columns = df_scaled.select_dtypes(include=[np.number]).columns
+                df_scaled[numeric_columns] = df_scaled[numeric_columns].round(3)
+            scaled_frames[name] = frame_view(df_scaled, columns + list(scaled)) if lean else df_scaled
+            
+            with stage('averages'):
+                averages[name] = level_averages(df_scaled, name, codes, level_keys)
         
-        # Reset index for averages to make group/post column visible
-        group_averages = group_averages.reset_index()
-        post_averages = post_averages.reset_index()
+        frames = {'df_original': frame_view(df_original, columns) if lean else df_original}
+        frames.update((f'df_scaled_by_{name}', df) for name, df in scaled_frames.items())
+        frames.update((f'{name}_averages', df) for name, df in averages.items())
         
-        # Save all DataFrames as Excel files
-        with pd.ExcelWriter(output_dir / 'original_data.xlsx', engine='openpyxl') as writer:
-            df_original.to_excel(writer, index=False, sheet_name='Original Data')
-            
-        with pd.ExcelWriter(output_dir / 'scaled_by_group.xlsx', engine='openpyxl') as writer:
-            df_scaled_by_group.to_excel(writer, index=False, sheet_name='Scaled by Group')
-            
-        with pd.ExcelWriter(output_dir / 'scaled_by_post.xlsx', engine='openpyxl') as writer:
-            df_scaled_by_post.to_excel(writer, index=False, sheet_name='Scaled by Post')
-            
-        with pd.ExcelWriter(output_dir / 'group_averages.xlsx', engine='openpyxl') as writer:
-            group_averages.to_excel(writer, index=False, sheet_name='Group Averages')
-            
-        with pd.ExcelWriter(output_dir / 'post_averages.xlsx', engine='openpyxl') as writer:
-            post_averages.to_excel(writer, index=False, sheet_name='Post Averages')
+        # Save all DataFrames, or keep them for export on demand
+        results = {}
+        with stage('export'):
+            if export_format and single_workbook:
+                if export_format != 'xlsx':
+                    raise ValueError("A single workbook can only be written as xlsx.")
+                write_excel({frame_files(name)[1]: df for name, df in frames.items()}, output_dir / COMBINED_WORKBOOK)
+                results = {name: {'data': df, 'filename': COMBINED_WORKBOOK, 'shape': df.shape} for name, df in frames.items()}
+            elif export_format:
+                # The files are independent, so they are written in parallel threads
+                with ThreadPoolExecutor(max_workers=len(frames)) as executor:
+                    futures = []
+                    for name, df in frames.items():
+                        stem, sheet_name = frame_files(name)
+                        filename = stem + EXPORT_FORMATS[export_format]
+                        futures.append(executor.submit(export_frame, df, output_dir / filename, export_format, sheet_name))
+                        results[name] = {'data': df, 'filename': filename, 'shape': df.shape}
+                    for future in futures:
+                        future.result()
+            else:
+                for name, df in frames.items():
+                    stem, _ = frame_files(name)
+                    df.to_feather(output_dir / (stem + SAVED_FRAME_SUFFIX))
+                    results[name] = {'data': df, 'filename': f'{stem}.xlsx', 'shape': df.shape}
         
-        print("\nResults saved successfully!")
+        logger.info("Results saved successfully!")
         
         # Return all DataFrames in a dictionary
-        return {
-            'df_original': {'data': df_original, 'filename': 'original_data.xlsx'},
-            'df_scaled_by_group': {'data': df_scaled_by_group, 'filename': 'scaled_by_group.xlsx'},
-            'df_scaled_by_post': {'data': df_scaled_by_post, 'filename': 'scaled_by_post.xlsx'},
-            'group_averages': {'data': group_averages, 'filename': 'group_averages.xlsx'},
-            'post_averages': {'data': post_averages, 'filename': 'post_averages.xlsx'}
-        }
+        return results
         
     except Exception as e:
-        print(f"\nError processing file: {str(e)}")
+        logger.error("Error processing file: %s", e)
         raise e
 
+def process_batch_item(input_file, output_dir, export_format='xlsx', chunksize=None, chunk_bytes=None,
+                       engine=None, sheet_name=0, lean=False, float32=False, groupings=DEFAULT_GROUPINGS):
+    """
+    process_file for one file of a batch, run in a worker process. A CSV file
+    is processed in chunks when chunksize is given or it is larger than
+    chunk_bytes. Returns process_file's results with only the first
+    BATCH_PREVIEW_ROWS rows of each DataFrame, which is all that is sent back
+    to the parent process.
+    """
+    if input_format(input_file) == '.csv' and (
+            chunksize or (chunk_bytes is not None and os.path.getsize(input_file) > chunk_bytes)):
+        results = process_file(input_file, output_dir, export_format=export_format or 'csv',
+                               chunksize=chunksize or CHUNK_ROWS, engine=engine)
+    else:
+        results = process_file(input_file, output_dir, export_format=export_format, sheet_name=sheet_name,
+                               lean=lean, float32=float32, groupings=groupings)
+    return {name: dict(info, data=info['data'].head(BATCH_PREVIEW_ROWS)) for name, info in results.items()}
+
+def process_batch(pattern, output_dir='output', workers=None, **kwargs):
+    """
+    Process every CSV and Excel file of a directory, or every file matching a
+    glob pattern, in a pool of worker processes (one per CPU unless workers
+    is given), each into a folder of output_dir named after the file. kwargs
+    go to process_batch_item. Logs each file's outcome as it finishes and
+    returns the batch summary with the total rows processed.
+    """
+    inputs = batch_inputs(pattern, BATCH_EXTENSIONS)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    items = [(path, output_dir / name) for path, name in zip(inputs, output_names(inputs))]
+    logger.info("Processing %d files...", len(items))
+    
+    started = time.perf_counter()
+    outcomes = []
+    rows = 0
+    for index, outcome in run_batch(partial(process_batch_item, **kwargs), items, workers):
+        outcomes.append(outcome)
+        if 'error' in outcome:
+            logger.error("%s: failed: %s", inputs[index], outcome['error'])
+            continue
+        results = outcome['result']
+        rows += results['df_original']['shape'][0]
+        keys = ', '.join(f"{info['shape'][0]} {name[:-len('_averages')]}" for name, info in results.items()
+                         if name.endswith('_averages'))
+        logger.info("%s: %d rows, %s keys in %.2fs -> %s", inputs[index],
+                    results['df_original']['shape'][0], keys, outcome['seconds'], items[index][1])
+    
+    summary = dict(batch_summary(outcomes, started), rows=rows)
+    logger.info("\nProcessed %d of %d files (%d failed), %d rows in %.2fs.", summary['succeeded'],
+                summary['items'], summary['failed'], rows, summary['seconds'])
+    return summary
+
 def print_usage():
     """Print usage instructions."""
     print("\nUsage:")
-    print("python scaling_features.py <input_file> [output_dir]")
+    print("python scaling_features.py <input_file> [output_dir] [--chunksize ROWS] [--engine pyarrow] [--sheet NAME]")
+    print("                           [--groupby group,post,...] [--lean] [--float32]")
+    print("python scaling_features.py <directory or glob> [output_dir] [--workers N] [...]")
     print("\nSupported file formats:")
     print("- Excel files (.xlsx, .xls)")
     print("- CSV files (.csv)")
@@ -212,16 +987,65 @@ def print_usage():
     print("- valence")
     print("- arousal")
     print("\nOutput files will be created in the specified output directory.")
+    print("With --chunksize, a CSV file larger than memory is processed in chunks of")
+    print("that many rows and the results are written as CSV files.")
+    print("--sheet selects the sheet of an Excel file (default: the first one).")
+    print("--groupby lists the columns to scale by (default: group,post); 'group/post'")
+    print("scales every post within its group. Each gives a scaled and an averages file.")
+    print("--lean keeps group and post as categoricals and shares the columns of the results,")
+    print("about halving peak memory; --float32 also stores values as float32.")
+    print("Given a directory or a glob pattern (quoted, e.g. 'data/*.csv'), every CSV and")
+    print("Excel file is processed in a pool of --workers processes (default: one per CPU),")
+    print("each into a folder of the output directory named after the file.")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = sys.argv[1:]
+    options = {}
+    for flag in ('--chunksize', '--engine', '--sheet', '--workers', '--groupby'):
+        if flag in args:
+            i = args.index(flag)
+            if i + 1 == len(args):
+                print(f"\nError: {flag} needs a value.")
+                print_usage()
+                sys.exit(1)
+            options[flag] = args[i + 1]
+            del args[i:i + 2]
+    switches = {flag: flag in args for flag in ('--lean', '--float32')}
+    args = [arg for arg in args if arg not in switches]
+    if len(args) < 1 or len(args) > 2:
         print("\nError: Please provide the input file path and optionally the output directory.")
         print_usage()
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) == 3 else 'output'
-    result = process_file(input_file, output_dir)
+    input_file = args[0]
+    output_dir = args[1] if len(args) == 2 else 'output'
+    try:
+        groupings = parse_groupings(options.get('--groupby', DEFAULT_GROUPINGS))
+    except ValueError as e:
+        print(f"\nError: {e}")
+        print_usage()
+        sys.exit(1)
+    if is_batch_input(input_file):
+        summary = process_batch(input_file, output_dir,
+                                workers=int(options['--workers']) if '--workers' in options else None,
+                                chunksize=int(options['--chunksize']) if '--chunksize' in options else None,
+                                engine=options.get('--engine'), sheet_name=options.get('--sheet', 0),
+                                lean=switches['--lean'] or switches['--float32'], float32=switches['--float32'],
+                                groupings=groupings)
+        sys.exit(1 if summary['failed'] or not summary['items'] else 0)
+    try:
+        if '--chunksize' in options:
+            result = process_file(input_file, output_dir, export_format='csv',
+                                  chunksize=int(options['--chunksize']), engine=options.get('--engine'),
+                                  groupings=groupings)
+        else:
+            result = process_file(input_file, output_dir, sheet_name=options.get('--sheet', 0),
+                                  lean=switches['--lean'] or switches['--float32'], float32=switches['--float32'],
+                                  groupings=groupings)
+    except ValueError:
+        # process_file has logged why
+        sys.exit(1)
     if result:
         print("\nProcessing completed successfully!")
     else:
@@ -0,0 +1,225 @@
+"""
+Word counts accumulated over many documents and kept in SQLite.
+
+Usage:
+    python word_corpus.py <corpus.sqlite> add <text_file>...
+    python word_corpus.py <corpus.sqlite> remove <document_id>...
+    python word_corpus.py <corpus.sqlite> top [n]
+
+Documents are counted with WordFrequencyAnalyzer's tokenizer and word
+variations, and their counts are added to a words table. An index on the
+count keeps the words in order of frequency as counts change, so the top
+words are read off the front of the index instead of being recounted, and
+the totals sit in a one-row table updated in the same transaction. Every
+document keeps its own counts, so it can be removed again.
+
+Words whose counts tie are ordered alphabetically. Similar words are not
+combined: combine_similar_words compares whole vocabularies, which does not
+fit incremental updates.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Union
+
+from word_frequency import WordFrequencyAnalyzer
+from instrumentation import stage
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS words (word TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS words_by_count ON words (count DESC, word);
+CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, added_at REAL NOT NULL,
+                                      words INTEGER NOT NULL, counts TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), words INTEGER NOT NULL,
+                                   unique_words INTEGER NOT NULL, documents INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0);
+'''
+# Top words read from the index at a time; smaller requests are answered from memory
+TOP_CACHE_SIZE = 100
+
+
+class WordCorpus:
+    """A corpus stored in the SQLite file at path; analyzer counts the documents added to it."""
+
+    def __init__(self, path: Union[str, os.PathLike], analyzer: WordFrequencyAnalyzer = None):
+        self.path = Path(path)
+        self.analyzer = analyzer or WordFrequencyAnalyzer()
+        # One connection, shared by the threads of a process one call at a time
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None,
+                                           check_same_thread=False)
+        # Readers in other processes are not blocked while a document is added; in WAL mode
+        # synchronous=NORMAL can only lose the last commits on power loss, never corrupt the file
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+        self._version = None
+        self._totals = None
+        self._top = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    @contextmanager
+    def _transaction(self):
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
+
+    def _check_cache(self) -> None:
+        """Drop the cached answers if another connection changed the corpus since they were read."""
+        version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._version:
+            self._version = version
+            self._totals = None
+            self._top = None
+
+    def _read_totals(self) -> tuple:
+        if self._totals is None:
+            self._totals = self._connection.execute(
+                'SELECT words, unique_words, documents FROM totals').fetchone()
+        return self._totals
+
+    def add_document(self, text: str, document_id: str = None) -> str:
+        """Count a document's words into the corpus and return its ID (a new one unless given)."""
+        return self.add_counts(self.analyzer.count_words(text), document_id)
+
+    def add_file(self, source: Union[str, os.PathLike, Iterable], document_id: str = None) -> str:
+        """Like add_document for a file path or an iterable of text chunks, read chunk by chunk."""
+        return self.add_counts(self.analyzer.count_stream(source), document_id)
+
+    def add_counts(self, counts: Dict[str, int], document_id: str = None) -> str:
+        """Add a document's word counts to the corpus and return its ID. Raises ValueError if the ID is taken."""
+        document_id = document_id or uuid.uuid4().hex
+        words = sum(counts.values())
+        with stage('corpus_update') as timer, self._lock:
+            timer.rows = words
+            try:
+                with self._transaction() as connection:
+                    connection.execute('INSERT INTO documents VALUES (?, ?, ?, ?)',
+                                       (document_id, time.time(), words, json.dumps(counts, ensure_ascii=False)))
+                    before = connection.total_changes
+                    connection.executemany('INSERT OR IGNORE INTO words VALUES (?, 0)', ((word,) for word in counts))
+                    new_words = connection.total_changes - before
+                    connection.executemany('UPDATE words SET count = count + ? WHERE word = ?',
+                                           ((count, word) for word, count in counts.items()))
+                    connection.execute('UPDATE totals SET words = words + ?, unique_words = unique_words + ?, '
+                                       'documents = documents + 1', (words, new_words))
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Document {document_id} is already in the corpus")
+            finally:
+                self._version = None
+        return document_id
+
+    def remove_document(self, document_id: str) -> bool:
+        """Subtract a document's counts from the corpus; returns whether it was there."""
+        with stage('corpus_update') as timer, self._lock:
+            try:
+                with self._transaction() as connection:
+                    row = connection.execute('SELECT words, counts FROM documents WHERE id = ?',
+                                             (document_id,)).fetchone()
+                    if row is None:
+                        return False
+                    words, counts = row[0], json.loads(row[1])
+                    timer.rows = words
+                    connection.executemany('UPDATE words SET count = count - ? WHERE word = ?',
+                                           ((count, word) for word, count in counts.items()))
+                    before = connection.total_changes
+                    connection.execute('DELETE FROM words WHERE count <= 0')
+                    removed_words = connection.total_changes - before
+                    connection.execute('DELETE FROM documents WHERE id = ?', (document_id,))
+                    connection.execute('UPDATE totals SET words = words - ?, unique_words = unique_words - ?, '
+                                       'documents = documents - 1', (words, removed_words))
+            finally:
+                self._version = None
+        return True
+
+    def get_top_words(self, n: int = 10) -> list:
+        """The n most frequent words, as records like WordFrequencyAnalyzer.get_top_words returns."""
+        with self._lock:
+            self._check_cache()
+            total, unique, _ = self._read_totals()
+            if self._top is None or (len(self._top) < min(n, unique)):
+                self._top = self._connection.execute(
+                    'SELECT word, count FROM words ORDER BY count DESC, word LIMIT ?',
+                    (max(n, TOP_CACHE_SIZE),)).fetchall()
+            top = self._top[:n]
+        return [{'word': word, 'frequency': count, 'percentage': round(count / total * 100, 2)}
+                for word, count in top]
+
+    def get_total_words(self) -> int:
+        """Get the total number of words."""
+        with self._lock:
+            self._check_cache()
+            return self._read_totals()[0]
+
+    def get_unique_words(self) -> int:
+        """Get the number of unique words."""
+        with self._lock:
+            self._check_cache()
+            return self._read_totals()[1]
+
+    def get_document_count(self) -> int:
+        """Get the number of documents."""
+        with self._lock:
+            self._check_cache()
+            return self._read_totals()[2]
+
+    def has_document(self, document_id: str) -> bool:
+        with self._lock:
+            return self._connection.execute('SELECT 1 FROM documents WHERE id = ?',
+                                            (document_id,)).fetchone() is not None
+
+    def word_counts(self) -> Counter:
+        """All of the corpus' counts, most frequent first."""
+        with self._lock:
+            return Counter(dict(self._connection.execute(
+                'SELECT word, count FROM words ORDER BY count DESC, word')))
+
+
+def main():
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+    args = sys.argv[1:]
+    if len(args) < 2 or args[1] not in ('add', 'remove', 'top') or (args[1] != 'top' and len(args) < 3):
+        print(__doc__)
+        sys.exit(1)
+
+    with WordCorpus(args[0]) as corpus:
+        if args[1] == 'add':
+            for path in args[2:]:
+                print(f"{path}: {corpus.add_file(path)}")
+        elif args[1] == 'remove':
+            for document_id in args[2:]:
+                if not corpus.remove_document(document_id):
+                    print(f"Unknown document: {document_id}")
+        print(f"\nDocuments: {corpus.get_document_count()}")
+        print(f"Total words: {corpus.get_total_words()}")
+        print(f"Unique words: {corpus.get_unique_words()}")
+        if args[1] == 'top':
+            print()
+            for record in corpus.get_top_words(int(args[2]) if len(args) > 2 else 10):
+                print(f"{record['word']}\t{record['frequency']}\t{record['percentage']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,295 @@
 # Import Libraries
 import pandas as pd
 import re
-from collections import Counter
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
 from pathlib import Path
 import matplotlib.pyplot as plt
 import os
 import sys
-from typing import Dict, List, Union
+from typing import Dict, Iterable, Iterator, List, Union
 import locale
 import io
 import codecs
+import mmap
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+from functools import lru_cache
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from instrumentation import stage
+from batch import batch_inputs, batch_summary, is_batch_input, output_names, run_batch
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer shared by analyze_text and analyze_stream
+WORD_PATTERN = re.compile(r'\b\w+\b')
+# A word that may continue in the next chunk
+TRAILING_WORD_PATTERN = re.compile(r'\w+$')
+# Shards for analyze_parallel are cut at whitespace so no word is split
+SHARD_BOUNDARY_PATTERN = re.compile(r'\s')
+SHARD_BOUNDARY_BYTES_PATTERN = re.compile(rb'\s')
+# Files of a directory that analyze_batch analyzes
+BATCH_EXTENSIONS = ('.txt',)
 
 # Set up console encoding for Windows
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+@lru_cache(maxsize=None)
+def _min_matches(threshold: float, length: int) -> int:
+    # Mirror SequenceMatcher.ratio(), i.e. 2.0 * matches / length > threshold
+    matches = max(int(threshold * length / 2), 0)
+    while matches > 0 and 2.0 * (matches - 1) / length > threshold:
+        matches -= 1
+    while 2.0 * matches / length <= threshold:
+        matches += 1
+    return matches
+
+class SimilarWordIndex:
+    """
+    Candidate index used by combine_similar_words.
+    Prefix matches come from a sorted word list and fuzzy matches from a
+    character-bigram inverted index, so only a handful of candidates per
+    word reach the exact SequenceMatcher check.
+    """
+
+    def __init__(self, words: List[str], similarity_threshold: float):
+        self.words = words
+        self.threshold = similarity_threshold
+        self.alive = [True] * len(words)
+        self.ids = {word: i for i, word in enumerate(words)}
+
+        # Sorted words for prefix ranges; next_pos skips over removed words
+        self.sorted_ids = sorted(range(len(words)), key=words.__getitem__)
+        self.sorted_words = [words[i] for i in self.sorted_ids]
+        self.position = [0] * len(words)
+        for pos, i in enumerate(self.sorted_ids):
+            self.position[i] = pos
+        self.next_pos = list(range(len(words) + 1))
+
+        # Bigram occurrences (so repeated bigrams count as a multiset) per word
+        self.grams = [self._bigrams(word) for word in words]
+        # Postings are keyed by (word length, bigram) and hold (word, position)
+        # pairs, so only lengths that can pass the ratio check are scanned
+        self.postings = defaultdict(list)
+        self.gram_counts = Counter()
+        self.by_length = defaultdict(list)
+        for i, word in enumerate(words):
+            for pos in range(len(word) - 1):
+                self.postings[len(word), word[pos:pos + 2]].append((i, pos))
+                self.gram_counts[word[pos:pos + 2]] += 1
+            self.by_length[len(word)].append(i)
+        self.lengths = sorted(self.by_length)
+
+    @staticmethod
+    def _bigrams(word: str) -> frozenset:
+        seen = Counter()
+        grams = []
+        for k in range(len(word) - 1):
+            gram = word[k:k + 2]
+            grams.append((gram, seen[gram]))
+            seen[gram] += 1
+        return frozenset(grams)
+
+    def _min_matches(self, la: int, lb: int) -> int:
+        """Smallest matching-character count giving a ratio above the threshold."""
+        return _min_matches(self.threshold, la + lb)
+
+    def _min_shared_bigrams(self, la: int, lb: int) -> Union[int, None]:
+        """
+        Lower bound on shared bigrams for two words that can pass the ratio
+        check, or None when their lengths alone rule it out. SequenceMatcher
+        matches at most LCS characters, and every character outside a common
+        subsequence of length L breaks at most one of its L - 1 bigrams.
+        """
+        matches = self._min_matches(la, lb)
+        if matches > min(la, lb):
+            return None
+        return 3 * matches - 1 - la - lb
+
+    def remove(self, i: int) -> None:
+        self.alive[i] = False
+        self.next_pos[self.position[i]] = self.position[i] + 1
+
+    def _find(self, pos: int) -> int:
+        root = pos
+        while self.next_pos[root] != root:
+            root = self.next_pos[root]
+        while self.next_pos[pos] != root:
+            self.next_pos[pos], pos = root, self.next_pos[pos]
+        return root
+
+    def prefix_matches(self, i: int):
+        """Live words that are a prefix of word i or have it as a prefix."""
+        word = self.words[i]
+        for k in range(1, len(word)):
+            j = self.ids.get(word[:k])
+            if j is not None and self.alive[j]:
+                yield j
+
+        lo = bisect_left(self.sorted_words, word)
+        hi = bisect_left(self.sorted_words, word + '\U0010ffff')
+        pos = self._find(lo)
+        while pos < hi:
+            j = self.sorted_ids[pos]
+            if j != i:
+                yield j
+            pos = self._find(pos + 1)
+
+    def _live(self, entries: list) -> list:
+        """Drop removed words from a (word, position) list in place and return it."""
+        entries[:] = [entry for entry in entries if self.alive[entry[0]]]
+        return entries
+
+    def fuzzy_candidates(self, i: int):
+        """Live words that pass the length and bigram filters for word i."""
+        word = self.words[i]
+        la = len(word)
+        grams = self.grams[i]
+        # Bigram positions of word i, rarest bigrams first
+        ranked = sorted(((word[pos:pos + 2], pos) for pos in range(la - 1)),
+                        key=lambda item: self.gram_counts[item[0]])
+        seen = {i}
+        for lb in self.lengths:
+            min_shared = self._min_shared_bigrams(la, lb)
+            if min_shared is None:
+                continue
+
+            if min_shared <= 0:
+                # Loose threshold: the bigram filter cannot prune, scan the length
+                candidates = [j for j in self.by_length[lb] if self.alive[j]]
+            else:
+                # Any word sharing min_shared bigrams of a common subsequence
+                # must contain one of the len(ranked) - min_shared + 1 rarest
+                # bigrams of word i, shifted by no more than the indel distance
+                max_shift = la + lb - 2 * self._min_matches(la, lb)
+                candidates = []
+                for gram, pos in ranked[:len(ranked) - min_shared + 1]:
+                    entries = self.postings.get((lb, gram))
+                    if entries:
+                        candidates.extend(j for j, other_pos in self._live(entries)
+                                          if abs(other_pos - pos) <= max_shift)
+
+            for j in candidates:
+                if j in seen:
+                    continue
+                seen.add(j)
+                if min_shared <= 0 or len(grams & self.grams[j]) >= min_shared:
+                    yield j
+
+class WordNormalizer:
+    """
+    Normalizer compiled once from a word variations table.
+    Single-word variants are remapped per distinct word rather than per
+    token, and multi-word variants ('cash back') are matched as phrases
+    over the token stream, preferring the longest phrase at each token.
+    """
+
+    def __init__(self, word_variations: Dict[str, List[str]]):
+        self.word_variations = word_variations
+        self.mapping = {}
+        self.phrases = {}
+        # Longest phrase starting with each token
+        self.phrase_starts = {}
+        # Tokens that appear after the first position of some phrase
+        self.continuation_tokens = set()
+        for main_word, variations in word_variations.items():
+            for var in variations:
+                tokens = tuple(WORD_PATTERN.findall(var.lower()))
+                if len(tokens) == 1:
+                    self.mapping[tokens[0]] = main_word
+                elif len(tokens) > 1:
+                    self.phrases[tokens] = main_word
+                    self.phrase_starts[tokens[0]] = max(len(tokens), self.phrase_starts.get(tokens[0], 0))
+                    self.continuation_tokens.update(tokens[1:])
+
+    @classmethod
+    def from_file(cls, path: Union[str, os.PathLike]) -> 'WordNormalizer':
+        """Build a normalizer from a JSON or YAML variations file (cached per file version)."""
+        stat = os.stat(path)
+        return _load_normalizer(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def merge_phrases(self, tokens: List[str]) -> Iterator[str]:
+        """Yield tokens with every multi-word variant replaced by its main word."""
+        i = 0
+        n = len(tokens)
+        while i < n:
+            token = tokens[i]
+            longest = self.phrase_starts.get(token)
+            if longest:
+                for length in range(min(longest, n - i), 1, -1):
+                    main_word = self.phrases.get(tuple(tokens[i:i + length]))
+                    if main_word is not None:
+                        yield main_word
+                        i += length
+                        break
+                else:
+                    yield token
+                    i += 1
+            else:
+                yield token
+                i += 1
+
+    def count(self, tokens: List[str]) -> Counter:
+        """Count normalized tokens, in order of first appearance."""
+        raw_counts = Counter(tokens)
+        if self.phrases and not self.phrase_starts.keys().isdisjoint(raw_counts):
+            raw_counts = Counter(self.merge_phrases(tokens))
+        counts = Counter()
+        for token, count in raw_counts.items():
+            counts[self.mapping.get(token, token)] += count
+        return counts
+
+    def is_safe_cut(self, following_text: str) -> bool:
+        """
+        Whether text can be split right before following_text without
+        breaking a phrase, i.e. its first word does not continue a phrase.
+        """
+        if not self.continuation_tokens:
+            return True
+        match = WORD_PATTERN.search(following_text.lower())
+        # A word running to the end of the text may be cut short, so it is not trusted
+        return (match is not None and match.end() < len(following_text)
+                and match.group() not in self.continuation_tokens)
+
+def load_word_variations(path: Union[str, os.PathLike]) -> Dict[str, List[str]]:
+    """Load a {main word: [variations]} table from a JSON or YAML file."""
+    suffix = Path(path).suffix.lower()
+    with open(path, 'r', encoding='utf-8') as f:
+        if suffix == '.json':
+            variations = json.load(f)
+        elif suffix in ['.yaml', '.yml']:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to load YAML word variations files")
+            variations = yaml.safe_load(f)
+        else:
+            raise ValueError(f"Unsupported word variations file: {suffix}. Please use JSON or YAML.")
+    if not isinstance(variations, dict):
+        raise ValueError("Word variations file must map each main word to a list of variations")
+    return {str(main_word): [str(var) for var in variants] for main_word, variants in variations.items()}
+
+@lru_cache(maxsize=8)
+def _load_normalizer(path: str, mtime_ns: int, size: int) -> WordNormalizer:
+    return WordNormalizer(load_word_variations(path))
+
 class WordFrequencyAnalyzer:
-    def __init__(self):
+    def __init__(self, variations_file: Union[str, os.PathLike] = None):
         self.df = None
         self.word_counts = None
         self.total_words = 0
         # Set default output directory path, can be overridden
         self.output_dir = 'output'
+        # Budget for combine_similar_words: only the most frequent words take
+        # part, and words still unprocessed after the time limit (in seconds)
+        # are kept as they are. None means no limit.
+        self.combine_max_words = None
+        self.combine_time_budget = None
         # Common word variations to normalize
         self.word_variations = {
             'קאשבק': ['קאש בק', 'קש בק', 'קשבק', 'cashback', 'cash back'],
@@ -31,52 +298,74 @@ class WordFrequencyAnalyzer:
             'נקודות': ['נקודת'],
             'קניות': ['קנייה', 'קניה'],
         }
-        # Create reverse mapping for quick lookup
-        self.word_mapping = {}
-        for main_word, variations in self.word_variations.items():
-            for var in variations:
-                self.word_mapping[var.lower()] = main_word
+        if variations_file:
+            self.load_word_variations(variations_file)
+        else:
+            self.set_word_variations(self.word_variations)
+
+    def set_word_variations(self, word_variations: Dict[str, List[str]]) -> None:
+        """Set the word variations table and compile its normalizer."""
+        self._use_normalizer(WordNormalizer(word_variations))
+
+    def load_word_variations(self, path: Union[str, os.PathLike]) -> None:
+        """Load the word variations table from a JSON or YAML file."""
+        self._use_normalizer(WordNormalizer.from_file(path))
+
+    def _use_normalizer(self, normalizer: WordNormalizer) -> None:
+        self.normalizer = normalizer
+        self.word_variations = normalizer.word_variations
+        # Single-word mapping for quick lookup
+        self.word_mapping = normalizer.mapping
 
     def get_similarity_ratio(self, a: str, b: str) -> float:
         """Calculate similarity ratio between two strings."""
         return SequenceMatcher(None, a, b).ratio()
 
-    def combine_similar_words(self, similarity_threshold: float = 0.85) -> None:
+    def combine_similar_words(self, similarity_threshold: float = 0.85,
+                              max_words: int = None, time_budget: float = None) -> None:
         """Combine words that are similar above the threshold."""
         if self.df is None or len(self.df) == 0:
             return
 
+        if max_words is None:
+            max_words = self.combine_max_words
+        if time_budget is None:
+            time_budget = self.combine_time_budget
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+
         # Sort by frequency to prioritize more frequent words
-        self.df = self.df.sort_values('frequency', ascending=False)
-        
-        # Create a new DataFrame for the combined results
+        self.df = self.df.sort_values('frequency', ascending=False, kind='stable')
+        words = self.df['word'].tolist()
+        frequencies = self.df['frequency'].tolist()
+        limit = len(words) if max_words is None else min(max_words, len(words))
+        index = SimilarWordIndex(words[:limit], similarity_threshold)
+
+        # Create the combined results
         new_rows = []
-        skip_words = set()
 
-        for i, row in self.df.iterrows():
-            if row['word'] in skip_words:
+        for i in range(limit):
+            if not index.alive[i]:
                 continue
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            index.remove(i)
 
-            base_word = row['word']
-            total_freq = row['frequency']
+            base_word = words[i]
+            total_freq = frequencies[i]
             similar_words = []
 
-            # Compare with all other words
-            for j, other_row in self.df.iterrows():
-                if i != j and other_row['word'] not in skip_words:
-                    other_word = other_row['word']
-                    
-                    # Check if one word is a prefix of the other
-                    is_prefix = other_word.startswith(base_word) or base_word.startswith(other_word)
-                    
-                    # Calculate similarity only if they share a prefix or are very similar
-                    if is_prefix or self.get_similarity_ratio(base_word, other_word) > similarity_threshold:
-                        total_freq += other_row['frequency']
-                        similar_words.append(other_word)
-                        skip_words.add(other_word)
+            # Prefix matches first, then fuzzy candidates for the exact ratio check
+            for j in index.prefix_matches(i):
+                similar_words.append(j)
+                index.remove(j)
+            for j in index.fuzzy_candidates(i):
+                if self.get_similarity_ratio(base_word, words[j]) > similarity_threshold:
+                    similar_words.append(j)
+                    index.remove(j)
 
             if similar_words:
-                print(f"\nCombined words: {base_word} + {similar_words}")
+                total_freq += sum(frequencies[j] for j in similar_words)
+                logger.debug("Combined words: %s + %s", base_word, [words[j] for j in similar_words])
                 
             new_rows.append({
                 'word': base_word,
@@ -84,6 +373,11 @@ class WordFrequencyAnalyzer:
                 'percentage': 0  # We'll calculate this later
             })
 
+        # Words outside the budget are kept as they are
+        for i in range(len(words)):
+            if i >= limit or index.alive[i]:
+                new_rows.append({'word': words[i], 'frequency': frequencies[i], 'percentage': 0})
+
         # Create new DataFrame and recalculate percentages
         self.df = pd.DataFrame(new_rows)
         total_freq = self.df['frequency'].sum()
@@ -149,6 +443,51 @@ class WordFrequencyAnalyzer:
         
         return normalized_words
     
+    def _clear_results(self) -> None:
+        """Reset the analysis results to an empty table."""
+        self.word_counts = Counter()
+        self.total_words = 0
+        self.df = pd.DataFrame(columns=['word', 'frequency', 'percentage'])
+
+    def _build_results(self, word_counts: Counter) -> None:
+        """Build the frequency table from word counts."""
+        self.word_counts = word_counts
+        self.total_words = sum(self.word_counts.values())
+        
+        # Create DataFrame
+        word_freq = [(word, int(count)) for word, count in self.word_counts.most_common()]  # Convert to int
+        
+        # If no words after processing, create empty DataFrame
+        if not word_freq:
+            self.df = pd.DataFrame(columns=['word', 'frequency', 'percentage'])
+            return
+            
+        self.df = pd.DataFrame(word_freq, columns=['word', 'frequency'])
+        
+        # Calculate percentages
+        self.df['percentage'] = (self.df['frequency'] / self.total_words * 100).round(2)
+        
+        # Convert frequency to standard Python int
+        self.df['frequency'] = self.df['frequency'].astype(int)
+        
+        # Combine similar words only if we have words
+        if len(self.df) > 0:
+            with stage('combine') as timer:
+                timer.rows = len(self.df)
+                self.combine_similar_words()
+        
+        # Sort by frequency
+        self.df = self.df.sort_values('frequency', ascending=False).reset_index(drop=True)
+
+    def count_words(self, text: str) -> Counter:
+        """Tokenize text and count the normalized words, in order of first appearance."""
+        with stage('tokenize') as timer:
+            tokens = WORD_PATTERN.findall(text.lower())
+            timer.rows = len(tokens)
+        with stage('normalize') as timer:
+            timer.rows = len(tokens)
+            return self.normalizer.count(tokens)
+
     def analyze_text(self, text: str) -> None:
         """Analyze the text and compute word frequencies."""
         try:
@@ -158,58 +497,170 @@ class WordFrequencyAnalyzer:
             
             # Handle empty text
             if text.strip() == "":
-                self.word_counts = Counter()
-                self.total_words = 0
-                self.df = pd.DataFrame(columns=['word', 'frequency', 'percentage'])
+                self._clear_results()
                 return
                 
-            # Split text into words
-            words = re.findall(r'\b\w+\b', text.lower())
+            # Split text into words, normalize variations and count them
+            word_counts = self.count_words(text)
             
             # If no words found, create empty results
-            if not words:
-                self.word_counts = Counter()
-                self.total_words = 0
-                self.df = pd.DataFrame(columns=['word', 'frequency', 'percentage'])
+            if not word_counts:
+                self._clear_results()
                 return
             
-            # Normalize word variations
-            normalized_words = [self.normalize_word(word) for word in words]
-            
-            # Count word frequencies
-            self.word_counts = Counter(normalized_words)
-            self.total_words = sum(self.word_counts.values())
-            
-            # Create DataFrame
-            word_freq = [(word, int(count)) for word, count in self.word_counts.most_common()]  # Convert to int
-            
-            # If no words after processing, create empty DataFrame
-            if not word_freq:
-                self.df = pd.DataFrame(columns=['word', 'frequency', 'percentage'])
-                return
-                
-            self.df = pd.DataFrame(word_freq, columns=['word', 'frequency'])
-            
-            # Calculate percentages
-            self.df['percentage'] = (self.df['frequency'] / self.total_words * 100).round(2)
-            
-            # Convert frequency to standard Python int
-            self.df['frequency'] = self.df['frequency'].astype(int)
-            
-            # Combine similar words only if we have words
-            if len(self.df) > 0:
-                self.combine_similar_words()
-            
-            # Sort by frequency
-            self.df = self.df.sort_values('frequency', ascending=False).reset_index(drop=True)
+            self._build_results(word_counts)
             
         except Exception as e:
-            print(f"Error in analyze_text: {str(e)}")
+            logger.error("Error in analyze_text: %s", e)
             # Create empty results on error
-            self.word_counts = Counter()
-            self.total_words = 0
-            self.df = pd.DataFrame(columns=['word', 'frequency', 'percentage'])
+            self._clear_results()
+
+    def iter_text_chunks(self, source: Union[str, os.PathLike, Iterable],
+                         chunk_size: int = 1 << 20) -> Iterator[str]:
+        """
+        Yield text chunks from a file path or an iterable of str/bytes.
+        Files are read through mmap and decoded incrementally as UTF-8, so
+        at most one chunk of the file is held in memory at a time.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start in range(0, len(mm), chunk_size):
+                        yield decoder.decode(mm[start:start + chunk_size])
+        else:
+            for chunk in source:
+                yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        yield decoder.decode(b'', final=True)
+
+    def analyze_stream(self, source: Union[str, os.PathLike, Iterable],
+                       chunk_size: int = 1 << 20) -> None:
+        """
+        Analyze a file path or an iterable of text chunks (e.g. an open file)
+        without loading it all at once. Counts are updated chunk by chunk,
+        and a word cut at a chunk boundary is carried over to the next
+        chunk, so the results match analyze_text on the whole text.
+        """
+        word_counts = self.count_stream(source, chunk_size)
+        if not word_counts:
+            self._clear_results()
+            return
+        self._build_results(word_counts)
     
+    def count_stream(self, source: Union[str, os.PathLike, Iterable],
+                     chunk_size: int = 1 << 20) -> Counter:
+        """Count the normalized words of a file path or an iterable of text chunks, chunk by chunk."""
+        word_counts = Counter()
+        carry = ''
+        for chunk in self.iter_text_chunks(source, chunk_size):
+            text = carry + chunk
+            cut = self._safe_cut(text)
+            carry, text = text[cut:], text[:cut]
+            word_counts.update(self.count_words(text))
+        if carry:
+            word_counts.update(self.count_words(carry))
+        return word_counts
+
+    def _safe_cut(self, text: str) -> int:
+        """Position where a chunk can be cut without splitting a word or a phrase."""
+        trailing = TRAILING_WORD_PATTERN.search(text)
+        end = trailing.start() if trailing else len(text)
+        if not self.normalizer.continuation_tokens:
+            return end
+
+        # Cut before the last complete word that cannot continue a phrase
+        window = 4096
+        while True:
+            start = max(end - window, 0)
+            matches = list(WORD_PATTERN.finditer(text, start, end))
+            if start > 0:
+                # The first word may have been cut by the window
+                matches = matches[1:]
+            for match in reversed(matches):
+                if match.group().lower() not in self.normalizer.continuation_tokens:
+                    return match.start()
+            if start == 0:
+                return 0
+            window *= 2
+
+    def plan_shards(self, text: str = None, files: Iterable = None,
+                    shard_size: int = 8 << 20) -> list:
+        """
+        Split text (by characters) and files (by bytes) into shards of about
+        shard_size, cutting only at whitespace that does not split a phrase.
+        File shards are (path, start, end) byte ranges read by the worker.
+        """
+        shards = []
+        if text:
+            start = 0
+            while start < len(text):
+                end = start + shard_size
+                while True:
+                    boundary = SHARD_BOUNDARY_PATTERN.search(text, end)
+                    end = boundary.end() if boundary else len(text)
+                    if not boundary or self.normalizer.is_safe_cut(text[end:end + 256]):
+                        break
+                shards.append(text[start:end])
+                start = end
+        for path in files or []:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    start = 0
+                    while start < size:
+                        end = start + shard_size
+                        while True:
+                            boundary = SHARD_BOUNDARY_BYTES_PATTERN.search(mm, end)
+                            end = boundary.end() if boundary else size
+                            following = mm[end:end + 256].decode('utf-8', errors='ignore')
+                            if not boundary or self.normalizer.is_safe_cut(following):
+                                break
+                        shards.append((str(path), start, end))
+                        start = end
+        return shards
+
+    def count_shard(self, shard: Union[str, tuple]) -> Counter:
+        """Count the normalized words of a text shard or a (path, start, end) file shard."""
+        if isinstance(shard, str):
+            return self.count_words(shard)
+        path, start, end = shard
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.count_words(mm[start:end].decode('utf-8'))
+
+    def analyze_parallel(self, text: str = None, files: Iterable = None,
+                         workers: int = None, shard_size: int = 8 << 20) -> None:
+        """
+        Analyze text and/or files on a pool of worker processes.
+        The input is split into shards, each worker counts its shards with
+        count_words, and the partial counts are merged in input order before
+        percentages and similar-word combining, so the results match the
+        serial analyze_text/analyze_stream path. workers defaults to the CPU
+        count; with a single shard or worker everything runs in-process.
+        """
+        shards = self.plan_shards(text, files, shard_size)
+        workers = workers or os.cpu_count() or 1
+
+        word_counts = Counter()
+        if workers == 1 or len(shards) <= 1:
+            for shard in shards:
+                word_counts.update(self.count_shard(shard))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards)),
+                                     initializer=_init_worker,
+                                     initargs=(self.word_variations,)) as executor:
+                for counts in executor.map(_count_shard, shards):
+                    word_counts.update(counts)
+
+        if not word_counts:
+            self._clear_results()
+            return
+        self._build_results(word_counts)
+
     def save_results(self) -> None:
         """Save analysis results to files."""
         try:
@@ -236,43 +687,46 @@ class WordFrequencyAnalyzer:
                 return
             
             # Save CSV
-            self.df.to_csv(os.path.join(self.output_dir, 'word_frequencies.csv'), index=False, encoding='utf-8')
+            with stage('export') as timer:
+                timer.rows = len(self.df)
+                self.df.to_csv(os.path.join(self.output_dir, 'word_frequencies.csv'), index=False, encoding='utf-8')
             
-            # Create plot
-            plt.figure(figsize=(12, 6))
+            with stage('plot'):
+                # Create plot
+                plt.figure(figsize=(12, 6))
             
-            # Plot top 10 words (or fewer if less available)
-            top_n = min(10, len(self.df))
-            if top_n > 0:
-                top_words = self.df.head(top_n)
-                bars = plt.bar(top_words['word'], top_words['frequency'])
+                # Plot top 10 words (or fewer if less available)
+                top_n = min(10, len(self.df))
+                if top_n > 0:
+                    top_words = self.df.head(top_n)
+                    bars = plt.bar(top_words['word'], top_words['frequency'])
                 
-                # Customize plot
-                plt.title('Most Frequent Words')
-                plt.xlabel('Words')
-                plt.ylabel('Frequency')
-                plt.xticks(rotation=45, ha='right')
+                    # Customize plot
+                    plt.title('Most Frequent Words')
+                    plt.xlabel('Words')
+                    plt.ylabel('Frequency')
+                    plt.xticks(rotation=45, ha='right')
                 
-                # Add value labels on top of bars
-                for bar in bars:
-                    height = bar.get_height()
-                    plt.text(bar.get_x() + bar.get_width()/2., height,
-                            f'{int(height)}',
-                            ha='center', va='bottom')
-            else:
-                # No words to plot
-                plt.title('No Words Found')
-                plt.text(0.5, 0.5, 'No words found in the provided text', 
-                         horizontalalignment='center', verticalalignment='center',
-                         transform=plt.gca().transAxes, fontsize=14)
+                    # Add value labels on top of bars
+                    for bar in bars:
+                        height = bar.get_height()
+                        plt.text(bar.get_x() + bar.get_width()/2., height,
+                                f'{int(height)}',
+                                ha='center', va='bottom')
+                else:
+                    # No words to plot
+                    plt.title('No Words Found')
+                    plt.text(0.5, 0.5, 'No words found in the provided text', 
+                             horizontalalignment='center', verticalalignment='center',
+                             transform=plt.gca().transAxes, fontsize=14)
             
-            # Adjust layout and save
-            plt.tight_layout()
-            plt.savefig(os.path.join(self.output_dir, 'word_frequencies_plot.png'), dpi=300, bbox_inches='tight')
-            plt.close()
+                # Adjust layout and save
+                plt.tight_layout()
+                plt.savefig(os.path.join(self.output_dir, 'word_frequencies_plot.png'), dpi=300, bbox_inches='tight')
+                plt.close()
             
         except Exception as e:
-            print(f"Error in save_results: {str(e)}")
+            logger.error("Error in save_results: %s", e)
             # Create a minimal plot on error
             try:
                 plt.figure(figsize=(12, 6))
@@ -322,25 +776,104 @@ class WordFrequencyAnalyzer:
         
         return len(self.word_counts)
 
+# Analyzer used by each analyze_parallel worker process
+_worker_analyzer = None
+
+def _init_worker(word_variations: Dict[str, List[str]]) -> None:
+    global _worker_analyzer
+    _worker_analyzer = WordFrequencyAnalyzer()
+    _worker_analyzer.set_word_variations(word_variations)
+
+def _count_shard(shard: Union[str, tuple]) -> Counter:
+    return _worker_analyzer.count_shard(shard)
+
+def analyze_batch_item(source: Union[str, os.PathLike], output_dir: Union[str, os.PathLike],
+                       variations_file: str = None, top: int = 10) -> dict:
+    """
+    Analyze one document of a batch in a worker process and save its results
+    to output_dir. source is a file path (a Path, streamed) or the text itself
+    (a str). Returns the totals, the top words and the word counts.
+    """
+    analyzer = WordFrequencyAnalyzer(variations_file)
+    analyzer.output_dir = str(output_dir)
+    if isinstance(source, os.PathLike):
+        analyzer.analyze_stream(source)
+    else:
+        analyzer.analyze_text(source)
+    analyzer.save_results()
+    return {
+        'total_words': analyzer.get_total_words(),
+        'unique_words': analyzer.get_unique_words(),
+        'frequencies': analyzer.get_top_words(top),
+        'word_counts': analyzer.word_counts,
+    }
+
+def analyze_batch(pattern: str, output_dir: Union[str, os.PathLike] = 'output', workers: int = None,
+                  variations_file: str = None) -> dict:
+    """
+    Analyze every .txt file of a directory, or every file matching a glob
+    pattern, in a pool of worker processes (one per CPU unless workers is
+    given), each into a folder of output_dir named after the file. Logs each
+    file's outcome as it finishes and returns the batch summary with the
+    combined counts of all files ('word_counts'; similar words not combined).
+    """
+    inputs = batch_inputs(pattern, BATCH_EXTENSIONS)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    items = [(path, output_dir / name, variations_file) for path, name in zip(inputs, output_names(inputs))]
+    logger.info("Analyzing %d files...", len(items))
+
+    started = time.perf_counter()
+    outcomes = []
+    word_counts = Counter()
+    for index, outcome in run_batch(analyze_batch_item, items, workers):
+        outcomes.append(outcome)
+        if 'error' in outcome:
+            logger.error("%s: failed: %s", inputs[index], outcome['error'])
+            continue
+        result = outcome['result']
+        word_counts.update(result['word_counts'])
+        logger.info("%s: %d words, %d unique in %.2fs -> %s", inputs[index], result['total_words'],
+                    result['unique_words'], outcome['seconds'], items[index][1])
+
+    summary = dict(batch_summary(outcomes, started), total_words=sum(word_counts.values()),
+                   unique_words=len(word_counts), word_counts=word_counts)
+    logger.info("\nAnalyzed %d of %d files (%d failed), %d words in %.2fs.", summary['succeeded'],
+                summary['items'], summary['failed'], summary['total_words'], summary['seconds'])
+    return summary
+
 def main():
     # Configure UTF-8 output
     if sys.platform == 'win32':
         sys.stdout.reconfigure(encoding='utf-8')
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     
-    if len(sys.argv) != 2:
-        print("\nUsage: python word_frequency.py <text_file>")
+    if len(sys.argv) not in (2, 3):
+        print("\nUsage: python word_frequency.py <text_file> [workers]")
+        print("       python word_frequency.py <directory or glob> [workers]")
         print("The text file should be UTF-8 encoded and can contain English or Hebrew text.")
+        print("Pass a number of worker processes to count words in parallel.")
+        print("Given a directory (its .txt files) or a quoted glob pattern, every file is")
+        print("analyzed on its own, in a pool of worker processes, into output/<file name>.")
         sys.exit(1)
     
+    if is_batch_input(sys.argv[1]):
+        summary = analyze_batch(sys.argv[1], workers=int(sys.argv[2]) if len(sys.argv) == 3 else None)
+        print("\nTop 10 words of all files:")
+        for word, count in summary['word_counts'].most_common(10):
+            print(f"{word}\t{count}")
+        sys.exit(1 if summary['failed'] or not summary['items'] else 0)
+    
+
     try:
-        # Read input file
+        # Create analyzer and stream the input file through it,
+        # or split it across worker processes
         input_file = sys.argv[1]
-        with open(input_file, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
-        # Create analyzer and process text
         analyzer = WordFrequencyAnalyzer()
-        analyzer.analyze_text(text)
+        if len(sys.argv) == 3:
+            analyzer.analyze_parallel(files=[input_file], workers=int(sys.argv[2]))
+        else:
+            analyzer.analyze_stream(input_file)
         
         # Save results and print summary
         analyzer.save_results()